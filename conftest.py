@@ -0,0 +1,29 @@
+import random
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pytest
+
+from naive_fft.iv_performance_analysis import tuning
+
+
+@pytest.fixture(autouse=True, scope="session")
+def default_profile(tmp_path_factory: pytest.TempPathFactory) -> Iterator[None]:
+    """The tests run with the shipped defaults, and not with the profile saved
+    for this machine"""
+    path: Path = tmp_path_factory.mktemp("profile") / "profile.json"
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv(tuning.PROFILE_PATH_ENVIRONMENT_VARIABLE, str(path))
+        tuning.reset_profile()
+        yield
+
+
+# Every test starts from the same random state, so that a failure reproduces
+TEST_SEED = 0
+
+
+@pytest.fixture(autouse=True)
+def seeded_random() -> None:
+    random.seed(TEST_SEED)
+    np.random.seed(TEST_SEED)
@@ -0,0 +1,18 @@
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from naive_fft.iv_performance_analysis.tuning import TuningProfile
+
+
+def tune(
+    path: Optional[Path] = None, parallel_workers: Optional[int] = None
+) -> "TuningProfile":
+    """Measure this machine and store the tuning profile, see
+    iv_performance_analysis.tuning. Only a profile stored to the default path,
+    or to $NAIVE_FFT_PROFILE, is loaded by later processes."""
+    # Imported here, so that importing any module of the package does not load
+    # all of them
+    from naive_fft.iv_performance_analysis import tuning
+
+    return tuning.tune(path, parallel_workers)
@@ -0,0 +1,304 @@
+"""Benchmarks of the transforms over families of sizes:
+
+python -m naive_fft.bench --families pow2,primes --format json --output bench.json
+python -m naive_fft.bench --baseline bench.json
+
+The second run exits with status 1 when a size got slower than the baseline
+by more than the tolerance."""
+
+import argparse
+import csv
+import io
+import json
+import random
+import statistics
+import sys
+import time
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Literal,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+
+from naive_fft.i_number_theory.number_theory import first_prime_after
+from naive_fft.iii_fft.fft import fft, fft_batch, ifft, ifft_batch, next_fast_len
+
+FAMILIES = ("pow2", "primes", "smooth", "random")
+MIN_SIZE = 16
+DEFAULT_MAX_SIZE = 2**14
+DEFAULT_SIZES_PER_FAMILY = 6
+DEFAULT_REPEATS = 7
+DEFAULT_WARMUP = 2
+# Every repeat times as many calls as fit in this many nanoseconds, so short
+# transforms are not dominated by the timer resolution
+MIN_REPEAT_NS = 20_000_000
+# A size regressed if its median is slower than the baseline by this ratio
+DEFAULT_TOLERANCE = 0.25
+
+RESULT_FIELDS = (
+    "family",
+    "size",
+    "backend",
+    "transform",
+    "repeats",
+    "calls_per_repeat",
+    "median_ns",
+    "iqr_ns",
+    "min_ns",
+)
+
+
+class BenchmarkResult(NamedTuple):
+    family: str
+    size: int
+    backend: str
+    transform: str
+    repeats: int
+    calls_per_repeat: int
+    # Statistics of the nanoseconds per call over the repeats
+    median_ns: float
+    iqr_ns: float
+    min_ns: float
+
+
+def family_sizes(
+    family: str, max_size: int, count: int, rng: random.Random
+) -> List[int]:
+    """count sizes of a family, spread geometrically up to max_size"""
+    if family == "random":
+        return sorted(rng.randint(MIN_SIZE, max_size) for _ in range(count))
+    if family == "pow2":
+        powers = range(MIN_SIZE.bit_length() - 1, max_size.bit_length())
+        return [2**power for power in powers][-count:]
+    points = [
+        round(MIN_SIZE * (max_size / MIN_SIZE) ** (i / max(count - 1, 1)))
+        for i in range(count)
+    ]
+    if family == "primes":
+        sizes = [first_prime_after(point - 1) for point in points]
+    elif family == "smooth":
+        sizes = [next_fast_len(point) for point in points]
+    else:
+        raise ValueError(f"Unknown size family {family}")
+    return sorted(set(size for size in sizes if size <= max_size))
+
+
+def _transform(backend: str, transform: str, size: int) -> Callable[[], object]:
+    samples = np.random.random(size) * 2 - 1 + 1j * (np.random.random(size) * 2 - 1)
+    if backend == "numpy":
+        numpy_function = {"fft": fft_batch, "ifft": ifft_batch}[transform]
+        return lambda: numpy_function(samples)
+    samples_list: List[complex] = samples.tolist()
+    # "auto" picks the backend of every size from the tuning profile
+    python_backend: Literal["python", "auto"] = (
+        "auto" if backend == "auto" else "python"
+    )
+    if transform == "ifft":
+        return lambda: ifft(samples_list, python_backend)
+    return lambda: fft(samples_list, python_backend)
+
+
+def time_function(
+    function: Callable[[], object],
+    repeats: int,
+    warmup: int,
+    min_repeat_ns: Optional[int] = None,
+) -> Tuple[int, List[float]]:
+    """Calls per repeat, and the nanoseconds per call of every repeat. Repeats
+    last at least min_repeat_ns, MIN_REPEAT_NS by default."""
+    if min_repeat_ns is None:
+        min_repeat_ns = MIN_REPEAT_NS
+    for _ in range(warmup):
+        function()
+    # Calibrate the number of calls, like timeit.Timer.autorange
+    calls = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(calls):
+            function()
+        elapsed = time.perf_counter_ns() - start
+        if elapsed >= min_repeat_ns:
+            break
+        calls *= 2
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter_ns()
+        for _ in range(calls):
+            function()
+        timings.append((time.perf_counter_ns() - start) / calls)
+    return calls, timings
+
+
+def interquartile_range(timings: Sequence[float]) -> float:
+    if len(timings) < 2:
+        return 0.0
+    first, _, third = statistics.quantiles(timings, n=4)
+    return third - first
+
+
+def run_benchmarks(
+    families: Sequence[str],
+    max_size: int,
+    sizes_per_family: int,
+    backend: str,
+    transform: str,
+    repeats: int,
+    warmup: int,
+    seed: int,
+) -> List[BenchmarkResult]:
+    rng = random.Random(seed)
+    results = []
+    for family in families:
+        for size in family_sizes(family, max_size, sizes_per_family, rng):
+            calls, timings = time_function(
+                _transform(backend, transform, size), repeats, warmup
+            )
+            results.append(
+                BenchmarkResult(
+                    family=family,
+                    size=size,
+                    backend=backend,
+                    transform=transform,
+                    repeats=repeats,
+                    calls_per_repeat=calls,
+                    median_ns=statistics.median(timings),
+                    iqr_ns=interquartile_range(timings),
+                    min_ns=min(timings),
+                )
+            )
+    return results
+
+
+def format_results(results: Sequence[BenchmarkResult], output_format: str) -> str:
+    if output_format == "json":
+        return json.dumps(
+            {"results": [result._asdict() for result in results]}, indent=2
+        )
+    if output_format == "csv":
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        for result in results:
+            writer.writerow(result._asdict())
+        return output.getvalue()
+    raise ValueError(f"Unknown output format {output_format}")
+
+
+def load_results(path: str) -> List[BenchmarkResult]:
+    """Results previously written as JSON, or as CSV by the file extension"""
+    with open(path, newline="") as results_file:
+        if path.endswith(".csv"):
+            rows = list(csv.DictReader(results_file))
+        else:
+            rows = json.load(results_file)["results"]
+    return [
+        BenchmarkResult(
+            family=str(row["family"]),
+            size=int(row["size"]),
+            backend=str(row["backend"]),
+            transform=str(row["transform"]),
+            repeats=int(row["repeats"]),
+            calls_per_repeat=int(row["calls_per_repeat"]),
+            median_ns=float(row["median_ns"]),
+            iqr_ns=float(row["iqr_ns"]),
+            min_ns=float(row["min_ns"]),
+        )
+        for row in rows
+    ]
+
+
+def find_regressions(
+    results: Sequence[BenchmarkResult],
+    baseline: Sequence[BenchmarkResult],
+    tolerance: float,
+) -> List[Tuple[BenchmarkResult, BenchmarkResult]]:
+    """(result, baseline result) pairs of the sizes that got slower. Sizes
+    missing from the baseline are not compared."""
+    baseline_by_key: Dict[Tuple[str, int, str, str], BenchmarkResult] = {
+        (result.family, result.size, result.backend, result.transform): result
+        for result in baseline
+    }
+    regressions = []
+    for result in results:
+        key = (result.family, result.size, result.backend, result.transform)
+        previous = baseline_by_key.get(key)
+        if previous is None:
+            continue
+        # The noise of both measurements is allowed on top of the tolerance
+        noise = previous.iqr_ns + result.iqr_ns
+        if result.median_ns > previous.median_ns * (1 + tolerance) + noise:
+            regressions.append((result, previous))
+    return regressions
+
+
+def parse_arguments(argv: Optional[Sequence[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m naive_fft.bench")
+    parser.add_argument(
+        "--families",
+        default=",".join(FAMILIES),
+        help=f"comma separated size families, of {', '.join(FAMILIES)}",
+    )
+    parser.add_argument("--max-size", type=int, default=DEFAULT_MAX_SIZE)
+    parser.add_argument(
+        "--sizes-per-family", type=int, default=DEFAULT_SIZES_PER_FAMILY
+    )
+    parser.add_argument(
+        "--backend", choices=("python", "numpy", "auto"), default="python"
+    )
+    parser.add_argument("--transform", choices=("fft", "ifft"), default="fft")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+    parser.add_argument("--seed", type=int, default=0, help="for the random sizes")
+    parser.add_argument("--format", choices=("json", "csv"), default="json")
+    parser.add_argument("--output", help="file to write the results to")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    arguments = parse_arguments(argv)
+    families = [family for family in arguments.families.split(",") if family]
+    for family in families:
+        if family not in FAMILIES:
+            raise SystemExit(f"Unknown size family {family}")
+    results = run_benchmarks(
+        families,
+        arguments.max_size,
+        arguments.sizes_per_family,
+        arguments.backend,
+        arguments.transform,
+        arguments.repeats,
+        arguments.warmup,
+        arguments.seed,
+    )
+    formatted = format_results(results, arguments.format)
+    if arguments.output is None:
+        print(formatted)
+    else:
+        with open(arguments.output, "w", newline="") as output_file:
+            output_file.write(formatted)
+    if arguments.baseline is None:
+        return 0
+    regressions = find_regressions(
+        results, load_results(arguments.baseline), arguments.tolerance
+    )
+    for result, previous in regressions:
+        print(
+            f"Regression: {result.family} size {result.size}: "
+            f"{result.median_ns:.0f}ns, baseline {previous.median_ns:.0f}ns "
+            f"({result.median_ns / previous.median_ns - 1:+.0%})",
+            file=sys.stderr,
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
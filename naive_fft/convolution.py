@@ -0,0 +1,142 @@
+from typing import Any, Literal
+
+import numpy as np
+import numpy.typing as npt
+
+from naive_fft.iii_fft.fft import (
+    fft_batch,
+    ifft_batch,
+    irfft_batch,
+    next_fast_len,
+    rfft_batch,
+)
+from naive_fft.iii_fft.ntt import ntt_polymul
+from naive_fft.iv_performance_analysis import cost_model
+
+Mode = Literal["full", "same", "valid"]
+Method = Literal["auto", "direct", "fft"]
+
+
+def choose_method(n: int, m: int, real: bool = False) -> Literal["direct", "fft"]:
+    """Direct convolution for small or lopsided sizes, transforms otherwise"""
+    cost_model.ensure_profile()
+    fft_size = next_fast_len(n + m - 1, "real" if real else "complex")
+    fft_cost = cost_model.fft_convolution_cost(fft_size, real)
+    if cost_model.direct_convolution_cost(n, m) <= fft_cost:
+        return "direct"
+    return "fft"
+
+
+def _convolve_direct(
+    signal_1: npt.NDArray[Any], signal_2: npt.NDArray[Any]
+) -> npt.NDArray[Any]:
+    if len(signal_1) < len(signal_2):
+        signal_1, signal_2 = signal_2, signal_1
+    result = np.zeros(
+        len(signal_1) + len(signal_2) - 1, dtype=np.result_type(signal_1, signal_2)
+    )
+    # A scaled and shifted copy of the longer signal for every element of the
+    # shorter one
+    for i, value in enumerate(signal_2):
+        result[i : i + len(signal_1)] += value * signal_1
+    return result
+
+
+def _convolve_fft(
+    signal_1: npt.NDArray[Any], signal_2: npt.NDArray[Any]
+) -> npt.NDArray[Any]:
+    length = len(signal_1) + len(signal_2) - 1
+    if np.issubdtype(signal_1.dtype, np.integer) and np.issubdtype(
+        signal_2.dtype, np.integer
+    ):
+        # Exact, as rounding a float product is not safe for large values
+        return np.array(ntt_polymul(signal_1.tolist(), signal_2.tolist()))
+    real = np.isrealobj(signal_1) and np.isrealobj(signal_2)
+    n = next_fast_len(length, "real" if real else "complex")
+    if real:
+        spectrum = rfft_batch(_pad(signal_1, n)) * rfft_batch(_pad(signal_2, n))
+        return irfft_batch(spectrum, n)[:length]
+    spectrum = fft_batch(_pad(signal_1, n)) * fft_batch(_pad(signal_2, n))
+    return ifft_batch(spectrum)[:length]
+
+
+def _pad(signal: npt.NDArray[Any], n: int) -> npt.NDArray[Any]:
+    padded = np.zeros(n, dtype=signal.dtype)
+    padded[: len(signal)] = signal
+    return padded
+
+
+def _crop(full: npt.NDArray[Any], n: int, m: int, mode: Mode) -> npt.NDArray[Any]:
+    """The part of the full convolution of sizes n and m returned in mode, with
+    the same conventions as numpy.convolve"""
+    if mode == "full":
+        return full
+    if mode == "same":
+        start = (min(n, m) - 1) // 2
+        return full[start : start + max(n, m)]
+    if mode == "valid":
+        return full[min(n, m) - 1 : max(n, m)]
+    raise ValueError(f"Unknown mode {mode}")
+
+
+def convolve(
+    signal_1: npt.ArrayLike,
+    signal_2: npt.ArrayLike,
+    mode: Mode = "full",
+    method: Method = "auto",
+) -> npt.NDArray[Any]:
+    """result[k] = sum(signal_1[i] * signal_2[k - i]). Real signals give real
+    results, and integer signals exact integer results."""
+    array_1 = np.asarray(signal_1)
+    array_2 = np.asarray(signal_2)
+    if array_1.ndim != 1 or array_2.ndim != 1:
+        raise ValueError("Expected one dimensional signals")
+    n = len(array_1)
+    m = len(array_2)
+    if n == 0 or m == 0:
+        raise ValueError("Cannot convolve an empty signal")
+    if method == "auto":
+        real = np.isrealobj(array_1) and np.isrealobj(array_2)
+        method = choose_method(n, m, real)
+    if method == "direct":
+        if np.issubdtype(np.result_type(array_1, array_2), np.integer):
+            # Python integers, as the products may not fit in an int64
+            array_1 = array_1.astype(object)
+            array_2 = array_2.astype(object)
+        full = _convolve_direct(array_1, array_2)
+        if full.dtype == object:
+            full = np.array(full.tolist())
+    elif method == "fft":
+        full = _convolve_fft(array_1, array_2)
+    else:
+        raise ValueError(f"Unknown method {method}")
+    return _crop(full, n, m, mode)
+
+
+def correlate(
+    signal_1: npt.ArrayLike,
+    signal_2: npt.ArrayLike,
+    mode: Mode = "full",
+    method: Method = "auto",
+) -> npt.NDArray[Any]:
+    """result[k] = sum(signal_1[i + k] * conj(signal_2[i])), where the full
+    result starts at k = 1 - len(signal_2)"""
+    array_1 = np.asarray(signal_1)
+    array_2 = np.asarray(signal_2)
+    reversed_2 = np.conjugate(array_2[::-1])
+    n = len(array_1)
+    m = len(array_2)
+    if mode == "same" and n < m:
+        # numpy.correlate swaps a shorter first signal to the second place and
+        # reverses the result, so the centre of an even length rounds the other
+        # way than in numpy.convolve
+        full = convolve(array_1, reversed_2, "full", method)
+        return full[n // 2 : n // 2 + m]
+    return convolve(array_1, reversed_2, mode, method)
+
+
+def polymul(
+    poly_1: npt.ArrayLike, poly_2: npt.ArrayLike, method: Method = "auto"
+) -> npt.NDArray[Any]:
+    """Product of polynomials given by their coefficients, lowest power first"""
+    return convolve(poly_1, poly_2, "full", method)
@@ -5,8 +5,10 @@ from typing import List
 import matplotlib.pyplot as plt  # type: ignore
 
 from naive_fft.iii_fft.fft import fft
+from naive_fft.iii_fft.partial_dft import dft_bins
 
-BASE_FREQUENCY = 100 * 2 * math.pi
+FREQUENCY_BIN = 100
+BASE_FREQUENCY = FREQUENCY_BIN * 2 * math.pi
 NUM_SAMPLES = 1000
 NOISE_MAGNITUDE = 10
 PHASE = 0.5
@@ -25,7 +27,10 @@ def main() -> None:
     samples_fft = fft(samples)
     plt.plot([abs(x) for x in samples_fft])
     plt.show()  # Can see frequency very clearly. Phase is lost due to absolute value, but can be recovered
-    phase = math.pi / 2 + math.atan(samples_fft[100].imag / samples_fft[100].real)
+    # Once the frequency is known, its bin alone is enough - no need for the
+    # whole transform
+    (frequency_value,) = dft_bins(samples, [FREQUENCY_BIN])
+    phase = math.pi / 2 + math.atan(frequency_value.imag / frequency_value.real)
     print(f"Phase: {phase}")
 
 
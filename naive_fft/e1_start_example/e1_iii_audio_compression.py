@@ -1,10 +1,15 @@
+import hashlib
 import os
-from typing import List
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
 
 import numpy as np
+import numpy.typing as npt
 from scipy.io import wavfile  # type: ignore
 
-from naive_fft.iii_fft.fft import fft, ifft
+from naive_fft.ii_poly_multiplication.evaluate_poly_numpy import ComplexArray
+from naive_fft.iii_fft.fft import FloatArray, irfft_batch, rfft_batch
+from naive_fft.utils import atomic_write, xdg_cache_path
 
 CURRENT_DIR = os.path.dirname(__file__)
 ASSETS_DIR = f"{CURRENT_DIR}/../assets"
@@ -12,14 +17,25 @@ ASSETS_DIR = f"{CURRENT_DIR}/../assets"
 
 SAMPLE_MAX = 32768
 
+# Overrides the directory of the cached spectra
+SPECTRUM_CACHE_ENVIRONMENT_VARIABLE = "NAIVE_FFT_SPECTRUM_CACHE"
+# Part of the cache key - bumped whenever the cached spectra change meaning,
+# such as their scaling or padding, so that stale files are not read
+SPECTRUM_FORMAT_VERSION = 1
+# Read size when hashing a file
+HASH_CHUNK_BYTES = 2**20
+
 
 def bandpass_filter_sample(
     frequency_data: List[complex],
     sample_rate: int,
     min_frequency: float,
     max_frequency: float,
+    length: int,
 ) -> float:
-    length = len(frequency_data)
+    """frequency_data is the rfft of a real signal of the given length - only
+    the non negative frequencies. The negative frequency -i mirrors i, so it is
+    counted as removed together with it."""
     frequency_data[0] = 0 + 0j
     frequency_data[length // 2] = 0 + 0j
     saved_up_samples = 2
@@ -29,53 +45,136 @@ def bandpass_filter_sample(
         effective_frequency = 1 / effective_wavelength_in_seconds
         if effective_frequency < min_frequency or effective_frequency > max_frequency:
             frequency_data[i] = 0 + 0j
-            frequency_data[-i] = 0 + 0j
             saved_up_samples += 2
     return saved_up_samples / length
 
 
-def compress_audio_file(
-    source_file_name: str,
-    dest_file_name: str,
+def bandpass_mask(
+    sample_rate: int,
     min_frequency: float,
     max_frequency: float,
-) -> None:
-    # Read WAV file
-    sample_rate, data = wavfile.read(f"{ASSETS_DIR}/{source_file_name}")
-    assert data.dtype == np.int16
+    length: int,
+) -> Tuple[FloatArray, float]:
+    """bandpass_filter_sample applied to an all ones spectrum, so it can be
+    multiplied into the spectra of any number of channels. Also returns the
+    compression ratio."""
+    mask: List[complex] = [1 + 0j] * (length // 2 + 1)
+    saved_percent = bandpass_filter_sample(
+        mask, sample_rate, min_frequency, max_frequency, length
+    )
+    return np.array([value.real for value in mask], dtype=np.float64), saved_percent
 
-    # Split data into left and right channels
-    left_channel = data[:, 0] / SAMPLE_MAX
-    right_channel = data[:, 1] / SAMPLE_MAX
-    left_channel_list = list(left_channel)
-    right_channel_list = list(right_channel)
 
-    # Get FFT of every channel
-    left_channel_fft = fft(left_channel_list)
-    right_channel_fft = fft(right_channel_list)
+class AudioAnalysis(NamedTuple):
+    sample_rate: int
+    # Shape of the samples in the file - (length,) or (length, channels)
+    shape: Tuple[int, ...]
+    # The rfft of every channel, memory mapped from the cache
+    spectra: List[ComplexArray]
 
-    # Lose information about all frequencies outside of a set range
-    saved_percent = bandpass_filter_sample(
-        left_channel_fft, sample_rate, min_frequency, max_frequency
+
+# Spectra are cached by the hash of the file contents, so that every job over
+# the same file shares them, and a modified file is analysed again. The key
+# also has the format version, the channel and the transform length, one .npy
+# file per channel.
+
+
+def spectrum_cache_dir() -> Path:
+    return xdg_cache_path("spectra", SPECTRUM_CACHE_ENVIRONMENT_VARIABLE)
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _save_spectrum(path: Path, spectrum: ComplexArray) -> None:
+    # Other jobs may be reading the spectra of the same file
+    with atomic_write(path) as file:
+        np.save(file, spectrum)
+
+
+def analyze_audio_file(
+    source_file_name: str, cache_dir: Optional[Path] = None
+) -> AudioAnalysis:
+    """The spectra of every channel of a WAV file, computed only for channels
+    which are not cached yet"""
+    cache_dir = spectrum_cache_dir() if cache_dir is None else cache_dir
+    source_path = os.path.join(ASSETS_DIR, source_file_name)
+    # Memory mapped, so that the samples are only read for a missing spectrum
+    sample_rate, data = wavfile.read(source_path, mmap=True)
+    assert data.dtype == np.int16
+    length = data.shape[0]
+    digest = file_digest(source_path)
+    channel_count = 1 if data.ndim == 1 else data.shape[1]
+    paths = [
+        cache_dir / f"v{SPECTRUM_FORMAT_VERSION}_{digest}_{channel}_{length}.npy"
+        for channel in range(channel_count)
+    ]
+    missing = [channel for channel, path in enumerate(paths) if not path.exists()]
+    if missing:
+        # Every column is a channel, transformed in a single pass - the
+        # channels are real, so half of the spectrum is enough
+        channels = data.reshape(length, -1)[:, missing] / SAMPLE_MAX
+        channels_fft = rfft_batch(channels, axis=0)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        for column, channel in enumerate(missing):
+            _save_spectrum(paths[channel], channels_fft[:, column])
+    spectra = [np.load(path, mmap_mode="r") for path in paths]
+    return AudioAnalysis(sample_rate, data.shape, spectra)
+
+
+def band_limited(
+    analysis: AudioAnalysis, min_frequency: float, max_frequency: float
+) -> Tuple[npt.NDArray[np.int16], float]:
+    """The samples of the analysed file without the frequencies outside of a
+    set range, and the compression ratio"""
+    length = analysis.shape[0]
+    mask, saved_percent = bandpass_mask(
+        analysis.sample_rate, min_frequency, max_frequency, length
     )
-    bandpass_filter_sample(right_channel_fft, sample_rate, min_frequency, max_frequency)
-    data_reconstructed = (
-        (np.array([ifft(left_channel_fft), ifft(right_channel_fft)]) * SAMPLE_MAX)
-        .astype(np.int16)
-        .T
+    channels_fft = np.stack(analysis.spectra, axis=1)
+    channels_fft *= mask[:, np.newaxis]
+    channels = irfft_batch(channels_fft, length, axis=0)
+    # Removing frequencies can overshoot full scale, which would wrap around
+    data: npt.NDArray[np.int16] = np.clip(
+        channels * SAMPLE_MAX, -SAMPLE_MAX, SAMPLE_MAX - 1
+    ).astype(np.int16)
+    return data.reshape(analysis.shape), saved_percent
+
+
+def write_band_limited(
+    analysis: AudioAnalysis,
+    dest_file_name: str,
+    min_frequency: float,
+    max_frequency: float,
+) -> None:
+    data_reconstructed, saved_percent = band_limited(
+        analysis, min_frequency, max_frequency
     )
     print(f"Compression ratio: {saved_percent*100}%. Output: {dest_file_name}")
-    wavfile.write(f"{ASSETS_DIR}/{dest_file_name}", sample_rate, data_reconstructed)
+    dest_path = os.path.join(ASSETS_DIR, dest_file_name)
+    wavfile.write(dest_path, analysis.sample_rate, data_reconstructed)
+
+
+def compress_audio_file(
+    source_file_name: str,
+    dest_file_name: str,
+    min_frequency: float,
+    max_frequency: float,
+) -> None:
+    """A single band of a file - analyze_audio_file once and then
+    write_band_limited for every band, to produce several of them"""
+    analysis = analyze_audio_file(source_file_name)
+    write_band_limited(analysis, dest_file_name, min_frequency, max_frequency)
 
 
 if __name__ == "__main__":
-    compress_audio_file("ensoniq-source-sample.wav", "ensoniq_80_to_5k.wav", 80, 5_000)
-    compress_audio_file(
-        "ensoniq-source-sample.wav", "ensoniq_40_to_10k.wav", 40, 10_000
-    )
-    compress_audio_file(
-        "ensoniq-source-sample.wav", "ensoniq_30_to_15k.wav", 30, 15_000
-    )
-    compress_audio_file(
-        "ensoniq-source-sample.wav", "ensoniq_20_to_20k.wav", 20, 20_000
-    )
+    source_analysis = analyze_audio_file("ensoniq-source-sample.wav")
+    write_band_limited(source_analysis, "ensoniq_80_to_5k.wav", 80, 5_000)
+    write_band_limited(source_analysis, "ensoniq_40_to_10k.wav", 40, 10_000)
+    write_band_limited(source_analysis, "ensoniq_30_to_15k.wav", 30, 15_000)
+    write_band_limited(source_analysis, "ensoniq_20_to_20k.wav", 20, 20_000)
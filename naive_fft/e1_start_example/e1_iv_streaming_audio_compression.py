@@ -0,0 +1,84 @@
+import os
+import wave
+
+import numpy as np
+from scipy.io import wavfile  # type: ignore
+
+from naive_fft.e1_start_example.e1_iii_audio_compression import (
+    ASSETS_DIR,
+    SAMPLE_MAX,
+    bandpass_mask,
+)
+from naive_fft.iii_fft.fft import FloatArray, irfft_batch, rfft_batch
+
+# Memory use is bounded by a few frames per channel, regardless of the file size
+FRAME_SIZE = 4096
+HOP_SIZE = FRAME_SIZE // 2
+
+
+def sqrt_hann_window(frame_size: int) -> FloatArray:
+    """Square root of the periodic Hann window. Applied both before and after
+    filtering a frame, the squares of frames overlapping by half sum to 1, so
+    unfiltered frames are reconstructed exactly by overlap-add."""
+    n = np.arange(frame_size)
+    window: FloatArray = np.sqrt(0.5 - 0.5 * np.cos(2 * np.pi * n / frame_size))
+    return window
+
+
+def compress_audio_file_streaming(
+    source_file_name: str,
+    dest_file_name: str,
+    min_frequency: float,
+    max_frequency: float,
+    frame_size: int = FRAME_SIZE,
+) -> None:
+    """Same as compress_audio_file, filtering windowed frames with overlap-add,
+    so the file is read through a memory map and written frame by frame"""
+    hop_size = frame_size // 2
+    sample_rate, data = wavfile.read(
+        os.path.join(ASSETS_DIR, source_file_name), mmap=True
+    )
+    assert data.dtype == np.int16
+    if data.ndim == 1:
+        data = data.reshape(-1, 1)
+    length, channels = data.shape
+
+    window = sqrt_hann_window(frame_size)
+    mask, saved_percent = bandpass_mask(
+        sample_rate, min_frequency, max_frequency, frame_size
+    )
+
+    # The second half of the previous filtered frame of every channel
+    overlap = np.zeros((channels, hop_size), dtype=np.float64)
+    frame = np.zeros((channels, frame_size), dtype=np.float64)
+    with wave.open(os.path.join(ASSETS_DIR, dest_file_name), "wb") as dest:
+        dest.setnchannels(channels)
+        dest.setsampwidth(2)
+        dest.setframerate(sample_rate)
+        # The first frame starts half a frame before the signal, so every
+        # sample is covered by two frames
+        for frame_start in range(-hop_size, length, hop_size):
+            frame[:] = 0
+            read_start = max(frame_start, 0)
+            read_end = min(frame_start + frame_size, length)
+            frame[:, read_start - frame_start : read_end - frame_start] = (
+                data[read_start:read_end].T / SAMPLE_MAX
+            )
+            frame_fft = rfft_batch(frame * window)
+            filtered = irfft_batch(frame_fft * mask, frame_size) * window
+            output = overlap + filtered[:, :hop_size]
+            overlap = filtered[:, hop_size:]
+            if frame_start < 0:
+                continue
+            output = output[:, : min(hop_size, length - frame_start)]
+            output_samples = np.clip(
+                output.T * SAMPLE_MAX, -SAMPLE_MAX, SAMPLE_MAX - 1
+            ).astype("<i2")
+            dest.writeframes(output_samples.tobytes())
+    print(f"Compression ratio: {saved_percent*100}%. Output: {dest_file_name}")
+
+
+if __name__ == "__main__":
+    compress_audio_file_streaming(
+        "ensoniq-source-sample.wav", "ensoniq_80_to_5k_streaming.wav", 80, 5_000
+    )
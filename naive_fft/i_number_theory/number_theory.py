@@ -1,108 +1,291 @@
+import bisect
 import collections
+import itertools
 import math
-from typing import DefaultDict, Dict
+import threading
+import types
+from array import array
+from typing import DefaultDict, Dict, Mapping, Sequence
 
-GLOBAL_PRIMES_SET = {2, 3}
-GLOBAL_PRIMES_LIST = [2, 3]
+from naive_fft.i_number_theory.bounded_cache import BoundedCache, CacheInfo
+
+# Everything up to GLOBAL_PRIMES_CHECKED_UP_TO (inclusive) is sieved. Only odd
+# numbers are in the table, 2 bytes each:
+# GLOBAL_SMALLEST_PRIME_FACTOR[n // 2] is the smallest prime dividing an odd
+# composite n, and 0 for 1 and the odd primes. Composites up to 2^32 have a
+# factor below 2^16, and GLOBAL_PRIMES_LIST holds primes below 2^32 anyway.
+GLOBAL_SMALLEST_PRIME_FACTOR = array("H", [0, 0])
+GLOBAL_PRIMES_LIST = array("I", [2, 3])
 GLOBAL_PRIMES_CHECKED_UP_TO = 4
 
+# factorize sieves up to n itself for n below this bound, so the following
+# factorizations of numbers in range are O(log n) lookups
+MAX_AUTOMATIC_SIEVE = 1 << 22
+
+# The sieve is extended one window at a time, so the window being sieved stays
+# in the cache
+SIEVE_WINDOW = 1 << 16
+
+# Miller-Rabin with these bases is deterministic for n < 3.3 * 10^24
+MILLER_RABIN_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+
+
+_SIEVE_LOCK = threading.Lock()
+
 
 def reset_primes() -> None:
-    global GLOBAL_PRIMES_SET
+    with _SIEVE_LOCK:
+        _reset_primes()
+
+
+def _reset_primes() -> None:
+    global GLOBAL_SMALLEST_PRIME_FACTOR
     global GLOBAL_PRIMES_LIST
     global GLOBAL_PRIMES_CHECKED_UP_TO
-    GLOBAL_PRIMES_SET = {2, 3}
-    GLOBAL_PRIMES_LIST = [2, 3]
+    GLOBAL_SMALLEST_PRIME_FACTOR = array("H", [0, 0])
+    GLOBAL_PRIMES_LIST = array("I", [2, 3])
     GLOBAL_PRIMES_CHECKED_UP_TO = 4
 
 
 def populate_primes_up_to(n: int) -> None:
-    global GLOBAL_PRIMES
-    global GLOBAL_PRIMES_LIST
+    """Extend the sieve with the segment (GLOBAL_PRIMES_CHECKED_UP_TO, n]"""
+    if GLOBAL_PRIMES_CHECKED_UP_TO >= n:
+        return
+    # Readers only look below GLOBAL_PRIMES_CHECKED_UP_TO, which is updated
+    # last, so only the writers need to be serialized
+    with _SIEVE_LOCK:
+        _populate_primes_up_to(n)
+
+
+def _populate_primes_up_to(n: int) -> None:
     global GLOBAL_PRIMES_CHECKED_UP_TO
 
     if GLOBAL_PRIMES_CHECKED_UP_TO >= n:
         return
 
-    while GLOBAL_PRIMES_CHECKED_UP_TO < n:
-        GLOBAL_PRIMES_CHECKED_UP_TO += 1
-        candidate_prime = GLOBAL_PRIMES_CHECKED_UP_TO
-        max_relevant = math.ceil(math.sqrt(candidate_prime))
-        for prime in GLOBAL_PRIMES_LIST:
-            if candidate_prime % prime == 0:
-                break
-            if prime >= max_relevant:
-                GLOBAL_PRIMES_SET.add(candidate_prime)
-                GLOBAL_PRIMES_LIST.append(candidate_prime)
+    # Growing at least x2 keeps the total work linear in repeated extensions
+    segment_end = max(n, 2 * GLOBAL_PRIMES_CHECKED_UP_TO)
+    # Composites in the segment have a prime factor <= sqrt(segment_end)
+    max_relevant = math.isqrt(segment_end)
+    _populate_primes_up_to(max_relevant)
+    if GLOBAL_PRIMES_CHECKED_UP_TO >= segment_end:
+        return
+    relevant_primes = GLOBAL_PRIMES_LIST[
+        : bisect.bisect_right(GLOBAL_PRIMES_LIST, max_relevant)
+    ]
+    # Going over the primes from the largest down, so that the smallest prime
+    # factor is the last one written
+    relevant_primes.reverse()
+    for window_start in range(
+        GLOBAL_PRIMES_CHECKED_UP_TO + 1, segment_end + 1, SIEVE_WINDOW
+    ):
+        window_end = min(window_start + SIEVE_WINDOW - 1, segment_end)
+        _sieve_window(window_start, window_end, relevant_primes)
+        GLOBAL_PRIMES_CHECKED_UP_TO = window_end
+
+
+def _sieve_window(
+    window_start: int, window_end: int, relevant_primes: Sequence[int]
+) -> None:
+    """Append the window [window_start, window_end] to the sieve, where
+    relevant_primes are all the primes up to sqrt(window_end), largest first.
+    window_start is above 4, so 2 is never a new prime."""
+    # Index i of the window is the odd number 2 * (first_index + i) + 1
+    first_index = window_start // 2
+    window_length = (window_end + 1) // 2 - first_index
+    window_sieve = bytearray([1]) * window_length
+    window_smallest_prime_factor = array("H", [0]) * window_length
+    for prime in relevant_primes:
+        if prime == 2:
+            continue
+        first_multiple = max(prime * prime, -(-window_start // prime) * prime)
+        if first_multiple % 2 == 0:
+            first_multiple += prime
+        if first_multiple > window_end:
+            continue
+        # Consecutive odd multiples are 2 * prime apart, prime entries apart
+        offset = first_multiple // 2 - first_index
+        count = len(range(offset, window_length, prime))
+        window_sieve[offset::prime] = bytes(count)
+        window_smallest_prime_factor[offset::prime] = array("H", [prime]) * count
+    new_primes = array(
+        "I",
+        itertools.compress(range(2 * first_index + 1, window_end + 1, 2), window_sieve),
+    )
+
+    GLOBAL_SMALLEST_PRIME_FACTOR.extend(window_smallest_prime_factor)
+    GLOBAL_PRIMES_LIST.extend(new_primes)
+
+
+def _miller_rabin(n: int) -> bool:
+    """n must be odd and larger than the largest base"""
+    d = n - 1
+    s = 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for base in MILLER_RABIN_BASES:
+        x = pow(base, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
                 break
-    a = 1
-    return
+        else:
+            return False
+    return True
 
 
 def is_prime(n: int) -> bool:
     if n < 2:
         return False
     if n <= GLOBAL_PRIMES_CHECKED_UP_TO:
-        return n in GLOBAL_PRIMES_SET
-    max_relevant = math.ceil(math.sqrt(n))
-    populate_primes_up_to(max_relevant)
-    for prime in GLOBAL_PRIMES_LIST:
-        print(prime)
-        if n % prime == 0:
-            return False
-        if prime > max_relevant:
-            break
-    return True
+        return n == 2 or (n % 2 == 1 and GLOBAL_SMALLEST_PRIME_FACTOR[n // 2] == 0)
+    for base in MILLER_RABIN_BASES:
+        if n % base == 0:
+            return n == base
+    return _miller_rabin(n)
 
 
-FACTORIZATION_CACHE: Dict[int, DefaultDict[int, int]] = {}
+# Memoization of the functions below. Cached factorizations are read only
+# mappings, and factorize returns a copy, so callers cannot corrupt them.
+FACTORIZATION_CACHE_SIZE = 4096
+FACTORIZATION_CACHE: BoundedCache[int, Mapping[int, int]] = BoundedCache(
+    FACTORIZATION_CACHE_SIZE
+)
+SIGMA_0_CACHE: BoundedCache[int, int] = BoundedCache(FACTORIZATION_CACHE_SIZE)
+SIGMA_1_CACHE: BoundedCache[int, int] = BoundedCache(FACTORIZATION_CACHE_SIZE)
 
 
 def factorize(n: int) -> DefaultDict[int, int]:
-    assert n != 0, "Cannot factorize 0"
-    if n in FACTORIZATION_CACHE:
-        return FACTORIZATION_CACHE[n]
-    max_relevant = math.ceil(math.sqrt(n))
-    populate_primes_up_to(max_relevant)
-    for prime in GLOBAL_PRIMES_LIST:
-        if prime > max_relevant:
-            break
-        if n % prime == 0:
-            result = collections.defaultdict(int, factorize(n // prime))
+    """The prime factors of n mapped to their powers, ordered by the primes.
+    A new dict on every call, so it may be modified."""
+    if n < 1:
+        raise ValueError(f"Cannot factorize {n}, expected a positive integer")
+    cached = FACTORIZATION_CACHE.get(n)
+    if cached is not None:
+        return collections.defaultdict(int, cached)
+    if n <= MAX_AUTOMATIC_SIEVE:
+        populate_primes_up_to(n)
+    factors: DefaultDict[int, int] = collections.defaultdict(int)
+    _factorize_into(n, factors)
+    result = types.MappingProxyType(dict(sorted(factors.items())))
+    FACTORIZATION_CACHE.put(n, result)
+    return collections.defaultdict(int, result)
+
+
+def _factorize_into(n: int, result: DefaultDict[int, int]) -> None:
+    if n > GLOBAL_PRIMES_CHECKED_UP_TO:
+        for prime in MILLER_RABIN_BASES:
+            while n % prime == 0:
+                result[prime] += 1
+                n //= prime
+    if n <= GLOBAL_PRIMES_CHECKED_UP_TO:
+        while n % 2 == 0:
+            result[2] += 1
+            n //= 2
+        # Following the smallest prime factors in the sieve, where a prime
+        # is its own
+        while n > 1:
+            prime = GLOBAL_SMALLEST_PRIME_FACTOR[n // 2] or n
             result[prime] += 1
-            return result
-    result = collections.defaultdict(int)
-    if n > 1:
+            n //= prime
+        return
+    if is_prime(n):
         result[n] += 1
-    return result
+        return
+    divisor = _pollard_rho(n)
+    _factorize_into(divisor, result)
+    _factorize_into(n // divisor, result)
+
+
+def _pollard_rho(n: int) -> int:
+    """A non trivial divisor of an odd composite n"""
+    # https://en.wikipedia.org/wiki/Pollard%27s_rho_algorithm
+    for c in itertools.count(1):
+        x = 2
+        y = 2
+        divisor = 1
+        while divisor == 1:
+            x = (x * x + c) % n
+            y = (y * y + c) % n
+            y = (y * y + c) % n
+            divisor = math.gcd(abs(x - y), n)
+        if divisor != n:
+            return divisor
+    raise AssertionError("Unreachable")
 
 
 def first_prime_after(n: int) -> int:
-    populate_primes_up_to(n * 2)  # There must be a prime in the range (n, 2n)
-    for prime in GLOBAL_PRIMES_LIST:
-        if prime > n:
-            return prime
-    return -1
+    primes = GLOBAL_PRIMES_LIST
+    index = bisect.bisect_right(primes, n)
+    if index < len(primes):
+        return primes[index]
+    if 2 * n <= MAX_AUTOMATIC_SIEVE:
+        populate_primes_up_to(n * 2)  # There must be a prime in the range (n, 2n)
+        primes = GLOBAL_PRIMES_LIST
+        return primes[bisect.bisect_right(primes, n)]
+    # Prime gaps are O(log(n)) on average, so testing every candidate is
+    # cheaper than sieving past MAX_AUTOMATIC_SIEVE
+    candidate = n + 1
+    while not is_prime(candidate):
+        candidate += 1
+    return candidate
+
+
+def primitive_root(prime: int) -> int:
+    """The smallest generator of the multiplicative group modulo prime"""
+    assert is_prime(prime), "Primitive roots are computed modulo a prime"
+    order = prime - 1
+    # g generates the group iff g^(order/q) != 1 for every prime q | order
+    prime_factors = list(factorize(order).keys()) if order > 1 else []
+    for candidate in itertools.count(1):
+        if all(pow(candidate, order // q, prime) != 1 for q in prime_factors):
+            return candidate
+    raise AssertionError("Unreachable")
 
 
 def sigma_0(n: int) -> int:
     """Count number of divisors"""
+    cached = SIGMA_0_CACHE.get(n)
+    if cached is not None:
+        return cached
     factorization = factorize(n)
     result = 1
     for prime, power in factorization.items():
         result *= power + 1
+    SIGMA_0_CACHE.put(n, result)
     return result
 
 
 def sigma_1(n: int) -> int:
     """Count sum of divisors"""
+    cached = SIGMA_1_CACHE.get(n)
+    if cached is not None:
+        return cached
     result = 1
     factorization = factorize(n)
     for prime, power in factorization.items():
         result *= (prime ** (power + 1) - 1) // (prime - 1)
+    SIGMA_1_CACHE.put(n, result)
     return result
 
 
+def set_cache_size(maxsize: int) -> None:
+    """Bound the number of entries of each of the number theory caches"""
+    for cache in (FACTORIZATION_CACHE, SIGMA_0_CACHE, SIGMA_1_CACHE):
+        cache.resize(maxsize)
+
+
+def cache_info() -> Dict[str, CacheInfo]:
+    return {
+        "factorize": FACTORIZATION_CACHE.info(),
+        "sigma_0": SIGMA_0_CACHE.info(),
+        "sigma_1": SIGMA_1_CACHE.info(),
+    }
+
+
 def factorial(n: int) -> int:
     if n < 2:
         return 1
@@ -1,10 +1,17 @@
-from math import e, pi
-from typing import List
-
-from naive_fft.i_number_theory.number_theory import factorize
-
-VERBOSE = False
-
+from typing import List, Optional
+
+from naive_fft.ii_poly_multiplication import instrumentation
+from naive_fft.ii_poly_multiplication.evaluate_poly_iterative import (
+    evaluate_poly_iterative,
+)
+from naive_fft.ii_poly_multiplication.plan import (
+    BluesteinPlan,
+    Direction,
+    FFTPlan,
+    get_plan,
+    is_power_of_2,
+)
+from naive_fft.iv_performance_analysis.cost_model import ensure_profile
 
 # This algorithm is inefficient for input sizes with large prime factors
 # There are other algorithms, for numbers with large prime factors -
@@ -13,11 +20,56 @@ VERBOSE = False
 # You can read about them in
 # https://en.wikipedia.org/wiki/Fast_Fourier_transform#Other_FFT_algorithms
 #
+# Sizes with a prime factor above plan.LARGE_PRIME_THRESHOLD are handed to
+# Bluestein's algorithm (evaluate_poly_bluestein below), which only needs
+# power of 2 transforms. Powers of 2 themselves are handled by the in place,
+# non recursive version of this algorithm in evaluate_poly_iterative.py.
 
 
-def evaluate_poly(poly: List[complex]) -> List[complex]:
+# Evaluating at w^(-k) instead of w^k is the same as evaluating the polynomial
+# with the coefficients poly[-j] at w^k, as w^(-j*k) = w^((n - j)*k). The
+# direction is handled by reading the coefficients of the outermost level in
+# this order, where they are copied anyway - into the split polynomials, the
+# bit reversed buffer, or the padded polynomial of Bluestein's algorithm.
+
+
+def evaluate_poly(
+    poly: List[complex], workers: Optional[int] = None, direction: Direction = 1
+) -> List[complex]:
     """Evaluate a polynomial of degree n at n roots of unity, defining it
-    uniquely"""
+    uniquely - at w^k for k = 0, ..., n - 1, or at w^(-k) for direction=-1.
+    With workers > 1, large polynomials are split between processes."""
+    n = len(poly)
+    if n == 0:
+        return []
+    # The parallel cutoff and the plans are tuned
+    ensure_profile()
+    if workers is not None and workers > 1:
+        # Imported here, as the parallel evaluation is built on this module
+        from naive_fft.ii_poly_multiplication.parallel import (
+            PARALLEL_CUTOFF,
+            evaluate_poly_parallel,
+        )
+
+        if n >= PARALLEL_CUTOFF:
+            if direction == -1:
+                poly = [poly[-j] for j in range(n)]
+            return evaluate_poly_parallel(poly, workers)
+    return evaluate_poly_with_plan(poly, get_plan(n), direction)
+
+
+def evaluate_poly_with_plan(
+    poly: List[complex], plan: FFTPlan, direction: Direction = 1
+) -> List[complex]:
+    """Same as evaluate_poly, using a precomputed plan for len(poly)"""
+    if instrumentation.ENABLED:
+        return instrumentation.traced(_evaluate_poly_with_plan, poly, plan, direction)
+    return _evaluate_poly_with_plan(poly, plan, direction)
+
+
+def _evaluate_poly_with_plan(
+    poly: List[complex], plan: FFTPlan, direction: Direction
+) -> List[complex]:
     # This is a variation on the Cooley–Tukey FFT algorithm:
     # https://en.wikipedia.org/wiki/Cooley%E2%80%93Tukey_FFT_algorithm
     #
@@ -25,43 +77,45 @@ def evaluate_poly(poly: List[complex]) -> List[complex]:
     # [f, e, d, c, b, a] =>
     # f(x) = ax^5 + bx^4 + cx^3 + dx^2 + ex + f
     # n = 6, the number of terms
-    n = len(poly)
-    if n == 0:
-        return []
+    n = plan.n
+    assert len(poly) == n, "Plan does not match the polynomial size"
     if n == 1:
         return [poly[0]]
-
-    # Find the n'th root of unity
-    phase_w = 2 * pi / n
-    w = e ** (phase_w * (1j))
+    if plan.bluestein is not None:
+        return evaluate_poly_bluestein(poly, plan.bluestein, direction)
+    if is_power_of_2(n):
+        evaluated_poly: List[complex] = [0j] * n
+        evaluate_poly_iterative(poly, evaluated_poly, plan, direction)
+        return evaluated_poly
+
+    # The n'th root of unity is
+    # w = e ** (2 * pi / n * (1j))
     # Same as:
-    # w = math.cos(phase_w) + 1j * math.sin(phase_w)
+    # w = math.cos(2 * pi / n) + 1j * math.sin(2 * pi / n)
 
     # purpose - we want to return the polynomial evaluated at 1, w, w^2, ..., w^5
     # expected return val:
     # [f(1), f(w), f(w^2), f(w^3), f(w^4), f(w^5)]
 
-    factorization = factorize(n)
-
-    # Let us call the largest prime factor p
-    p = 1
-    for prime_factor in factorization.keys():
-        if prime_factor > p:
-            p = prime_factor
+    # Let us call the largest prime factor p (found by factorizing n when
+    # the plan was built)
+    p = plan.p
 
     # We will split the number of terms in the polynomial into n = p * q, where p is the largest prime factor
-    q = n // p
+    q = plan.q
 
-    unit_roots_of_nth_order: List[complex] = [1]
-    for i in range(n - 1):
-        unit_roots_of_nth_order.append(unit_roots_of_nth_order[-1] * w)
-    # in our example, n = 6, and therefore z = e^(2pi*i/6),
+    # The unit roots of n'th order are precomputed once per n by the plan, as
+    # plan.twiddles. In our example, n = 6, and therefore z = e^(2pi*i/6),
     # unit_roots_of_nth_order = [1, w, w^2, w^3, w^4, w^5]
     # NOTE: w^6 = w^0 = 1
 
     split_polynomials: List[List[complex]] = [list() for _ in range(p)]
-    for idx, coefficient in enumerate(poly):
-        split_polynomials[idx % p].append(coefficient)
+    if direction == 1:
+        for idx, coefficient in enumerate(poly):
+            split_polynomials[idx % p].append(coefficient)
+    else:
+        for idx in range(n):
+            split_polynomials[idx % p].append(poly[-idx])
     # Decomposing the polynomial:
     # ax^5 + bx^4 + cx^3 + dx^2 + ex + f
     # = x^2(ax^3 + d) + x(bx^3 + e) + (cx^3 + f)
@@ -80,21 +134,16 @@ def evaluate_poly(poly: List[complex]) -> List[complex]:
     #
     # NOTE: for all k, m: f_k(w^m) = f_k(w^(m+6))
 
-    evaluated_split_poly: List[List[complex]] = list(
-        map(evaluate_poly, split_polynomials)
-    )
+    sub_plan = plan.sub_plan
+    assert sub_plan is not None
+    evaluated_split_poly: List[List[complex]] = [
+        evaluate_poly_with_plan(split_polynomial, sub_plan)
+        for split_polynomial in split_polynomials
+    ]
     # evaluated_split_poly = [[f_0(t=1), f_0(t=-1)], [f_1(t=1), f_1(t=-1)], [f_2(t=1), f_2(t=-1)]] =>
     # As functions of z:
     # [[f_0(w^0), f_0(w^3)], [f_1(w^0), f_1(w^3)], [f_2(w^0), f_2(w^3)]]
 
-    # initialize zeroes for result
-    result: List[complex] = [0 for _ in range(n)]
-
-    if VERBOSE:
-        print("unit_roots_of_nth_order", unit_roots_of_nth_order)
-        print("evaluated_split_poly", evaluated_split_poly)
-        print("largest_prime_factor", p)
-
     # Reminder: f(x) = ax^5 + bx^4 + cx^3 + dx^2 + ex + f
     # f(x) = x^2(ax^3 + d) + x(bx^3 + e) + (cx^3 + f)
     # f(w^m) = w^(2m)(a*w^(3m) + d) + w^m(b*w^(3m) + e) + w^0(c*w^(3m) + f)
@@ -114,6 +163,28 @@ def evaluate_poly(poly: List[complex]) -> List[complex]:
     # [[f_0(w^0), f_0(w^3)], [f_1(w^0), f_1(w^3)], [f_2(w^0), f_2(w^3)]]
     #
     # For all k in 0,1,2, f_k(w^(m*3)) is in the position [k, m % 2] in the evaluated array
+    return combine_evaluated_split_poly(evaluated_split_poly, plan)
+
+
+def combine_evaluated_split_poly(
+    evaluated_split_poly: List[List[complex]], plan: FFTPlan
+) -> List[complex]:
+    """The last step of evaluate_poly_with_plan - f(w^m) from the values of the
+    p split polynomials, f_k(w^(m*p))"""
+    n = plan.n
+    q = plan.q
+    unit_roots_of_nth_order = plan.twiddles
+    if is_power_of_2(n):
+        # The plan only has the first half of the twiddles, w^(i + q) = -w^i
+        evens, odds = evaluated_split_poly
+        combined: List[complex] = [0j] * n
+        for i in range(q):
+            odd = unit_roots_of_nth_order[i] * odds[i]
+            combined[i] = evens[i] + odd
+            combined[i + q] = evens[i] - odd
+        return combined
+    # initialize zeroes for result
+    result: List[complex] = [0 for _ in range(n)]
     for j, single_evaluated_poly in enumerate(evaluated_split_poly):
         # n * p multiplications of every level.
         #
@@ -123,6 +194,32 @@ def evaluate_poly(poly: List[complex]) -> List[complex]:
             result[i] += (
                 unit_roots_of_nth_order[(i * j) % n] * single_evaluated_poly[i % q]
             )
-    if VERBOSE:
-        print("result", result)
     return result
+
+
+def evaluate_poly_bluestein(
+    poly: List[complex], bluestein: BluesteinPlan, direction: Direction = 1
+) -> List[complex]:
+    """Evaluate a polynomial with n terms at the n roots of unity, for any n,
+    using power of 2 transforms of size m >= 2n - 1"""
+    # https://en.wikipedia.org/wiki/Chirp_Z-transform#Bluestein's_algorithm
+    #
+    # As i*k = (i^2 + k^2 - (i-k)^2) / 2, writing c[k] = e^(pi*i*k^2/n):
+    # f(w^i) = sum_k poly[k] * w^(i*k) = c[i] * sum_k (poly[k] * c[k]) * conj(c[i-k])
+    # The sum is a convolution of (poly * c) and conj(c), which is done by
+    # multiplying the values of both at the m roots of unity.
+    n = len(poly)
+    m = bluestein.m
+    chirp = bluestein.chirp
+    padded_plan = bluestein.padded_plan
+    padded_poly: List[complex] = [0j] * m
+    for k in range(n):
+        padded_poly[k] = poly[k * direction] * chirp[k]
+    padded_values = evaluate_poly_with_plan(padded_poly, padded_plan)
+    # Back from values to coefficients, as in values_to_poly
+    convolution_values = [
+        value * filter_value
+        for value, filter_value in zip(padded_values, bluestein.filter_values)
+    ]
+    convolution = evaluate_poly_with_plan(convolution_values, padded_plan, -1)
+    return [chirp[i] * convolution[i] / m for i in range(n)]
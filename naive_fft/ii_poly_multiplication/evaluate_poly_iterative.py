@@ -0,0 +1,105 @@
+from typing import MutableSequence, Optional, Sequence, TypeVar, Union
+
+import numpy as np
+
+from naive_fft.ii_poly_multiplication.evaluate_poly_numpy import (
+    ComplexArray,
+    bit_reversal_indices,
+    butterflies_rows,
+    numpy_twiddles,
+)
+from naive_fft.ii_poly_multiplication.plan import (
+    Direction,
+    FFTPlan,
+    get_plan,
+    is_power_of_2,
+)
+
+# Any mutable buffer of complex values - a list or a complex numpy array
+Buffer = TypeVar("Buffer", MutableSequence[complex], ComplexArray)
+
+
+def evaluate_poly_iterative(
+    poly: Union[Sequence[complex], ComplexArray],
+    out: Optional[Buffer] = None,
+    plan: Optional[FFTPlan] = None,
+    direction: Direction = 1,
+) -> Union[Buffer, MutableSequence[complex]]:
+    """Same as evaluate_poly for power of 2 sizes, computed in place in `out`.
+    `out` may be `poly` itself. A new list is allocated when it is omitted."""
+    # The recursion of evaluate_poly, unrolled: reordering the coefficients by
+    # their bit reversed index puts every sub polynomial of every level of the
+    # recursion in a contiguous block, so all the levels can be computed in
+    # place, from the smallest blocks to the entire buffer.
+    n = len(poly)
+    if n == 0:
+        return [] if out is None else out
+    if plan is None:
+        plan = get_plan(n)
+    assert plan.n == n and is_power_of_2(n), "Expected a power of 2 size"
+    buffer: Union[Buffer, MutableSequence[complex]]
+    if out is None:
+        buffer = [0j] * n
+    else:
+        assert len(out) == n, "Output buffer size does not match the input"
+        buffer = out
+    if buffer is poly:
+        if direction == -1:
+            # Negated indices, before the bit reversal
+            for i in range(1, (n + 1) // 2):
+                buffer[i], buffer[n - i] = buffer[n - i], buffer[i]
+        for i, j in enumerate(bit_reversal_indices(plan).tolist()):
+            if i < j:
+                buffer[i], buffer[j] = buffer[j], buffer[i]
+    else:
+        permutation = bit_reversal_indices(plan, direction)
+        if isinstance(buffer, np.ndarray):
+            buffer[:] = np.asarray(poly)[permutation]
+        else:
+            for i, j in enumerate(permutation.tolist()):
+                buffer[i] = poly[j]
+    if isinstance(buffer, np.ndarray):
+        butterflies_rows(buffer.reshape(1, n), numpy_twiddles(plan))
+    else:
+        _butterflies(buffer, plan.twiddles)
+    return buffer
+
+
+def _butterflies(buffer: MutableSequence[complex], twiddles: Sequence[complex]) -> None:
+    n = len(buffer)
+    # h is the size of the already evaluated blocks
+    h = 1
+    # Two radix 2 levels at a time (radix 2^2): blocks a, b, c, d of size h
+    # are merged into one block of size 4h with 3 twiddle multiplications
+    while 4 * h <= n:
+        stride = n // (4 * h)
+        for j in range(h):
+            # w_2h^j, w_4h^j and w_4h^(j+h)
+            w_1 = twiddles[2 * j * stride]
+            w_2 = twiddles[j * stride]
+            w_3 = twiddles[(j + h) * stride]
+            for i_0 in range(j, n, 4 * h):
+                i_1 = i_0 + h
+                i_2 = i_1 + h
+                i_3 = i_2 + h
+                a = buffer[i_0]
+                b = buffer[i_1] * w_1
+                c = buffer[i_2]
+                d = buffer[i_3] * w_1
+                a, b = a + b, a - b
+                c, d = (c + d) * w_2, (c - d) * w_3
+                buffer[i_0] = a + c
+                buffer[i_2] = a - c
+                buffer[i_1] = b + d
+                buffer[i_3] = b - d
+        h *= 4
+    if h < n:
+        # A single radix 2 level is left when log2(n) is odd
+        for j in range(h):
+            w = twiddles[j]
+            for i_0 in range(j, n, 2 * h):
+                i_1 = i_0 + h
+                a = buffer[i_0]
+                b = buffer[i_1] * w
+                buffer[i_0] = a + b
+                buffer[i_1] = a - b
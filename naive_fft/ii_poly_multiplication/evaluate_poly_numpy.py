@@ -0,0 +1,207 @@
+from typing import Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from naive_fft.ii_poly_multiplication.plan import (
+    Direction,
+    FFTPlan,
+    bit_reversal_permutation,
+    get_plan,
+    is_power_of_2,
+    plan_table,
+)
+
+ComplexArray = npt.NDArray[np.complex128]
+IndexArray = npt.NDArray[np.intp]
+
+# The numpy tables of a plan are kept in plan.tables, so that the plan cache
+# bounds them together with the plans
+
+
+def numpy_twiddles(plan: FFTPlan) -> ComplexArray:
+    """plan.twiddles as a numpy array"""
+    return plan_table(
+        plan, "twiddles", lambda: np.array(plan.twiddles, dtype=np.complex128)
+    )
+
+
+def _numpy_tables(plan: FFTPlan) -> Tuple[ComplexArray, ComplexArray]:
+    """Twiddles of a single recursion level, as numpy arrays:
+    inner_twiddles[j, r] = w^(j*r) for j < p, r < q
+    radix_matrix[s, j] = w^(s*j*q) - the DFT matrix of size p"""
+    n = plan.n
+    p_range = np.arange(plan.p)
+
+    def inner_twiddles() -> ComplexArray:
+        return numpy_twiddles(plan)[np.outer(p_range, np.arange(plan.q)) % n]
+
+    def radix_matrix() -> ComplexArray:
+        return numpy_twiddles(plan)[(np.outer(p_range, p_range) * plan.q) % n]
+
+    return (
+        plan_table(plan, "inner_twiddles", inner_twiddles),
+        plan_table(plan, "radix_matrix", radix_matrix),
+    )
+
+
+def bit_reversal_indices(plan: FFTPlan, direction: Direction = 1) -> IndexArray:
+    """bit_reversal_permutation of the plan size, negated mod n for
+    direction=-1, which reads the coefficients in the order of direction=-1"""
+    n = plan.n
+    permutation = plan_table(plan, "bit_reversal", lambda: bit_reversal_permutation(n))
+    if direction == 1:
+        return permutation
+    return plan_table(plan, "negated_bit_reversal", lambda: -permutation % n)
+
+
+def butterflies_rows(rows: ComplexArray, twiddles: ComplexArray) -> None:
+    """The butterflies of evaluate_poly_iterative, in place, for every row of a
+    (batch, n) array whose rows are already in bit reversed order"""
+    batch, n = rows.shape
+    h = 1
+    while 4 * h <= n:
+        stride = n // (4 * h)
+        j = np.arange(h)
+        w_1 = twiddles[2 * j * stride]
+        w_2 = twiddles[j * stride]
+        w_3 = twiddles[(j + h) * stride]
+        blocks = rows.reshape(batch, n // (4 * h), 4, h)
+        a = blocks[:, :, 0, :].copy()
+        b = blocks[:, :, 1, :] * w_1
+        c = blocks[:, :, 2, :].copy()
+        d = blocks[:, :, 3, :] * w_1
+        a, b = a + b, a - b
+        c, d = (c + d) * w_2, (c - d) * w_3
+        blocks[:, :, 0, :] = a + c
+        blocks[:, :, 2, :] = a - c
+        blocks[:, :, 1, :] = b + d
+        blocks[:, :, 3, :] = b - d
+        h *= 4
+    if h < n:
+        w = twiddles[:h]
+        blocks = rows.reshape(batch, n // (2 * h), 2, h)
+        a = blocks[:, :, 0, :].copy()
+        b = blocks[:, :, 1, :] * w
+        blocks[:, :, 0, :] = a + b
+        blocks[:, :, 1, :] = a - b
+
+
+def _negated_split_indices(plan: FFTPlan) -> IndexArray:
+    """indices[j, r] = -(r*p + j) mod n - the split polynomials of the
+    coefficients read in the order of direction=-1"""
+    n = plan.n
+
+    def build() -> IndexArray:
+        indices = np.arange(n).reshape(plan.q, plan.p).T
+        result: IndexArray = -indices % n
+        return result
+
+    return plan_table(plan, "negated_split", build)
+
+
+def _numpy_bluestein_tables(plan: FFTPlan) -> Tuple[ComplexArray, ComplexArray]:
+    bluestein = plan.bluestein
+    assert bluestein is not None
+    chirp = plan_table(
+        plan, "chirp", lambda: np.array(bluestein.chirp, dtype=np.complex128)
+    )
+    filter_values = plan_table(
+        plan,
+        "filter_values",
+        lambda: np.array(bluestein.filter_values, dtype=np.complex128),
+    )
+    return chirp, filter_values
+
+
+def _evaluate_rows_bluestein(
+    rows: ComplexArray, plan: FFTPlan, direction: Direction
+) -> ComplexArray:
+    """Same as evaluate_poly_bluestein, for every row of a (batch, n) array"""
+    bluestein = plan.bluestein
+    assert bluestein is not None
+    n = plan.n
+    m = bluestein.m
+    chirp, filter_values = _numpy_bluestein_tables(plan)
+    padded_rows = np.zeros((rows.shape[0], m), dtype=np.complex128)
+    if direction == 1:
+        padded_rows[:, :n] = rows * chirp
+    else:
+        padded_rows[:, :n] = rows[:, -np.arange(n) % n] * chirp
+    padded_values = _evaluate_rows(padded_rows, bluestein.padded_plan)
+    padded_values *= filter_values
+    convolution = _evaluate_rows(padded_values, bluestein.padded_plan, -1)
+    result: ComplexArray = convolution[:, :n] * chirp / m
+    return result
+
+
+def _evaluate_rows(
+    rows: ComplexArray, plan: FFTPlan, direction: Direction = 1
+) -> ComplexArray:
+    """Evaluate every row of a (batch, n) array as a polynomial at the n roots
+    of unity"""
+    # Same decomposition as evaluate_poly, where all the sub polynomials of all
+    # the rows are handled together as a single batch
+    n = plan.n
+    if n == 1:
+        return rows.copy()
+    if plan.bluestein is not None:
+        return _evaluate_rows_bluestein(rows, plan, direction)
+    if is_power_of_2(n):
+        # The iterative kernel, for all the rows together
+        reordered_rows = rows[:, bit_reversal_indices(plan, direction)]
+        butterflies_rows(reordered_rows, numpy_twiddles(plan))
+        return reordered_rows
+    batch = rows.shape[0]
+    p = plan.p
+    q = plan.q
+    sub_plan = plan.sub_plan
+    assert sub_plan is not None
+    # split_polynomials[b, k] = rows[b, k::p], gathered from the negated
+    # indices for direction=-1
+    if direction == 1:
+        split_polynomials = rows.reshape(batch, q, p).transpose(0, 2, 1)
+    else:
+        split_polynomials = rows[:, _negated_split_indices(plan)]
+    evaluated_split_poly = _evaluate_rows(
+        split_polynomials.reshape(batch * p, q), sub_plan
+    ).reshape(batch, p, q)
+    # For i = s*q + r:
+    # f(w^i) = sum_j w^(i*j) f_j(w^(r*p)) = sum_j w^(s*j*q) * (w^(r*j) f_j(w^(r*p)))
+    inner_twiddles, radix_matrix = _numpy_tables(plan)
+    result: ComplexArray = np.matmul(
+        radix_matrix, evaluated_split_poly * inner_twiddles
+    )
+    return result.reshape(batch, n)
+
+
+def evaluate_poly_batch(polys: npt.ArrayLike, direction: Direction = 1) -> ComplexArray:
+    """Evaluate every row of a (batch, n) array, sharing the plan and the
+    twiddles between all the rows"""
+    rows = np.ascontiguousarray(polys, dtype=np.complex128)
+    assert rows.ndim == 2, "Expected a two dimensional array"
+    if rows.size == 0:
+        return rows.copy()
+    return _evaluate_rows(rows, get_plan(rows.shape[1]), direction)
+
+
+def evaluate_poly_numpy(poly: npt.ArrayLike, direction: Direction = 1) -> ComplexArray:
+    """Vectorized evaluate_poly - evaluate a polynomial with n terms at the n
+    roots of unity"""
+    coefficients = np.asarray(poly, dtype=np.complex128)
+    assert coefficients.ndim == 1, "Expected a one dimensional array"
+    n = coefficients.shape[0]
+    if n == 0:
+        return coefficients.copy()
+    return evaluate_poly_batch(coefficients.reshape(1, n), direction).reshape(n)
+
+
+def values_to_poly_numpy(values: npt.ArrayLike) -> ComplexArray:
+    """Vectorized values_to_poly"""
+    values_array = np.asarray(values, dtype=np.complex128)
+    n = values_array.shape[0]
+    if n == 0:
+        return values_array.copy()
+    reconstructed = evaluate_poly_numpy(values_array, -1)
+    reconstructed /= n
+    return reconstructed
@@ -0,0 +1,83 @@
+import cmath
+from math import pi
+from typing import Dict, List, Optional, Sequence
+
+from naive_fft.i_number_theory.number_theory import factorize
+from naive_fft.ii_poly_multiplication.evaluate_poly import evaluate_poly_with_plan
+from naive_fft.ii_poly_multiplication.plan import get_plan
+from naive_fft.iv_performance_analysis import cost_model
+
+# Pruned evaluation, for polynomials that are mostly zero padding, or when only
+# some of the values are needed.
+#
+# With poly of length <= m terms, m dividing n = s * m, and w = e^(2*pi*i/n):
+# f(w^(s*q + r)) = sum_{j < m} (poly[j] * w^(j*r)) * (w^s)^(j*q)
+# so the values whose index is r mod s are the values of a polynomial of m
+# terms at the m'th roots of unity. The s - 1 levels of the recursion above
+# it, which only add zeros, are skipped, as are the classes r of which no value
+# is needed. A class with only a few needed values is evaluated directly, with
+# Horner's method.
+
+
+def _divisors(n: int) -> List[int]:
+    divisors = [1]
+    for prime, power in factorize(n).items():
+        divisors = [
+            divisor * prime**exponent
+            for divisor in divisors
+            for exponent in range(power + 1)
+        ]
+    return sorted(divisors)
+
+
+def _horner(poly: Sequence[complex], point: complex) -> complex:
+    result = 0j
+    for coefficient in reversed(poly):
+        result = result * point + coefficient
+    return result
+
+
+def _root_of_unity(k: int, n: int) -> complex:
+    return cmath.exp(2j * pi * (k % n) / n)
+
+
+def evaluate_poly_pruned(
+    poly: List[complex], n: int, outputs: Optional[Sequence[int]] = None
+) -> List[complex]:
+    """Same as evaluate_poly for poly padded with zeros to n terms, returning
+    only the values at the indices in outputs (all n of them by default)"""
+    length = len(poly)
+    if length > n:
+        raise ValueError("The polynomial has more than n terms")
+    output_indices = list(range(n)) if outputs is None else [k % n for k in outputs]
+    if length == 0:
+        return [0j] * len(output_indices)
+    cost_model.ensure_profile()
+
+    # The sub polynomial size m >= length with the cheapest needed transforms
+    def classes_cost(m: int) -> float:
+        needed_classes = len({k % (n // m) for k in output_indices})
+        return needed_classes * cost_model.python_transform_cost(m)
+
+    m = min((d for d in _divisors(n) if d >= length), key=classes_cost)
+    s = n // m
+    positions_by_class: Dict[int, List[int]] = {}
+    for position, k in enumerate(output_indices):
+        positions_by_class.setdefault(k % s, []).append(position)
+
+    result: List[complex] = [0j] * len(output_indices)
+    for r, positions in positions_by_class.items():
+        if cost_model.horner_cost(length, len(positions)) < (
+            cost_model.python_transform_cost(m)
+        ):
+            for position in positions:
+                point = _root_of_unity(output_indices[position], n)
+                result[position] = _horner(poly, point)
+            continue
+        twiddled: List[complex] = [0j] * m
+        for j in range(length):
+            twiddled[j] = poly[j] * _root_of_unity(j * r, n)
+        values = evaluate_poly_with_plan(twiddled, get_plan(m))
+        for position in positions:
+            result[position] = values[output_indices[position] // s]
+    return result
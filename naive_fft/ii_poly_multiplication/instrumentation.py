@@ -0,0 +1,179 @@
+"""Counters of the levels of evaluate_poly, reported to pluggable sinks:
+
+sink = MemorySink()
+with tracing(sink):
+    fft(samples)
+for (path, n), totals in sink.totals().items():
+    print(path, n, totals.calls, totals.elapsed_ns)
+
+While no sink is installed, evaluate_poly only checks ENABLED once per level.
+Polynomials evaluated by the worker processes of the parallel mode are not
+traced."""
+
+import contextlib
+import cProfile
+import json
+import threading
+import time
+from typing import (
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    NamedTuple,
+    Optional,
+    TextIO,
+    Tuple,
+)
+
+from naive_fft.ii_poly_multiplication.plan import Direction, FFTPlan
+
+# How a level was evaluated: a single coefficient, Bluestein's algorithm for
+# large prime factors, the iterative power of 2 kernel, or a recursion step
+# splitting the polynomial into p sub polynomials, which costs n * p
+Path = Literal["trivial", "bluestein", "iterative", "mixed_radix"]
+
+
+class TraceEvent(NamedTuple):
+    # 0 for the polynomial passed to evaluate_poly
+    depth: int
+    n: int
+    path: Path
+    # p for mixed radix levels, 4 for the radix 2^2 kernel and 0 otherwise
+    radix: int
+    # Complex multiplications and allocated lists of this level, not counting
+    # the levels below it
+    complex_multiplies: int
+    allocations: int
+    # Including the levels below it
+    elapsed_ns: int
+
+
+Sink = Callable[[TraceEvent], None]
+
+
+class LevelTotals(NamedTuple):
+    calls: int
+    complex_multiplies: int
+    allocations: int
+    elapsed_ns: int
+
+
+ENABLED = False
+_SINKS: Tuple[Sink, ...] = ()
+_SINKS_LOCK = threading.Lock()
+
+
+class _Depth(threading.local):
+    depth = 0
+
+
+_DEPTH = _Depth()
+
+
+class MemorySink:
+    """Keeps every event, and sums them up by path and size"""
+
+    def __init__(self) -> None:
+        self.events: List[TraceEvent] = []
+
+    def __call__(self, event: TraceEvent) -> None:
+        self.events.append(event)
+
+    def totals(self) -> Dict[Tuple[Path, int], LevelTotals]:
+        totals: Dict[Tuple[Path, int], LevelTotals] = {}
+        for event in self.events:
+            key = (event.path, event.n)
+            calls, multiplies, allocations, elapsed_ns = totals.get(
+                key, LevelTotals(0, 0, 0, 0)
+            )
+            totals[key] = LevelTotals(
+                calls + 1,
+                multiplies + event.complex_multiplies,
+                allocations + event.allocations,
+                elapsed_ns + event.elapsed_ns,
+            )
+        return totals
+
+    def clear(self) -> None:
+        self.events.clear()
+
+
+class JsonLinesSink:
+    """Writes every event as a JSON object on its own line"""
+
+    def __init__(self, output: TextIO):
+        self.output = output
+
+    def __call__(self, event: TraceEvent) -> None:
+        self.output.write(json.dumps(event._asdict()) + "\n")
+
+
+def _install(sinks: Tuple[Sink, ...]) -> None:
+    global ENABLED, _SINKS
+    _SINKS = sinks
+    ENABLED = bool(sinks)
+
+
+@contextlib.contextmanager
+def tracing(
+    *sinks: Sink, profiler: Optional[cProfile.Profile] = None
+) -> Iterator[None]:
+    """Report the levels of every evaluate_poly call in the block to the sinks.
+    A given profiler is enabled for the block too, so that its function
+    statistics cover the same calls."""
+    with _SINKS_LOCK:
+        previous = _SINKS
+        _install(previous + sinks)
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        with _SINKS_LOCK:
+            _install(tuple(sink for sink in _SINKS if sink not in sinks))
+
+
+def _level_counts(plan: FFTPlan) -> Tuple[Path, int, int, int]:
+    """Path, radix, complex multiplications and allocations of a level"""
+    n = plan.n
+    if n == 1:
+        return "trivial", 0, 0, 1
+    if plan.bluestein is not None:
+        # The chirp is applied to the input and the output, and the filter to
+        # the values of the padded polynomial
+        return "bluestein", 0, 2 * n + plan.bluestein.m, 3
+    if n & (n - 1) == 0:
+        # n multiplications per radix 4 stage, and n / 2 for a last radix 2 one
+        stages = n.bit_length() - 1
+        return "iterative", 4, n * (stages // 2) + n // 2 * (stages % 2), 1
+    # p split polynomials and the result
+    return "mixed_radix", plan.p, n * plan.p, plan.p + 1
+
+
+def traced(
+    evaluate: Callable[[List[complex], FFTPlan, Direction], List[complex]],
+    poly: List[complex],
+    plan: FFTPlan,
+    direction: Direction,
+) -> List[complex]:
+    """evaluate(poly, plan, direction), reporting the level to the installed
+    sinks"""
+    depth = _DEPTH.depth
+    _DEPTH.depth = depth + 1
+    start = time.perf_counter_ns()
+    try:
+        result = evaluate(poly, plan, direction)
+    finally:
+        _DEPTH.depth = depth
+    elapsed_ns = time.perf_counter_ns() - start
+    path, radix, complex_multiplies, allocations = _level_counts(plan)
+    event = TraceEvent(
+        depth, plan.n, path, radix, complex_multiplies, allocations, elapsed_ns
+    )
+    for sink in _SINKS:
+        sink(event)
+    return result
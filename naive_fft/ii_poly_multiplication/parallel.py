@@ -0,0 +1,170 @@
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from types import TracebackType
+from typing import List, Optional, Type
+
+import numpy as np
+
+from naive_fft.ii_poly_multiplication.evaluate_poly import (
+    combine_evaluated_split_poly,
+    evaluate_poly_with_plan,
+)
+from naive_fft.ii_poly_multiplication.plan import FFTPlan, get_plan
+
+# Below this size the transform is computed serially, as sending the work to
+# other processes costs more than it saves. Measured with
+# iv_performance_analysis.plot_performance.calibrate_parallel_cutoff
+PARALLEL_CUTOFF = 2**16
+
+COMPLEX_SIZE_BYTES = np.dtype(np.complex128).itemsize
+
+
+def available_cpus() -> int:
+    """The CPUs this process may run on, which is fewer than os.cpu_count()
+    under an affinity mask"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _evaluate_shared_slice(
+    input_name: str,
+    n: int,
+    start: int,
+    stride: int,
+    output_name: str,
+) -> None:
+    """Worker side: evaluate input[start::stride] and write the values to the
+    output at the same position the slice came from, output[start::stride]"""
+    input_memory = shared_memory.SharedMemory(name=input_name)
+    try:
+        poly = np.ndarray((n,), dtype=np.complex128, buffer=input_memory.buf)
+        split_polynomial: List[complex] = poly[start::stride].tolist()
+        del poly
+    finally:
+        input_memory.close()
+    evaluated = evaluate_poly_with_plan(
+        split_polynomial, get_plan(len(split_polynomial))
+    )
+    output_memory = shared_memory.SharedMemory(name=output_name)
+    try:
+        output = np.ndarray((n,), dtype=np.complex128, buffer=output_memory.buf)
+        output[start::stride] = evaluated
+        del output
+    finally:
+        output_memory.close()
+
+
+def _split_levels(plan: FFTPlan, workers: int) -> List[FFTPlan]:
+    """The plans of the recursion levels that are split in the parent process -
+    the top level, and the second one when the top level alone does not give
+    enough sub-transforms to keep all the workers busy"""
+    levels = [plan]
+    if plan.p < workers and plan.q > 1:
+        levels.append(get_plan(plan.q))
+    return levels
+
+
+def evaluate_poly_parallel(
+    poly: List[complex],
+    workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> List[complex]:
+    """Same as evaluate_poly, where the sub-transforms of the first one or two
+    levels of the recursion are computed in a process pool. The polynomial and
+    the values are passed through shared memory."""
+    n = len(poly)
+    if n == 0:
+        return []
+    plan = get_plan(n)
+    if plan.bluestein is not None or n == 1:
+        return evaluate_poly_with_plan(poly, plan)
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=workers) as new_executor:
+            return evaluate_poly_parallel(poly, workers, new_executor)
+    levels = _split_levels(plan, workers or 1)
+    # The sub polynomials of the split levels are strided slices of poly
+    stride = 1
+    for level in levels:
+        stride *= level.p
+    input_memory = shared_memory.SharedMemory(create=True, size=n * COMPLEX_SIZE_BYTES)
+    output_memory = shared_memory.SharedMemory(create=True, size=n * COMPLEX_SIZE_BYTES)
+    try:
+        shared_poly = np.ndarray((n,), dtype=np.complex128, buffer=input_memory.buf)
+        shared_poly[:] = poly
+        del shared_poly
+        futures = [
+            executor.submit(
+                _evaluate_shared_slice,
+                input_memory.name,
+                n,
+                start,
+                stride,
+                output_memory.name,
+            )
+            for start in range(stride)
+        ]
+        for future in futures:
+            future.result()
+        output = np.ndarray((n,), dtype=np.complex128, buffer=output_memory.buf)
+        evaluated: List[complex] = output.tolist()
+        del output
+    finally:
+        input_memory.close()
+        input_memory.unlink()
+        output_memory.close()
+        output_memory.unlink()
+    return _combine_levels(evaluated, levels, 0, 1)
+
+
+def _combine_levels(
+    evaluated: List[complex], levels: List[FFTPlan], start: int, stride: int
+) -> List[complex]:
+    """Recombine the sub-transforms stored at evaluated[start::stride], in the
+    same layout the workers wrote them"""
+    plan = levels[0]
+    if len(levels) == 1:
+        # Sub polynomial k of this level was written to [start + k*stride::stride*p]
+        evaluated_split_poly = [
+            evaluated[start + k * stride :: stride * plan.p] for k in range(plan.p)
+        ]
+    else:
+        evaluated_split_poly = [
+            _combine_levels(evaluated, levels[1:], start + k * stride, stride * plan.p)
+            for k in range(plan.p)
+        ]
+    return combine_evaluated_split_poly(evaluated_split_poly, plan)
+
+
+class ParallelEvaluator:
+    """Keeps a process pool alive between transforms:
+
+    with ParallelEvaluator(workers=8) as evaluator:
+        values = evaluator.evaluate_poly(poly)
+    """
+
+    def __init__(self, workers: int, cutoff: Optional[int] = None) -> None:
+        self.workers = workers
+        self.cutoff = PARALLEL_CUTOFF if cutoff is None else cutoff
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "ParallelEvaluator":
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        assert self._executor is not None
+        self._executor.shutdown()
+        self._executor = None
+
+    def evaluate_poly(self, poly: List[complex]) -> List[complex]:
+        assert self._executor is not None, "Use ParallelEvaluator as a context"
+        if len(poly) < self.cutoff:
+            return evaluate_poly_with_plan(poly, get_plan(len(poly)))
+        return evaluate_poly_parallel(poly, self.workers, self._executor)
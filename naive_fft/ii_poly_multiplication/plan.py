@@ -0,0 +1,276 @@
+import cmath
+import collections
+import sys
+import threading
+from dataclasses import dataclass, field
+from math import pi
+from typing import Any, Callable, Dict, List, Literal, NamedTuple, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from naive_fft.i_number_theory.number_theory import factorize
+from naive_fft.iv_performance_analysis.cost_model import ensure_profile
+
+# Plans are cached per transform size, similarly to FFTW / pocketfft "plans".
+# Both bounds are enforced - the least recently used plans are evicted first.
+MAX_CACHED_PLANS = 128
+MAX_PLAN_CACHE_BYTES = 64 * 1024 * 1024
+
+# Every twiddle is a python complex object, referenced from a tuple slot
+BYTES_PER_TWIDDLE = sys.getsizeof(0j) + 8
+
+# Sizes whose largest prime factor is above this threshold are evaluated with
+# Bluestein's algorithm instead of the O(n * p) mixed radix recursion.
+# Change it with set_large_prime_threshold, measure it with
+# iv_performance_analysis.plot_performance.calibrate_large_prime_threshold
+LARGE_PRIME_THRESHOLD = 250
+
+# The sign of the exponent of the roots of unity a polynomial is evaluated at:
+# 1 evaluates it at w^k, and -1 at w^(-k), which is the fft of its coefficients
+Direction = Literal[1, -1]
+
+
+@dataclass(frozen=True)
+class BluesteinPlan:
+    """Tables for evaluating a polynomial with n terms as a cyclic convolution
+    of power of 2 size m >= 2n - 1"""
+
+    m: int
+    # chirp[k] = e^(pi*i*k^2/n)
+    chirp: Tuple[complex, ...]
+    # The convolution filter conj(chirp), wrapped around to size m, evaluated
+    # at the m roots of unity
+    filter_values: Tuple[complex, ...]
+    padded_plan: "FFTPlan"
+
+
+@dataclass(frozen=True)
+class FFTPlan:
+    """Everything needed to evaluate a polynomial with n terms at the n roots
+    of unity, computed once per n"""
+
+    n: int
+    # Sorted (prime, power) pairs, as returned by factorize
+    factorization: Tuple[Tuple[int, int], ...]
+    # Largest prime factor - the radix used at this level of the recursion
+    p: int
+    # n // p - the size of the sub-transforms
+    q: int
+    # twiddles[k] = e^(2*pi*i*k/n), computed directly and not by repeated
+    # multiplication, so the rounding error does not accumulate. Powers of 2
+    # only keep the first n / 2, which is all the iterative kernel reads.
+    twiddles: Tuple[complex, ...]
+    # Plan of the next level of the recursion tree, None for n == 1 and for
+    # powers of 2, which are not evaluated recursively
+    sub_plan: Optional["FFTPlan"]
+    # Set when p > LARGE_PRIME_THRESHOLD, the mixed radix tables are then empty
+    bluestein: Optional[BluesteinPlan] = None
+    # Arrays derived from the tables above by the kernels that need them -
+    # numpy copies of the twiddles, index permutations - added by plan_table
+    tables: Dict[str, npt.NDArray[Any]] = field(
+        default_factory=dict, compare=False, hash=False, repr=False
+    )
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the plan, including the plans it
+        references. An evicted plan is only freed once no cached plan
+        references it, so a plan shared by several cached plans is counted in
+        each of them, and the total of the cache is an upper bound."""
+        twiddles_count = len(self.twiddles)
+        nbytes = sum(table.nbytes for table in self.tables.values())
+        if self.sub_plan is not None:
+            nbytes += self.sub_plan.nbytes
+        if self.bluestein is not None:
+            twiddles_count += len(self.bluestein.chirp)
+            twiddles_count += len(self.bluestein.filter_values)
+            nbytes += self.bluestein.padded_plan.nbytes
+        return nbytes + twiddles_count * BYTES_PER_TWIDDLE
+
+
+class PlanCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    nbytes: int
+
+
+_PLAN_CACHE: "collections.OrderedDict[int, FFTPlan]" = collections.OrderedDict()
+_PLAN_CACHE_LOCK = threading.Lock()
+_plan_cache_hits = 0
+_plan_cache_misses = 0
+_plan_cache_evictions = 0
+
+
+def is_power_of_2(n: int) -> bool:
+    return n > 0 and n & (n - 1) == 0
+
+
+def bit_reversal_permutation(n: int) -> npt.NDArray[np.intp]:
+    """permutation[i] is i with its log2(n) bits reversed"""
+    assert is_power_of_2(n), "Bit reversal is defined for powers of 2"
+    bits = n.bit_length() - 1
+    indices = np.arange(n)
+    permutation = np.zeros(n, dtype=np.intp)
+    for bit in range(bits):
+        permutation |= ((indices >> bit) & 1) << (bits - 1 - bit)
+    return permutation
+
+
+def make_plan(n: int, large_prime_threshold: Optional[int] = None) -> FFTPlan:
+    """Build a plan without consulting the cache for this level. Sub plans are
+    taken from the cache. large_prime_threshold overrides LARGE_PRIME_THRESHOLD
+    for this level only."""
+    if n < 1:
+        raise ValueError("Cannot plan a transform of size < 1")
+    if large_prime_threshold is None:
+        large_prime_threshold = LARGE_PRIME_THRESHOLD
+    factorization = tuple(sorted(factorize(n).items()))
+    p = max((prime for prime, _ in factorization), default=1)
+    q = n // p
+    if p > max(large_prime_threshold, 2):
+        return FFTPlan(
+            n=n,
+            factorization=factorization,
+            p=p,
+            q=q,
+            twiddles=(),
+            sub_plan=None,
+            bluestein=make_bluestein_plan(n),
+        )
+    if n > 1 and is_power_of_2(n):
+        # Evaluated by the iterative kernel, without sub plans
+        return FFTPlan(
+            n=n,
+            factorization=factorization,
+            p=p,
+            q=q,
+            twiddles=tuple(cmath.exp(2j * pi * k / n) for k in range(n // 2)),
+            sub_plan=None,
+        )
+    twiddles = tuple(cmath.exp(2j * pi * k / n) for k in range(n))
+    sub_plan = get_plan(q) if n > 1 else None
+    return FFTPlan(
+        n=n,
+        factorization=factorization,
+        p=p,
+        q=q,
+        twiddles=twiddles,
+        sub_plan=sub_plan,
+    )
+
+
+def make_bluestein_plan(n: int) -> BluesteinPlan:
+    # Imported here, as evaluate_poly itself depends on the plans
+    from naive_fft.ii_poly_multiplication.evaluate_poly import (
+        evaluate_poly_with_plan,
+    )
+
+    # Smallest power of 2 >= 2n - 1, so the cyclic convolution does not wrap
+    m = 1 << (2 * n - 2).bit_length()
+    # k^2 is reduced mod 2n before the division to keep the phase accurate
+    chirp = tuple(cmath.exp(1j * pi * ((k * k) % (2 * n)) / n) for k in range(n))
+    filter_coefficients: List[complex] = [0j] * m
+    for k in range(n):
+        filter_coefficients[k] = chirp[k].conjugate()
+        filter_coefficients[-k] = chirp[k].conjugate()
+    padded_plan = get_plan(m)
+    filter_values = tuple(evaluate_poly_with_plan(filter_coefficients, padded_plan))
+    return BluesteinPlan(
+        m=m,
+        chirp=chirp,
+        filter_values=filter_values,
+        padded_plan=padded_plan,
+    )
+
+
+def get_plan(n: int) -> FFTPlan:
+    """Return the cached plan for size n, building it on first use"""
+    global _plan_cache_hits
+    global _plan_cache_misses
+    # The plans depend on the tuned large prime threshold
+    ensure_profile()
+    with _PLAN_CACHE_LOCK:
+        plan = _PLAN_CACHE.get(n)
+        if plan is not None:
+            _PLAN_CACHE.move_to_end(n)
+            _plan_cache_hits += 1
+            return plan
+        _plan_cache_misses += 1
+    # Built outside the lock, as building recursively requests the sub plans
+    plan = make_plan(n)
+    _insert_plan(plan)
+    return plan
+
+
+def plan_table(
+    plan: FFTPlan, name: str, build: Callable[[], npt.NDArray[Any]]
+) -> npt.NDArray[Any]:
+    """plan.tables[name], built on first use. It is counted in the memory of
+    the plan, so that it is bounded and evicted together with it."""
+    table = plan.tables.get(name)
+    if table is not None:
+        return table
+    table = build()
+    with _PLAN_CACHE_LOCK:
+        table = plan.tables.setdefault(name, table)
+        _evict_over_bounds()
+    return table
+
+
+def _cache_bytes() -> int:
+    # Recomputed rather than kept as a running total, as tables added to a plan
+    # change the memory of every plan referencing it
+    return sum(plan.nbytes for plan in _PLAN_CACHE.values())
+
+
+def _evict_over_bounds() -> None:
+    """Called with the lock held"""
+    global _plan_cache_evictions
+    nbytes = _cache_bytes()
+    while len(_PLAN_CACHE) > 1 and (
+        len(_PLAN_CACHE) > MAX_CACHED_PLANS or nbytes > MAX_PLAN_CACHE_BYTES
+    ):
+        _, evicted = _PLAN_CACHE.popitem(last=False)
+        nbytes -= evicted.nbytes
+        _plan_cache_evictions += 1
+
+
+def _insert_plan(plan: FFTPlan) -> None:
+    with _PLAN_CACHE_LOCK:
+        if plan.n in _PLAN_CACHE:
+            # Another thread planned the same size concurrently
+            return
+        _PLAN_CACHE[plan.n] = plan
+        _evict_over_bounds()
+
+
+def clear_plan_cache() -> None:
+    global _plan_cache_hits
+    global _plan_cache_misses
+    global _plan_cache_evictions
+    with _PLAN_CACHE_LOCK:
+        _PLAN_CACHE.clear()
+        _plan_cache_hits = 0
+        _plan_cache_misses = 0
+        _plan_cache_evictions = 0
+
+
+def set_large_prime_threshold(threshold: int) -> None:
+    """Plans depend on the threshold, so the cache is cleared"""
+    global LARGE_PRIME_THRESHOLD
+    LARGE_PRIME_THRESHOLD = threshold
+    clear_plan_cache()
+
+
+def plan_cache_info() -> PlanCacheInfo:
+    with _PLAN_CACHE_LOCK:
+        return PlanCacheInfo(
+            hits=_plan_cache_hits,
+            misses=_plan_cache_misses,
+            evictions=_plan_cache_evictions,
+            size=len(_PLAN_CACHE),
+            nbytes=_cache_bytes(),
+        )
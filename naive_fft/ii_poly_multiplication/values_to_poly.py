@@ -7,11 +7,7 @@ def values_to_poly(values: List[complex]) -> List[complex]:
     """Convert an array of values at roots of unity of a polynomial into the
     coefficients of the polynomial"""
 
-    # We will not prove this equivalence today
+    # We will not prove this equivalence today - evaluating at the conjugate
+    # roots of unity inverts the transform, up to a factor of n
     n = len(values)
-    return list(
-        map(
-            lambda x: x.conjugate(),
-            evaluate_poly([value.conjugate() / n for value in values]),
-        )
-    )
+    return [value / n for value in evaluate_poly(values, direction=-1)]
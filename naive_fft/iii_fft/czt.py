@@ -0,0 +1,68 @@
+import cmath
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from naive_fft.convolution import convolve
+from naive_fft.ii_poly_multiplication.evaluate_poly_numpy import ComplexArray
+
+
+def czt(
+    samples: npt.ArrayLike,
+    m: Optional[int] = None,
+    w: Optional[complex] = None,
+    a: complex = 1,
+) -> ComplexArray:
+    """The chirp z-transform: result[k] = sum_j samples[j] * z_k^(-j) at the m
+    points z_k = a * w^(-k) of a spiral. Evaluating a polynomial at these
+    points generalizes evaluate_poly, which is the case a = 1, w = e^(2*pi*i/n)
+    with the coefficients reversed - the default w, e^(-2*pi*i/m), and a = 1
+    give the fft. O((n + m) log(n + m))."""
+    samples_array = np.asarray(samples, dtype=np.complex128)
+    if samples_array.ndim != 1 or samples_array.size == 0:
+        raise ValueError("Expected a non empty one dimensional signal")
+    n = len(samples_array)
+    if m is None:
+        m = n
+    if m < 1:
+        raise ValueError("m must be positive")
+    if w is None:
+        w = cmath.exp(-2j * cmath.pi / m)
+    if a == 0 or w == 0:
+        raise ValueError("a and w must not be 0")
+    # Bluestein's algorithm, as in evaluate_poly_bluestein: j*k is
+    # (j^2 + k^2 - (k - j)^2) / 2, so
+    # result[k] = w^(k^2/2) * sum_j (samples[j] * a^(-j) * w^(j^2/2)) * w^(-(k-j)^2/2)
+    # where the sum is a convolution with the chirp w^(-t^2/2), for t from
+    # 1 - n to m - 1
+    log_w = cmath.log(w)
+    j = np.arange(n)
+    weighted = samples_array * np.exp(-cmath.log(a) * j + log_w * j * j / 2)
+    t = np.arange(1 - n, m)
+    chirp = np.exp(-log_w * t * t / 2)
+    # The valid part of the convolution is exactly k - j = t for k < m
+    convolution = convolve(weighted, chirp, mode="valid")
+    k = np.arange(m)
+    result: ComplexArray = np.exp(log_w * k * k / 2) * convolution
+    return result
+
+
+def zoom_fft(
+    samples: npt.ArrayLike,
+    f_start: float,
+    f_stop: float,
+    m: int,
+    fs: float = 2.0,
+    endpoint: bool = False,
+) -> ComplexArray:
+    """The spectrum at m frequencies from f_start to f_stop (included when
+    endpoint is set), for samples taken at the sampling rate fs - a finer
+    resolution than the fft for a narrow band, without zero padding the whole
+    signal. zoom_fft(samples, 0, fs, n, fs) is the fft."""
+    if m < 1:
+        raise ValueError("m must be positive")
+    step = (f_stop - f_start) / (m - 1 if endpoint and m > 1 else m)
+    a = cmath.exp(2j * cmath.pi * f_start / fs)
+    w = cmath.exp(-2j * cmath.pi * step / fs)
+    return czt(samples, m, w, a)
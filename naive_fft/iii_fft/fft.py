@@ -1,18 +1,603 @@
-from typing import List
+import bisect
+import cmath
+import functools
+import math
+from math import pi
+from typing import Any, List, Literal, Optional, Sequence, Tuple, Union, overload
+
+import numpy as np
+import numpy.typing as npt
 
 from naive_fft.ii_poly_multiplication.evaluate_poly import evaluate_poly
-from naive_fft.ii_poly_multiplication.values_to_poly import values_to_poly
+from naive_fft.ii_poly_multiplication.evaluate_poly_numpy import (
+    ComplexArray,
+    evaluate_poly_batch,
+    evaluate_poly_numpy,
+)
+from naive_fft.ii_poly_multiplication.evaluate_poly_pruned import (
+    evaluate_poly_pruned,
+)
+from naive_fft.ii_poly_multiplication.plan import MAX_CACHED_PLANS, get_plan, plan_table
+from naive_fft.iv_performance_analysis import cost_model
+
+Backend = Literal["python", "numpy"]
+Kind = Literal["complex", "real"]
+FloatArray = npt.NDArray[np.float64]
+
+
+Norm = Literal["backward", "ortho", "forward"]
 
 
-# I got some sign wrong, so I need to reorder the values
 def reorder_to_fft(samples: List[complex]) -> List[complex]:
-    return [samples[0]] + samples[::-1][:-1]
+    """samples[-k] for every k - the values at the conjugate roots of unity,
+    for values which were evaluated at the roots of unity"""
+    return [samples[-k] for k in range(len(samples))]
+
+
+def reorder_to_fft_numpy(samples: ComplexArray) -> ComplexArray:
+    n = len(samples)
+    result: ComplexArray = samples[-np.arange(n) % n]
+    return result
+
+
+def _norm_factor(n: int, norm: Norm, inverse: bool) -> float:
+    """The factor which scales the fft (or the ifft, when inverse is set) of
+    size n, with the same conventions as numpy.fft: "backward" scales only the
+    ifft by 1/n, "forward" only the fft, and "ortho" both by 1/sqrt(n)"""
+    if norm == "ortho":
+        return 1 / math.sqrt(n)
+    if norm == "backward":
+        return 1 / n if inverse else 1.0
+    if norm == "forward":
+        return 1.0 if inverse else 1 / n
+    raise ValueError(f"Unknown norm {norm}")
+
+
+def _scale_list(values: List[complex], factor: float) -> List[complex]:
+    if factor == 1:
+        return values
+    for k, value in enumerate(values):
+        values[k] = value * factor
+    return values
+
+
+def _scale_array(values: ComplexArray, factor: float) -> ComplexArray:
+    if factor != 1:
+        values *= factor
+    return values
+
+
+def _tuned_backend(n: int) -> Backend:
+    """The faster backend for size n, according to the tuning profile, which is
+    measured on first use"""
+    # Imported here, as the tuning measures the transforms of this module
+    from naive_fft.iv_performance_analysis.tuning import get_profile
+
+    return get_profile().backend_for(n)
+
+
+# The sign of the exponent is handled by the kernel: the fft is the polynomial
+# evaluated at the conjugate roots of unity (direction=-1), and the ifft at the
+# roots of unity, so that neither needs a reordered or conjugated copy
+
+
+@overload
+def fft(
+    samples: List[complex],
+    backend: Literal["python", "auto"] = ...,
+    norm: Norm = ...,
+) -> List[complex]: ...
+
+
+@overload
+def fft(
+    samples: ComplexArray, backend: Literal["numpy"], norm: Norm = ...
+) -> ComplexArray: ...
+
+
+def fft(
+    samples: Union[List[complex], ComplexArray],
+    backend: Union[Backend, Literal["auto"]] = "python",
+    norm: Norm = "backward",
+) -> Union[List[complex], ComplexArray]:
+    """backend="auto" transforms a list with the backend the tuning profile
+    found faster for its size, and returns a list"""
+    if backend == "auto":
+        assert isinstance(samples, list), "The auto backend expects a list"
+        if _tuned_backend(len(samples)) == "numpy":
+            as_array = np.array(samples, dtype=np.complex128)
+            numpy_result: List[complex] = fft(as_array, "numpy", norm).tolist()
+            return numpy_result
+        backend = "python"
+    n = len(samples)
+    if backend == "numpy":
+        evaluated_array = evaluate_poly_numpy(samples, direction=-1)
+        if n == 0:
+            return evaluated_array
+        return _scale_array(evaluated_array, _norm_factor(n, norm, inverse=False))
+    assert isinstance(samples, list), "The python backend expects a list"
+    evaluated_poly = evaluate_poly(samples, direction=-1)
+    if n == 0:
+        return evaluated_poly
+    return _scale_list(evaluated_poly, _norm_factor(n, norm, inverse=False))
+
+
+@overload
+def ifft(
+    frequecies: List[complex],
+    backend: Literal["python", "auto"] = ...,
+    norm: Norm = ...,
+) -> List[complex]: ...
+
+
+@overload
+def ifft(
+    frequecies: ComplexArray, backend: Literal["numpy"], norm: Norm = ...
+) -> ComplexArray: ...
+
+
+def ifft(
+    frequecies: Union[List[complex], ComplexArray],
+    backend: Union[Backend, Literal["auto"]] = "python",
+    norm: Norm = "backward",
+) -> Union[List[complex], ComplexArray]:
+    if backend == "auto":
+        assert isinstance(frequecies, list), "The auto backend expects a list"
+        if _tuned_backend(len(frequecies)) == "numpy":
+            as_array = np.array(frequecies, dtype=np.complex128)
+            numpy_result: List[complex] = ifft(as_array, "numpy", norm).tolist()
+            return numpy_result
+        backend = "python"
+    n = len(frequecies)
+    if backend == "numpy":
+        evaluated_array = evaluate_poly_numpy(frequecies)
+        if n == 0:
+            return evaluated_array
+        return _scale_array(evaluated_array, _norm_factor(n, norm, inverse=True))
+    assert isinstance(frequecies, list), "The python backend expects a list"
+    evaluated_poly = evaluate_poly(frequecies)
+    if n == 0:
+        return evaluated_poly
+    return _scale_list(evaluated_poly, _norm_factor(n, norm, inverse=True))
+
+
+def fft_pruned(
+    samples: List[complex],
+    n: Optional[int] = None,
+    outputs: Optional[Sequence[int]] = None,
+) -> List[complex]:
+    """fft of samples zero padded to n, only at the frequencies in outputs (all
+    of them by default). The zero padding and the frequencies that are not
+    needed are skipped rather than computed."""
+    n = len(samples) if n is None else n
+    if outputs is None:
+        outputs = range(n)
+    return evaluate_poly_pruned(samples, n, [-k for k in outputs])
+
+
+def ifft_pruned(
+    frequecies: List[complex],
+    n: Optional[int] = None,
+    outputs: Optional[Sequence[int]] = None,
+) -> List[complex]:
+    """ifft of frequecies zero padded to n, only at the indices in outputs"""
+    n = len(frequecies) if n is None else n
+    return [value / n for value in evaluate_poly_pruned(frequecies, n, outputs)]
+
+
+# Real input transforms:
+# A real signal of even length n is packed into a complex signal of length n/2,
+# z[k] = x[2k] + i*x[2k+1]. With E and O the transforms of the even and odd
+# samples, Z = E + i*O, and as E and O are transforms of real signals,
+# E[k] = (Z[k] + conj(Z[-k])) / 2 and O[k] = (Z[k] - conj(Z[-k])) / 2i.
+# Then X[k] = E[k] + W^k * O[k] with W = e^(-2*pi*i/n), for k = 0, ..., n/2.
+# The rest of the spectrum is redundant, as X[n-k] = conj(X[k]).
+
+
+def _rfft_twiddles_numpy(n: int) -> ComplexArray:
+    """W^k = e^(-2*pi*i*k/n) for k = 0, ..., n/2, kept with the plan of the
+    packed transform of size n/2"""
+
+    def build() -> ComplexArray:
+        return np.array(
+            [cmath.exp(-2j * pi * k / n) for k in range(n // 2 + 1)],
+            dtype=np.complex128,
+        )
+
+    return plan_table(get_plan(n // 2), "rfft_twiddles", build)
+
+
+def _rfft_twiddles(n: int) -> List[complex]:
+    twiddles: List[complex] = _rfft_twiddles_numpy(n).tolist()
+    return twiddles
+
+
+def _rfft_python(samples: List[float]) -> List[complex]:
+    n = len(samples)
+    if n == 0:
+        return []
+    if n % 2 == 1:
+        return fft([complex(sample) for sample in samples])[: n // 2 + 1]
+    half = n // 2
+    packed = [complex(samples[2 * k], samples[2 * k + 1]) for k in range(half)]
+    return _unpack_rfft(fft(packed), n)
+
+
+def _unpack_rfft(packed_fft: List[complex], n: int) -> List[complex]:
+    """The rfft of a real signal of even length n, from the fft of its samples
+    packed in pairs"""
+    half = n // 2
+    twiddles = _rfft_twiddles(n)
+    result: List[complex] = []
+    for k in range(half + 1):
+        z_k = packed_fft[k % half]
+        z_minus_k_conjugate = packed_fft[-k % half].conjugate()
+        even = (z_k + z_minus_k_conjugate) / 2
+        odd = (z_k - z_minus_k_conjugate) / 2j
+        result.append(even + twiddles[k] * odd)
+    return result
+
+
+def _rfft_rows(rows: FloatArray) -> ComplexArray:
+    """rfft of every row of a (batch, n) array"""
+    n = rows.shape[1]
+    if n % 2 == 1:
+        return fft_batch(rows)[:, : n // 2 + 1]
+    half = n // 2
+    packed_fft = fft_batch(rows[:, 0::2] + 1j * rows[:, 1::2])
+    indices = np.arange(half + 1)
+    z_k = packed_fft[:, indices % half]
+    z_minus_k_conjugate = np.conjugate(packed_fft[:, -indices % half])
+    even = (z_k + z_minus_k_conjugate) / 2
+    odd = (z_k - z_minus_k_conjugate) / 2j
+    result: ComplexArray = even + _rfft_twiddles_numpy(n) * odd
+    return result
+
+
+@overload
+def rfft(samples: List[float], backend: Literal["python"] = ...) -> List[complex]: ...
+
+
+@overload
+def rfft(samples: FloatArray, backend: Literal["numpy"]) -> ComplexArray: ...
+
+
+def rfft(
+    samples: Union[List[float], FloatArray], backend: Backend = "python"
+) -> Union[List[complex], ComplexArray]:
+    """The n // 2 + 1 non redundant bins of the fft of a real signal"""
+    if backend == "numpy":
+        return rfft_batch(samples)
+    assert isinstance(samples, list), "The python backend expects a list"
+    return _rfft_python(samples)
+
+
+def rfft_pruned(samples: List[float], n: int) -> List[complex]:
+    """rfft of samples zero padded to n, skipping the transforms of the zero
+    padding"""
+    if len(samples) > n:
+        raise ValueError("More samples than the transform size")
+    if n % 2 == 1:
+        as_complex = [complex(sample) for sample in samples]
+        return fft_pruned(as_complex, n, range(n // 2 + 1))
+    even_length = samples + [0.0] * (len(samples) % 2)
+    packed = [
+        complex(even_length[2 * k], even_length[2 * k + 1])
+        for k in range(len(even_length) // 2)
+    ]
+    return _unpack_rfft(fft_pruned(packed, n // 2), n)
+
+
+def _irfft_python(frequencies: List[complex], n: int) -> List[float]:
+    half = n // 2
+    spectrum = frequencies[: half + 1]
+    spectrum += [0j] * (half + 1 - len(spectrum))
+    if n % 2 == 1:
+        mirrored = [frequency.conjugate() for frequency in spectrum[:0:-1]]
+        return [sample.real for sample in ifft(spectrum + mirrored)]
+    # Bins 0 and n / 2 are their own conjugates, so only their real parts are
+    # part of a real signal's spectrum - as in numpy.fft.irfft and irfft_pruned
+    spectrum[0] = complex(spectrum[0].real)
+    spectrum[half] = complex(spectrum[half].real)
+    twiddles = _rfft_twiddles(n)
+    packed_fft: List[complex] = []
+    for k in range(half):
+        x_k = spectrum[k]
+        x_half_minus_k_conjugate = spectrum[half - k].conjugate()
+        even = (x_k + x_half_minus_k_conjugate) / 2
+        odd = (x_k - x_half_minus_k_conjugate) / 2 * twiddles[k].conjugate()
+        packed_fft.append(even + 1j * odd)
+    result: List[float] = []
+    for sample in ifft(packed_fft):
+        result.append(sample.real)
+        result.append(sample.imag)
+    return result
+
+
+def irfft_pruned(
+    frequencies: List[complex], n: int, outputs: Optional[Sequence[int]] = None
+) -> List[float]:
+    """irfft of the n // 2 + 1 non redundant bins of a real signal, only at the
+    indices in outputs (all n of them by default)"""
+    half = n // 2
+    spectrum = frequencies[: half + 1]
+    spectrum += [0j] * (half + 1 - len(spectrum))
+    output_indices = range(n) if outputs is None else outputs
+    # The bins above n / 2 are the conjugates of the bins below it, so the sum
+    # over all of them is twice the real part of the sum over the first half,
+    # less the bins which are their own conjugates - 0, and n / 2 for even n
+    half_sums = evaluate_poly_pruned(spectrum, n, output_indices)
+    result: List[float] = []
+    for t, half_sum in zip(output_indices, half_sums):
+        total = 2 * half_sum.real - spectrum[0].real
+        if n % 2 == 0:
+            total -= spectrum[half].real * (-1) ** (t % 2)
+        result.append(total / n)
+    return result
+
+
+def _irfft_rows(rows: ComplexArray, n: int) -> FloatArray:
+    """irfft of every row of a (batch, n // 2 + 1) array"""
+    half = n // 2
+    spectrum = np.zeros((rows.shape[0], half + 1), dtype=np.complex128)
+    kept_frequencies = min(half + 1, rows.shape[1])
+    spectrum[:, :kept_frequencies] = rows[:, :kept_frequencies]
+    if n % 2 == 1:
+        mirrored = np.conjugate(spectrum[:, :0:-1])
+        full_spectrum = np.concatenate([spectrum, mirrored], axis=1)
+        return np.real(ifft_batch(full_spectrum))
+    # Only the real parts of the bins which are their own conjugates are kept
+    spectrum[:, 0].imag = 0
+    spectrum[:, half].imag = 0
+    x_k = spectrum[:, :half]
+    x_half_minus_k_conjugate = np.conjugate(spectrum[:, half:0:-1])
+    even = (x_k + x_half_minus_k_conjugate) / 2
+    odd = (
+        (x_k - x_half_minus_k_conjugate)
+        / 2
+        * np.conjugate(_rfft_twiddles_numpy(n)[:half])
+    )
+    packed = ifft_batch(even + 1j * odd)
+    result = np.empty((rows.shape[0], n), dtype=np.float64)
+    result[:, 0::2] = packed.real
+    result[:, 1::2] = packed.imag
+    return result
+
+
+@overload
+def irfft(
+    frequencies: List[complex],
+    n: Optional[int] = ...,
+    backend: Literal["python"] = ...,
+) -> List[float]: ...
+
+
+@overload
+def irfft(
+    frequencies: ComplexArray, n: Optional[int] = ..., *, backend: Literal["numpy"]
+) -> FloatArray: ...
+
+
+def irfft(
+    frequencies: Union[List[complex], ComplexArray],
+    n: Optional[int] = None,
+    backend: Backend = "python",
+) -> Union[List[float], FloatArray]:
+    """Inverse of rfft - n is the length of the real signal, by default
+    2 * (len(frequencies) - 1)"""
+    if n is None:
+        n = 2 * (len(frequencies) - 1)
+    if backend == "numpy":
+        return irfft_batch(frequencies, n)
+    assert isinstance(frequencies, list), "The python backend expects a list"
+    if n <= 0:
+        return []
+    return _irfft_python(frequencies, n)
+
+
+# Batched transforms:
+# Every 1-D slice of an array along `axis` is transformed, in a single pass over
+# all of them, sharing the plan and twiddles.
+
+
+def _to_rows(array: npt.NDArray[Any], axis: int) -> npt.NDArray[Any]:
+    """View of an array as (batch, n) rows, where n is the size of the axis"""
+    moved = np.moveaxis(array, axis, -1)
+    return moved.reshape(-1, moved.shape[-1])
+
+
+def _from_rows(
+    rows: npt.NDArray[Any], shape: Tuple[int, ...], axis: int
+) -> npt.NDArray[Any]:
+    """Inverse of _to_rows, where the axis size of the shape is replaced by the
+    size of the rows"""
+    axis %= len(shape)
+    batch_shape = shape[:axis] + shape[axis + 1 :]
+    moved = rows.reshape(batch_shape + (rows.shape[-1],))
+    return np.moveaxis(moved, -1, axis)
+
+
+def fft_batch(
+    samples: npt.ArrayLike, axis: int = -1, norm: Norm = "backward"
+) -> ComplexArray:
+    array = np.asarray(samples, dtype=np.complex128)
+    n = array.shape[axis]
+    if array.size == 0:
+        return array.copy()
+    evaluated = evaluate_poly_batch(_to_rows(array, axis), direction=-1)
+    evaluated = _scale_array(evaluated, _norm_factor(n, norm, inverse=False))
+    return _from_rows(evaluated, array.shape, axis)
+
+
+def ifft_batch(
+    frequencies: npt.ArrayLike, axis: int = -1, norm: Norm = "backward"
+) -> ComplexArray:
+    array = np.asarray(frequencies, dtype=np.complex128)
+    n = array.shape[axis]
+    if array.size == 0:
+        return array.copy()
+    evaluated = evaluate_poly_batch(_to_rows(array, axis))
+    evaluated = _scale_array(evaluated, _norm_factor(n, norm, inverse=True))
+    return _from_rows(evaluated, array.shape, axis)
+
+
+def rfft_batch(samples: npt.ArrayLike, axis: int = -1) -> ComplexArray:
+    array = np.asarray(samples, dtype=np.float64)
+    n = array.shape[axis]
+    if array.size == 0:
+        return np.zeros(
+            _replace_axis_size(array.shape, axis, n // 2 + 1), dtype=np.complex128
+        )
+    return _from_rows(_rfft_rows(_to_rows(array, axis)), array.shape, axis)
+
+
+def irfft_batch(
+    frequencies: npt.ArrayLike, n: Optional[int] = None, axis: int = -1
+) -> FloatArray:
+    """n is the length of the real signals, by default 2 * (frequencies - 1)"""
+    array = np.asarray(frequencies, dtype=np.complex128)
+    if n is None:
+        n = 2 * (array.shape[axis] - 1)
+    if n <= 0 or array.size == 0:
+        return np.zeros(_replace_axis_size(array.shape, axis, max(n, 0)))
+    return _from_rows(_irfft_rows(_to_rows(array, axis), n), array.shape, axis)
+
+
+def _replace_axis_size(shape: Tuple[int, ...], axis: int, size: int) -> Tuple[int, ...]:
+    new_shape = list(shape)
+    new_shape[axis] = size
+    return tuple(new_shape)
+
+
+# Multidimensional transforms:
+# One axis at a time (row-column decomposition), every axis with the batched
+# transforms above, so equal sized axes share their plan. The last axis is
+# contiguous and is transformed as rows. Along any other axis the elements of a
+# slice are strided, so adjacent slices are transformed in blocks, each one
+# transposed into a small contiguous buffer that stays in the cache.
+BLOCK_BYTES = 2**20
+
+
+def _transform_axis(array: ComplexArray, axis: int, inverse: bool) -> None:
+    """Transform a C contiguous array along axis, in place"""
+    transform = ifft_batch if inverse else fft_batch
+    n = array.shape[axis]
+    if axis == array.ndim - 1:
+        rows = array.reshape(-1, n)
+        rows[:] = transform(rows)
+        return
+    # For every index of the axes before `axis`, the slices along it are the
+    # columns of a contiguous (n, columns) matrix
+    matrices = array.reshape(-1, n, math.prod(array.shape[axis + 1 :]))
+    block_columns = max(BLOCK_BYTES // (n * array.itemsize), 1)
+    for matrix in matrices:
+        for start in range(0, matrix.shape[1], block_columns):
+            block = matrix[:, start : start + block_columns]
+            block[:] = transform(block.T).T
+
+
+def _normalize_axes(ndim: int, axes: Optional[Sequence[int]]) -> List[int]:
+    if axes is None:
+        return list(range(ndim))
+    for axis in axes:
+        if not -ndim <= axis < ndim:
+            raise ValueError(f"Axis {axis} is out of bounds for {ndim} dimensions")
+    return [axis % ndim for axis in axes]
+
+
+def fftn(samples: npt.ArrayLike, axes: Optional[Sequence[int]] = None) -> ComplexArray:
+    """The fft over every axis in axes, by default all of them"""
+    result = np.array(samples, dtype=np.complex128, order="C")
+    if result.size == 0:
+        return result
+    for axis in _normalize_axes(result.ndim, axes):
+        _transform_axis(result, axis, inverse=False)
+    return result
+
+
+def ifftn(
+    frequencies: npt.ArrayLike, axes: Optional[Sequence[int]] = None
+) -> ComplexArray:
+    result = np.array(frequencies, dtype=np.complex128, order="C")
+    if result.size == 0:
+        return result
+    for axis in _normalize_axes(result.ndim, axes):
+        _transform_axis(result, axis, inverse=True)
+    return result
+
+
+def fft2(samples: npt.ArrayLike, axes: Sequence[int] = (-2, -1)) -> ComplexArray:
+    return fftn(samples, axes)
+
+
+def ifft2(frequencies: npt.ArrayLike, axes: Sequence[int] = (-2, -1)) -> ComplexArray:
+    return ifftn(frequencies, axes)
+
+
+# Transform sizes:
+# With the cost model of iv_performance_analysis.cost_model, a transform of size
+# n costs about n * sum(p * k) over the factorization n = prod(p^k). Sizes with
+# only small prime factors are the cheap ones, so padded signals are padded to
+# one of them.
+FAST_PRIMES = (2, 3, 5, 7)
+MAX_FAST_LEN = 2**48
+
+
+@functools.lru_cache(maxsize=1)
+def _smooth_numbers() -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    """All the products of FAST_PRIMES up to MAX_FAST_LEN in ascending order,
+    and their approximate_factor"""
+    smooth: List[Tuple[int, int]] = [(1, 0)]
+    for prime in FAST_PRIMES:
+        smooth = [
+            (value * prime**power, factor_sum + prime * power)
+            for value, factor_sum in smooth
+            for power in range(MAX_FAST_LEN.bit_length())
+            if value * prime**power <= MAX_FAST_LEN
+        ]
+    smooth.sort()
+    values, factor_sums = zip(*smooth)
+    return values, tuple(max(factor_sum, 1) for factor_sum in factor_sums)
 
 
-def fft(samples: List[complex]) -> List[complex]:
-    evaluated_poly = evaluate_poly(samples)
-    return reorder_to_fft(evaluated_poly)
+def _fast_len_cost(n: int, factor_sum: int, kind: Kind, backend: Backend) -> float:
+    if kind == "real" and n % 2 == 0:
+        # rfft transforms half the size, and a factor of 2 less
+        n //= 2
+        factor_sum = max(factor_sum - 2, 1)
+    cost: float = n * factor_sum
+    if n & (n - 1) == 0:
+        cost /= (
+            cost_model.ITERATIVE_SPEEDUP
+            if backend == "python"
+            else cost_model.NUMPY_ITERATIVE_SPEEDUP
+        )
+    return cost
 
 
-def ifft(frequecies: List[complex]) -> List[complex]:
-    return values_to_poly(reorder_to_fft(frequecies))
+@functools.lru_cache(maxsize=MAX_CACHED_PLANS)
+def next_fast_len(n: int, kind: Kind = "complex", backend: Backend = "numpy") -> int:
+    """The size >= n, with no prime factor above 7, whose transform is the
+    cheapest according to the cost model. kind="real" is for rfft sizes."""
+    if n > MAX_FAST_LEN:
+        raise ValueError(f"Sizes above {MAX_FAST_LEN} are not supported")
+    if n >= 1 and n & (n - 1) == 0:
+        # Both backends have a dedicated kernel for powers of 2, never worth
+        # padding away from
+        return n
+    # Applying a profile clears this cache, so no size chosen with the default
+    # constants is kept
+    cost_model.ensure_profile()
+    values, factor_sums = _smooth_numbers()
+    start = bisect.bisect_left(values, max(n, 1))
+    # sum(p * k) >= 3 / log2(3) * log2(m) for every m, so sizes above twice the
+    # next power of 2 cost more than it does
+    end = bisect.bisect_right(values, 2 << max(n - 1, 0).bit_length())
+    best = min(
+        range(start, end),
+        key=lambda i: (
+            _fast_len_cost(values[i], factor_sums[i], kind, backend),
+            values[i],
+        ),
+    )
+    return values[best]
@@ -0,0 +1,170 @@
+import functools
+from typing import Any, List, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from naive_fft.i_number_theory.number_theory import is_prime, primitive_root
+from naive_fft.ii_poly_multiplication.plan import (
+    MAX_CACHED_PLANS,
+    bit_reversal_permutation,
+    is_power_of_2,
+)
+
+IntArray = npt.NDArray[np.int64]
+
+# The number theoretic transform is the fft over the integers modulo a prime p,
+# where an n-th root of unity exists when n | p - 1. The primes are kept below
+# 2^31 so the product of two residues fits in an int64.
+MAX_NTT_PRIME = 2**31
+# The primes supporting this size support every smaller power of 2 as well, and
+# are plenty
+MIN_NTT_PRIMES_SIZE = 2**20
+
+
+@functools.lru_cache(maxsize=MAX_CACHED_PLANS)
+def ntt_primes(n: int) -> Tuple[int, ...]:
+    """Primes below MAX_NTT_PRIME supporting transforms of size n, largest first"""
+    assert is_power_of_2(n), "Expected a power of 2 size"
+    n = max(n, MIN_NTT_PRIMES_SIZE)
+    # p = k * n + 1
+    return tuple(
+        candidate
+        for candidate in range((MAX_NTT_PRIME - 1) // n * n + 1, 1, -n)
+        if is_prime(candidate)
+    )
+
+
+@functools.lru_cache(maxsize=MAX_CACHED_PLANS)
+def _ntt_twiddles(n: int, prime: int, inverse: bool) -> IntArray:
+    """w^j for j < n / 2, where w is a primitive n-th root of unity mod prime"""
+    root = pow(primitive_root(prime), (prime - 1) // n, prime)
+    if inverse:
+        root = pow(root, prime - 2, prime)
+    twiddles = np.ones(max(n // 2, 1), dtype=np.int64)
+    # Doubling the table: twiddles[k:2k] = twiddles[:k] * w^k
+    k = 1
+    while k < n // 2:
+        twiddles[k : 2 * k] = twiddles[:k] * pow(root, k, prime) % prime
+        k *= 2
+    return twiddles
+
+
+@functools.lru_cache(maxsize=MAX_CACHED_PLANS)
+def _bit_reversal_indices(n: int) -> IntArray:
+    return bit_reversal_permutation(n).astype(np.int64)
+
+
+def ntt(values: IntArray, prime: int, inverse: bool = False) -> IntArray:
+    """Evaluate the polynomial with coefficients `values` (reduced mod prime) at
+    the powers of a primitive n-th root of unity. inverse=True interpolates."""
+    n = values.shape[0]
+    assert is_power_of_2(n) and (prime - 1) % n == 0, "No n-th root of unity"
+    twiddles = _ntt_twiddles(n, prime, inverse)
+    # Same iterative radix 2 scheme as evaluate_poly_iterative
+    buffer = values[_bit_reversal_indices(n)]
+    h = 1
+    while h < n:
+        w = twiddles[:: n // (2 * h)][:h]
+        blocks = buffer.reshape(n // (2 * h), 2, h)
+        a = blocks[:, 0, :].copy()
+        b = blocks[:, 1, :] * w % prime
+        blocks[:, 0, :] = (a + b) % prime
+        blocks[:, 1, :] = (a - b) % prime
+        h *= 2
+    if inverse:
+        buffer = buffer * pow(n, prime - 2, prime) % prime
+    return buffer
+
+
+def _residues(poly: Sequence[int], n: int, prime: int) -> IntArray:
+    """poly mod prime, zero padded to n"""
+    padded = np.zeros(n, dtype=np.int64)
+    try:
+        padded[: len(poly)] = np.mod(np.asarray(poly, dtype=np.int64), prime)
+    except OverflowError:
+        padded[: len(poly)] = [x % prime for x in poly]
+    return padded
+
+
+def _primes_for(n: int, bound: int) -> Tuple[int, ...]:
+    """Enough primes supporting size n for their product to exceed 2 * bound,
+    so results in [-bound, bound] are recovered exactly by the CRT"""
+    primes: List[int] = []
+    product = 1
+    for prime in ntt_primes(n):
+        if primes and product > 2 * bound:
+            break
+        primes.append(prime)
+        product *= prime
+    if product <= 2 * bound:
+        raise ValueError(f"Not enough NTT primes for size {n} and bound {bound}")
+    return tuple(primes)
+
+
+def _crt(residues: List[IntArray], primes: Tuple[int, ...]) -> List[int]:
+    """The unique integers in (-M/2, M/2] with the given residues, where M is the
+    product of the primes"""
+    # Garner's algorithm: x = d_0 + d_1 p_0 + d_2 p_0 p_1 + ..., d_i < p_i
+    digits: List[IntArray] = []
+    for i, prime in enumerate(primes):
+        digit = residues[i]
+        for j in range(i):
+            inverse = pow(primes[j], prime - 2, prime)
+            digit = (digit - digits[j] % prime) * inverse % prime
+        digits.append(digit)
+    modulus = 1
+    for prime in primes:
+        modulus *= prime
+    if modulus < 2**63:
+        combined: npt.NDArray[Any] = digits[-1]
+    else:
+        # Python integers, as the result does not fit in an int64
+        combined = digits[-1].astype(object)
+    for digit, prime in zip(digits[-2::-1], primes[-2::-1]):
+        combined = combined * prime + digit
+    signed = np.where(combined > modulus // 2, combined - modulus, combined)
+    result: List[int] = signed.tolist()
+    return result
+
+
+def _max_abs(poly: Sequence[int]) -> int:
+    return max((abs(x) for x in poly), default=0)
+
+
+def ntt_polymul(poly_1: Sequence[int], poly_2: Sequence[int]) -> List[int]:
+    """The exact product of two integer polynomials, or equivalently the full
+    convolution of two integer sequences"""
+    if len(poly_1) == 0 or len(poly_2) == 0:
+        return []
+    result_length = len(poly_1) + len(poly_2) - 1
+    n = 1 << (result_length - 1).bit_length()
+    # Every coefficient of the product is a sum of at most min(len) products
+    bound = _max_abs(poly_1) * _max_abs(poly_2) * min(len(poly_1), len(poly_2))
+    primes = _primes_for(n, bound)
+    residues = []
+    for prime in primes:
+        values = ntt(_residues(poly_1, n, prime), prime)
+        values = values * ntt(_residues(poly_2, n, prime), prime) % prime
+        residues.append(ntt(values, prime, inverse=True)[:result_length])
+    return _crt(residues, primes)
+
+
+def ntt_power(poly: Sequence[int], exponent: int) -> List[int]:
+    """The exact exponent-th power of an integer polynomial, raising its values
+    to the power once instead of multiplying polynomials repeatedly"""
+    assert exponent >= 1, "Expected a positive exponent"
+    if len(poly) == 0:
+        return []
+    result_length = exponent * (len(poly) - 1) + 1
+    n = 1 << (result_length - 1).bit_length()
+    bound = _max_abs(poly) ** exponent * len(poly) ** (exponent - 1)
+    primes = _primes_for(n, bound)
+    residues = []
+    for prime in primes:
+        values = ntt(_residues(poly, n, prime), prime)
+        powered = np.ones_like(values)
+        for _ in range(exponent):
+            powered = powered * values % prime
+        residues.append(ntt(powered, prime, inverse=True)[:result_length])
+    return _crt(residues, primes)
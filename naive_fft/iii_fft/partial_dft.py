@@ -0,0 +1,98 @@
+import cmath
+import functools
+import math
+from typing import Dict, List, Literal, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from naive_fft.ii_poly_multiplication.evaluate_poly_numpy import ComplexArray
+from naive_fft.ii_poly_multiplication.plan import MAX_CACHED_PLANS
+from naive_fft.iii_fft.fft import fft_batch
+from naive_fft.iv_performance_analysis import cost_model
+
+BinsMethod = Literal["auto", "goertzel", "direct", "fft"]
+
+# Memory of the twiddles of a block of the vectorized partial DFT
+BLOCK_BYTES = 2**20
+
+
+def choose_bins_method(n: int, bins: int) -> Literal["goertzel", "direct", "fft"]:
+    """The cheapest way to compute some bins of a transform of size n,
+    according to the cost model"""
+    cost_model.ensure_profile()
+    costs: Dict[Literal["goertzel", "direct", "fft"], float] = {
+        "goertzel": cost_model.goertzel_cost(n, bins),
+        "direct": cost_model.partial_dft_cost(n, bins),
+        "fft": cost_model.transform_cost(n),
+    }
+    return min(costs, key=lambda method: costs[method])
+
+
+def goertzel(samples: Sequence[complex], k: int) -> complex:
+    """Bin k of the transform of samples, in O(n) time and O(1) memory"""
+    # https://en.wikipedia.org/wiki/Goertzel_algorithm
+    # s[j] = x[j] + 2cos(w) * s[j-1] - s[j-2] is a filter with poles at e^(iw)
+    # and e^(-iw), for w = 2 * pi * k / n. Its output gives
+    # s[n-1] - e^(-iw) * s[n-2] = e^(iw(n-1)) * sum_j x[j] * e^(-iwj), and
+    # as e^(iwn) = 1, the bin is e^(iw) * s[n-1] - s[n-2]
+    n = len(samples)
+    omega = 2 * math.pi * (k % n) / n
+    coefficient = 2 * math.cos(omega)
+    s_1 = s_2 = 0j
+    for sample in samples:
+        s_1, s_2 = sample + coefficient * s_1 - s_2, s_1
+    return cmath.exp(1j * omega) * s_1 - s_2
+
+
+@functools.lru_cache(maxsize=MAX_CACHED_PLANS)
+def _twiddle_factors(n: int) -> Tuple[ComplexArray, ComplexArray]:
+    """e^(-2*pi*i*m/n) = coarse[m // step] * fine[m % step] with step about
+    sqrt(n), so that no table of all n twiddles is kept"""
+    step = math.isqrt(n - 1) + 1
+    fine = np.exp(-2j * np.pi * np.arange(step) / n)
+    coarse = np.exp(-2j * np.pi * np.arange(0, n, step) / n)
+    return coarse, fine
+
+
+def _partial_dft(samples: ComplexArray, bins: npt.NDArray[np.int64]) -> ComplexArray:
+    n = len(samples)
+    coarse, fine = _twiddle_factors(n)
+    step = len(fine)
+    result = np.zeros(len(bins), dtype=np.complex128)
+    # Blocks of samples, so that the twiddle matrix stays within BLOCK_BYTES
+    block = max(1, BLOCK_BYTES // (16 * len(bins)))
+    for start in range(0, n, block):
+        indices = np.arange(start, min(start + block, n))
+        exponents = np.outer(bins, indices) % n
+        twiddles = coarse[exponents // step] * fine[exponents % step]
+        result += twiddles @ samples[start : start + block]
+    return result
+
+
+def dft_bins(
+    samples: npt.ArrayLike, bins: npt.ArrayLike, method: BinsMethod = "auto"
+) -> ComplexArray:
+    """fft(samples)[bins], without computing the other bins when that is
+    cheaper - O(n * len(bins)) with the Goertzel recurrence, or a vectorized
+    partial DFT, instead of the whole transform"""
+    samples_array = np.asarray(samples, dtype=np.complex128)
+    if samples_array.ndim != 1 or samples_array.size == 0:
+        raise ValueError("Expected a non empty one dimensional signal")
+    n = len(samples_array)
+    bins_array = np.asarray(bins, dtype=np.int64).reshape(-1) % n
+    if len(bins_array) == 0:
+        return np.zeros(0, dtype=np.complex128)
+    if method == "auto":
+        method = choose_bins_method(n, len(bins_array))
+    if method == "goertzel":
+        samples_list: List[complex] = samples_array.tolist()
+        return np.array(
+            [goertzel(samples_list, int(k)) for k in bins_array], dtype=np.complex128
+        )
+    if method == "direct":
+        return _partial_dft(samples_array, bins_array)
+    if method == "fft":
+        spectrum: ComplexArray = fft_batch(samples_array)[bins_array]
+        return spectrum
+    raise ValueError(f"Unknown method {method}")
@@ -0,0 +1,120 @@
+import threading
+
+from naive_fft.i_number_theory.number_theory import factorize
+
+# Runtime estimates used to pick between algorithms. The constants are
+# measured by the measure functions of tuning - also used by the calibrate
+# functions of plot_performance - which overwrite the defaults below.
+#
+# A tuning profile saved for this machine overrides them, along with the other
+# tuned values - the large prime threshold of the plans and the parallel
+# cutoff. It is applied by ensure_profile, before the first plan is built or
+# the first method is chosen.
+
+# Seconds per n * approximate_factor(n) of the python evaluate_poly.
+# Value tuned for apple M1 Pro
+APPROXIMATE_CONSTANT = 5.032931188659143e-07
+# The python evaluate_poly computes powers of 2 with the iterative kernel, this
+# much faster than the recursion the approximate factor models
+ITERATIVE_SPEEDUP = 1.5
+# Seconds per n * approximate_factor(n) of a numpy backend transform, and fixed
+# seconds per such transform
+NUMPY_APPROXIMATE_CONSTANT = 1.3e-08
+NUMPY_TRANSFORM_OVERHEAD = 6e-05
+# The numpy backend has dedicated radix 2 and 4 passes, so powers of 2 are this
+# much faster than the approximate factor models too
+NUMPY_ITERATIVE_SPEEDUP = 1.3
+# The direct numpy convolution adds a scaled copy of the longer input for every
+# element of the shorter one: seconds per such row, and per multiply-add
+DIRECT_ROW_CONSTANT = 2.4e-06
+DIRECT_MULTIPLY_ADD_CONSTANT = 8.7e-10
+
+# Set once the saved profile was looked up and applied
+_profile_checked = False
+_PROFILE_CHECK_LOCK = threading.Lock()
+
+
+def ensure_profile() -> None:
+    """Apply the tuning profile saved for this machine, if there is one. Only
+    the first call looks it up, and nothing is measured when there is none -
+    that is left to tuning.get_profile and tuning.tune."""
+    global _profile_checked
+    if _profile_checked:
+        return
+    with _PROFILE_CHECK_LOCK:
+        if _profile_checked:
+            return
+        # Imported here, as the tuning measures the modules using the cost model
+        from naive_fft.iv_performance_analysis.tuning import apply_saved_profile
+
+        apply_saved_profile()
+        _profile_checked = True
+
+
+def approximate_factor(n: int) -> float:
+    factorization = factorize(n)
+    result = 0
+    for prime, power in factorization.items():
+        result += prime * power
+    return max(result, 1)
+
+
+def python_transform_cost(n: int) -> float:
+    """Estimated seconds of the python evaluate_poly of size n"""
+    cost = APPROXIMATE_CONSTANT * n * approximate_factor(n)
+    if n & (n - 1) == 0:
+        cost /= ITERATIVE_SPEEDUP
+    return cost
+
+
+def transform_cost(n: int) -> float:
+    """Estimated seconds of a numpy backend transform of size n"""
+    cost = NUMPY_APPROXIMATE_CONSTANT * n * approximate_factor(n)
+    if n & (n - 1) == 0:
+        cost /= NUMPY_ITERATIVE_SPEEDUP
+    return NUMPY_TRANSFORM_OVERHEAD + cost
+
+
+def fft_convolution_cost(n: int, real: bool = False) -> float:
+    """Estimated seconds of a convolution through transforms of size n: two
+    forward transforms and an inverse one. Real signals are transformed at
+    half the size."""
+    if real and n % 2 == 0:
+        return 3 * transform_cost(n // 2)
+    return 3 * transform_cost(n)
+
+
+def direct_convolution_cost(n: int, m: int) -> float:
+    """Estimated seconds of the direct convolution of sizes n and m"""
+    shorter, longer = sorted((n, m))
+    return shorter * (DIRECT_ROW_CONSTANT + longer * DIRECT_MULTIPLY_ADD_CONSTANT)
+
+
+# Single frequency bins: seconds per sample and bin of the python Goertzel
+# recurrence, and per sample and bin of the vectorized partial DFT, with fixed
+# seconds per partial DFT
+GOERTZEL_STEP_CONSTANT = 1.6e-07
+PARTIAL_DFT_CONSTANT = 1.5e-08
+PARTIAL_DFT_OVERHEAD = 2e-05
+# Seconds per term of a python Horner evaluation of a polynomial at one point
+HORNER_STEP_CONSTANT = 2e-07
+
+
+def goertzel_cost(n: int, bins: int) -> float:
+    return GOERTZEL_STEP_CONSTANT * n * bins
+
+
+def partial_dft_cost(n: int, bins: int) -> float:
+    return PARTIAL_DFT_OVERHEAD + PARTIAL_DFT_CONSTANT * n * bins
+
+
+def horner_cost(terms: int, points: int) -> float:
+    return HORNER_STEP_CONSTANT * terms * points
+
+
+# 3SUM strategies: seconds per pair of elements checked with a hash set, per
+# step and per pair of the vectorized two pointer walk, and per histogram bin
+HASH_PAIR_CONSTANT = 1.6e-07
+SORTED_STEP_CONSTANT = 1.5e-05
+SORTED_PAIR_CONSTANT = 2e-08
+HISTOGRAM_CONSTANT = 1e-08
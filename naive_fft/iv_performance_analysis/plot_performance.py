@@ -1,19 +1,22 @@
 import math
 import random
 import time
-from typing import Iterable, List, Tuple, cast
+from typing import Iterable, List, Optional, Tuple, cast
 
 import matplotlib.pyplot as plt  # type: ignore
 import tqdm
 
+import naive_fft.ii_poly_multiplication.parallel as parallel_module
 from naive_fft.i_number_theory.number_theory import (
-    factorial,
     factorize,
     first_prime_after,
     populate_primes_up_to,
 )
 from naive_fft.ii_poly_multiplication.evaluate_poly import evaluate_poly
+from naive_fft.ii_poly_multiplication.plan import set_large_prime_threshold
 from naive_fft.ii_poly_multiplication.values_to_poly import values_to_poly
+from naive_fft.iv_performance_analysis import cost_model, tuning
+from naive_fft.iv_performance_analysis.cost_model import approximate_factor
 
 MIN_TIME_FOR_ANALYSIS = 0.02  # 0.02 second per tested size
 
@@ -44,13 +47,11 @@ MAX_NUMBER_GENERATED_BY_PRIMES = 3000
 # Values tuned for apple M1 Pro
 N_LOG_N_CONSTANT = 1.889597219190644e-06
 N_SQUARED_CONSTANT = 2.6172736330578685e-07
-APPROXIMATE_CONSTANT = 5.032931188659143e-07
 
 
 def calibrate() -> None:
     global MIN_TIME_FOR_ANALYSIS
     global N_SQUARED_CONSTANT
-    global APPROXIMATE_CONSTANT
     global N_LOG_N_CONSTANT
 
     large_prime = first_prime_after(1000)
@@ -77,50 +78,60 @@ def calibrate() -> None:
         f"Power of 2 runtime: {average_power_of_2_runtime}s, power of 2: {power_of_2}"
     )
 
-    tested_composite = factorial(7)
-    get_sample_performance([tested_composite])
-    composite_performances = get_sample_performance(
-        [
-            tested_composite,
-            tested_composite,
-            tested_composite,
-            tested_composite,
-            tested_composite,
-        ]
-    )
-    average_composite_time = sum(
-        map(lambda sample: sample[1], composite_performances)
-    ) / len(composite_performances)
-    print(
-        f"Composite runtime: {average_composite_time}s, power of 2: {tested_composite}"
-    )
-
     N_SQUARED_CONSTANT = average_prime_runtime / large_prime**2
     print("N_SQUARED_CONSTANT", N_SQUARED_CONSTANT)
     N_LOG_N_CONSTANT = average_power_of_2_runtime / (power_of_2 * math.log(power_of_2))
     print("N_LOG_N_CONSTANT", N_LOG_N_CONSTANT)
-    candidate_1_approximate = average_prime_runtime / (
-        approximate_factor(large_prime) * large_prime
-    )
-    candidate_2_approximate = average_power_of_2_runtime / (
-        approximate_factor(power_of_2) * power_of_2
-    )
-    candidate_3_approximate = average_composite_time / (
-        approximate_factor(tested_composite) * tested_composite
-    )
-    APPROXIMATE_CONSTANT = (
-        candidate_1_approximate + candidate_2_approximate + candidate_3_approximate
-    ) / 3
-    print("APPROXIMATE_CONSTANT", APPROXIMATE_CONSTANT)
+    (
+        cost_model.APPROXIMATE_CONSTANT,
+        cost_model.ITERATIVE_SPEEDUP,
+    ) = tuning.measure_python_constants()
+    print("APPROXIMATE_CONSTANT", cost_model.APPROXIMATE_CONSTANT)
+    print("ITERATIVE_SPEEDUP", cost_model.ITERATIVE_SPEEDUP)
     MIN_TIME_FOR_ANALYSIS = old_min_time_for_analysis
 
 
-def approximate_factor(n: int) -> float:
-    factorization = factorize(n)
-    result = 0
-    for prime, power in factorization.items():
-        result += prime * power
-    return max(result, 1)
+# The calibrate functions below use the measurements of the tuning, and apply
+# them to this process only - tuning.tune also stores them
+
+
+def calibrate_large_prime_threshold() -> int:
+    """Find the smallest prime for which Bluestein's algorithm beats the
+    mixed radix recursion, and use it as the large prime threshold"""
+    threshold = tuning.measure_large_prime_threshold()
+    set_large_prime_threshold(threshold)
+    print("LARGE_PRIME_THRESHOLD", threshold)
+    return threshold
+
+
+def calibrate_parallel_cutoff(workers: Optional[int] = None) -> int:
+    """Find the smallest power of 2 for which evaluating in a process pool
+    beats evaluating serially, with all the available CPUs by default"""
+    if workers is None:
+        workers = parallel_module.available_cpus()
+    cutoff = tuning.measure_parallel_cutoff(workers)
+    parallel_module.PARALLEL_CUTOFF = cutoff
+    print("PARALLEL_CUTOFF", cutoff)
+    return cutoff
+
+
+def calibrate_convolution() -> None:
+    """Measure the constants convolve uses to choose between the direct and
+    the transform based convolution"""
+    (
+        cost_model.NUMPY_APPROXIMATE_CONSTANT,
+        cost_model.NUMPY_TRANSFORM_OVERHEAD,
+        cost_model.NUMPY_ITERATIVE_SPEEDUP,
+    ) = tuning.measure_numpy_constants()
+    print("NUMPY_TRANSFORM_OVERHEAD", cost_model.NUMPY_TRANSFORM_OVERHEAD)
+    print("NUMPY_APPROXIMATE_CONSTANT", cost_model.NUMPY_APPROXIMATE_CONSTANT)
+    print("NUMPY_ITERATIVE_SPEEDUP", cost_model.NUMPY_ITERATIVE_SPEEDUP)
+    (
+        cost_model.DIRECT_ROW_CONSTANT,
+        cost_model.DIRECT_MULTIPLY_ADD_CONSTANT,
+    ) = tuning.measure_direct_constants()
+    print("DIRECT_MULTIPLY_ADD_CONSTANT", cost_model.DIRECT_MULTIPLY_ADD_CONSTANT)
+    print("DIRECT_ROW_CONSTANT", cost_model.DIRECT_ROW_CONSTANT)
 
 
 def plot_for_ranges(
@@ -149,9 +160,11 @@ def plot_for_ranges(
         approx_factors = [
             (
                 n,
-                approximate_factor(n) * n * APPROXIMATE_CONSTANT * 0.5
-                if twice_lower_approximation
-                else 1,
+                (
+                    approximate_factor(n) * n * cost_model.APPROXIMATE_CONSTANT * 0.5
+                    if twice_lower_approximation
+                    else 1
+                ),
             )
             for n in tested_vals
         ]
@@ -214,6 +227,8 @@ def print_powers_of_2_times() -> None:
 
 if __name__ == "__main__":
     calibrate()
+    calibrate_large_prime_threshold()
+    calibrate_convolution()
     print_powers_of_2_times()
     plot_1_to_n(POINTS_TO_PLOT)
     plot_numbers_generated_by_primes([3, 7, 13, 17, 23])
@@ -0,0 +1,383 @@
+"""Per machine tuning, similar to FFTW wisdom: a short micro-benchmark measures
+the cost model constants, the large prime threshold of the plans, the
+parallel cutoff, and the faster backend for every size class. The results are
+kept in a profile file, loaded on later runs instead of measuring again. The
+measure functions below are also the calibrate functions of plot_performance.
+
+get_profile() loads, or measures on first use, and applies the profile.
+tune() measures again and overwrites it. A saved profile is also applied
+without them, by the first transform or method choice of the process - see
+cost_model.ensure_profile. To keep the shipped defaults instead, set
+NAIVE_FFT_NO_PROFILE=1 in the environment, or call reset_profile() before the
+first transform."""
+
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+import naive_fft.ii_poly_multiplication.parallel as parallel_module
+import naive_fft.ii_poly_multiplication.plan as plan_module
+from naive_fft.bench import time_function
+from naive_fft.convolution import convolve
+from naive_fft.i_number_theory.number_theory import factorial
+from naive_fft.ii_poly_multiplication.evaluate_poly import (
+    evaluate_poly,
+    evaluate_poly_with_plan,
+)
+from naive_fft.ii_poly_multiplication.parallel import ParallelEvaluator
+from naive_fft.ii_poly_multiplication.plan import make_plan, set_large_prime_threshold
+from naive_fft.iii_fft.fft import Backend, fft, fft_batch, next_fast_len
+from naive_fft.iv_performance_analysis import cost_model
+from naive_fft.iv_performance_analysis.cost_model import approximate_factor
+from naive_fft.utils import atomic_write, xdg_cache_path
+
+# Bumped whenever the measurements change meaning, invalidating old profiles
+PROFILE_VERSION = 2
+# Overrides the location of the profile file
+PROFILE_PATH_ENVIRONMENT_VARIABLE = "NAIVE_FFT_PROFILE"
+# When set, the saved profile is not applied by the first transform
+NO_PROFILE_ENVIRONMENT_VARIABLE = "NAIVE_FFT_NO_PROFILE"
+
+# The cost model constants measured by the tuning
+TUNED_CONSTANTS = (
+    "APPROXIMATE_CONSTANT",
+    "ITERATIVE_SPEEDUP",
+    "NUMPY_APPROXIMATE_CONSTANT",
+    "NUMPY_TRANSFORM_OVERHEAD",
+    "NUMPY_ITERATIVE_SPEEDUP",
+    "DIRECT_ROW_CONSTANT",
+    "DIRECT_MULTIPLY_ADD_CONSTANT",
+)
+
+# Every measurement repeats a function for at least this many nanoseconds,
+# much shorter than the benchmarks, so that tuning on first use is quick
+TUNING_REPEAT_NS = 2_000_000
+TUNING_REPEATS = 3
+MIXED_RADIX_SIZES = (3 * 5 * 7 * 8, factorial(6))
+ITERATIVE_SIZE = 2**10
+NUMPY_SIZES = (3 * 5 * 7 * 2**5, 2 * 3**3 * 5**2 * 7)
+NUMPY_ITERATIVE_SIZE = 2**14
+DIRECT_SHORT_LENGTH = 32
+DIRECT_LONG_LENGTHS = (2**8, 2**13)
+# Primes at which the mixed radix recursion is compared to Bluestein's
+# algorithm, in increasing order
+LARGE_PRIME_CANDIDATES = (31, 61, 127, 251, 509)
+# Size classes are floor(log2(n)), the backends are compared on the powers of 2
+# of these classes. Sizes out of this range use the nearest class.
+BACKEND_SIZE_CLASSES = range(4, 14)
+PARALLEL_CUTOFF_POWERS = range(12, 19)
+
+
+class TuningProfile(NamedTuple):
+    machine: str
+    # Values of the TUNED_CONSTANTS of cost_model
+    constants: Dict[str, float]
+    large_prime_threshold: int
+    parallel_cutoff: int
+    # The faster backend of fft and ifft for lists, by size class
+    backends: Dict[int, Backend]
+
+    def backend_for(self, n: int) -> Backend:
+        if not self.backends:
+            return "python"
+        size_class = max(n.bit_length() - 1, 0)
+        classes = sorted(self.backends)
+        size_class = min(max(size_class, classes[0]), classes[-1])
+        if size_class not in self.backends:
+            size_class = max(c for c in classes if c <= size_class)
+        return self.backends[size_class]
+
+
+def machine_id() -> str:
+    """The host, architecture and python version the profile was measured on"""
+    description = (
+        f"{platform.node()}-{platform.machine()}-"
+        f"py{sys.version_info.major}{sys.version_info.minor}"
+    )
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", description)
+
+
+def profile_path() -> Path:
+    return xdg_cache_path(f"{machine_id()}.json", PROFILE_PATH_ENVIRONMENT_VARIABLE)
+
+
+def current_profile() -> TuningProfile:
+    """The settings in use, whether tuned or the defaults"""
+    return TuningProfile(
+        machine=machine_id(),
+        constants={name: getattr(cost_model, name) for name in TUNED_CONSTANTS},
+        large_prime_threshold=plan_module.LARGE_PRIME_THRESHOLD,
+        parallel_cutoff=parallel_module.PARALLEL_CUTOFF,
+        backends={},
+    )
+
+
+_DEFAULT_PROFILE = current_profile()
+_PROFILE: Optional[TuningProfile] = None
+_PROFILE_LOCK = threading.Lock()
+
+
+def apply_profile(profile: TuningProfile) -> None:
+    global _PROFILE
+    for name in TUNED_CONSTANTS:
+        if name in profile.constants:
+            setattr(cost_model, name, profile.constants[name])
+    # The sizes depend on the cost model
+    next_fast_len.cache_clear()
+    if profile.large_prime_threshold != plan_module.LARGE_PRIME_THRESHOLD:
+        set_large_prime_threshold(profile.large_prime_threshold)
+    parallel_module.PARALLEL_CUTOFF = profile.parallel_cutoff
+    _PROFILE = profile
+
+
+def reset_profile() -> None:
+    """Back to the shipped defaults, until the next get_profile or tune"""
+    global _PROFILE
+    # So that the first transform does not apply the saved profile later on
+    cost_model.ensure_profile()
+    apply_profile(_DEFAULT_PROFILE)
+    _PROFILE = None
+
+
+def apply_saved_profile() -> None:
+    """Apply the stored profile, unless a profile is already in use. Unlike
+    get_profile, nothing is measured when there is none."""
+    if os.environ.get(NO_PROFILE_ENVIRONMENT_VARIABLE):
+        return
+    with _PROFILE_LOCK:
+        if _PROFILE is not None:
+            return
+        profile = load_profile()
+        if profile is not None:
+            apply_profile(profile)
+
+
+def save_profile(profile: TuningProfile, path: Optional[Path] = None) -> None:
+    path = profile_path() if path is None else path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    contents = {"version": PROFILE_VERSION, **profile._asdict()}
+    with atomic_write(path) as file:
+        file.write(json.dumps(contents, indent=2).encode())
+
+
+def load_profile(path: Optional[Path] = None) -> Optional[TuningProfile]:
+    """The stored profile, or None if there is none for this machine and
+    version"""
+    path = profile_path() if path is None else path
+    try:
+        contents = json.loads(path.read_text())
+        if contents["version"] != PROFILE_VERSION:
+            return None
+        profile = TuningProfile(
+            machine=str(contents["machine"]),
+            constants={
+                str(name): float(value) for name, value in contents["constants"].items()
+            },
+            large_prime_threshold=int(contents["large_prime_threshold"]),
+            parallel_cutoff=int(contents["parallel_cutoff"]),
+            backends={
+                int(size_class): "numpy" if backend == "numpy" else "python"
+                for size_class, backend in contents["backends"].items()
+            },
+        )
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+    if profile.machine != machine_id():
+        return None
+    return profile
+
+
+def _seconds_per_call(function: Callable[[], object]) -> float:
+    _, timings = time_function(function, TUNING_REPEATS, 1, TUNING_REPEAT_NS)
+    return statistics.median(timings) / 1e9
+
+
+def _random_poly(n: int) -> List[complex]:
+    values = np.random.random(n) * 2 - 1 + 1j * (np.random.random(n) * 2 - 1)
+    poly: List[complex] = values.tolist()
+    return poly
+
+
+def measure_python_constants() -> Tuple[float, float]:
+    """APPROXIMATE_CONSTANT and ITERATIVE_SPEEDUP"""
+    constants = []
+    for n in MIXED_RADIX_SIZES:
+        poly = _random_poly(n)
+        seconds = _seconds_per_call(lambda: evaluate_poly(poly))
+        constants.append(seconds / (n * approximate_factor(n)))
+    approximate_constant = sum(constants) / len(constants)
+    poly = _random_poly(ITERATIVE_SIZE)
+    iterative_seconds = _seconds_per_call(lambda: evaluate_poly(poly))
+    modeled_seconds = (
+        approximate_constant * ITERATIVE_SIZE * approximate_factor(ITERATIVE_SIZE)
+    )
+    return approximate_constant, modeled_seconds / iterative_seconds
+
+
+def measure_numpy_constants() -> Tuple[float, float, float]:
+    """NUMPY_APPROXIMATE_CONSTANT, NUMPY_TRANSFORM_OVERHEAD and
+    NUMPY_ITERATIVE_SPEEDUP"""
+    tiny_signal = np.random.random(2) + 0j
+    overhead = _seconds_per_call(lambda: fft_batch(tiny_signal))
+    constants = []
+    for n in NUMPY_SIZES:
+        signal = np.random.random(n) + 0j
+        seconds = _seconds_per_call(lambda: fft_batch(signal)) - overhead
+        constants.append(max(seconds, 0.0) / (n * approximate_factor(n)))
+    approximate_constant = sum(constants) / len(constants)
+    signal = np.random.random(NUMPY_ITERATIVE_SIZE) + 0j
+    iterative_seconds = _seconds_per_call(lambda: fft_batch(signal)) - overhead
+    modeled_seconds = (
+        approximate_constant
+        * NUMPY_ITERATIVE_SIZE
+        * approximate_factor(NUMPY_ITERATIVE_SIZE)
+    )
+    # Never a slowdown, so that timing noise does not pad powers of 2 away
+    iterative_speedup = max(modeled_seconds / max(iterative_seconds, 1e-12), 1.0)
+    return approximate_constant, overhead, iterative_speedup
+
+
+def measure_direct_constants() -> Tuple[float, float]:
+    """DIRECT_ROW_CONSTANT and DIRECT_MULTIPLY_ADD_CONSTANT"""
+    short_signal = np.random.random(DIRECT_SHORT_LENGTH)
+    row_times = []
+    for long_length in DIRECT_LONG_LENGTHS:
+        long_signal = np.random.random(long_length)
+        seconds = _seconds_per_call(
+            lambda: convolve(long_signal, short_signal, method="direct")
+        )
+        row_times.append(seconds / DIRECT_SHORT_LENGTH)
+    short_long, long_long = DIRECT_LONG_LENGTHS
+    multiply_add = max((row_times[1] - row_times[0]) / (long_long - short_long), 0.0)
+    row = max(row_times[0] - short_long * multiply_add, 0.0)
+    return row, multiply_add
+
+
+def measure_large_prime_threshold() -> int:
+    """One below the smallest candidate prime for which Bluestein's algorithm
+    beats the mixed radix recursion"""
+    for prime in LARGE_PRIME_CANDIDATES:
+        poly = _random_poly(prime)
+        # Planned outside of the cache, so that the threshold in use, and the
+        # plans evaluated meanwhile by other threads, are left alone
+        mixed_radix_plan = make_plan(prime, large_prime_threshold=prime)
+        bluestein_plan = make_plan(prime, large_prime_threshold=2)
+        mixed_radix_seconds = _seconds_per_call(
+            lambda: evaluate_poly_with_plan(poly, mixed_radix_plan)
+        )
+        bluestein_seconds = _seconds_per_call(
+            lambda: evaluate_poly_with_plan(poly, bluestein_plan)
+        )
+        if bluestein_seconds < mixed_radix_seconds:
+            return prime - 1
+    return LARGE_PRIME_CANDIDATES[-1]
+
+
+def measure_parallel_cutoff(workers: int) -> int:
+    """The smallest power of 2 for which a process pool beats evaluating
+    serially"""
+    cutoff: int = 2 ** PARALLEL_CUTOFF_POWERS[-1]
+    with ParallelEvaluator(workers, cutoff=0) as evaluator:
+        for power in PARALLEL_CUTOFF_POWERS:
+            poly = _random_poly(2**power)
+            # The first call also starts the workers
+            evaluator.evaluate_poly(poly)
+            serial_seconds = _seconds_per_call(lambda: evaluate_poly(poly))
+            parallel_seconds = _seconds_per_call(lambda: evaluator.evaluate_poly(poly))
+            if parallel_seconds < serial_seconds:
+                cutoff = 2**power
+                break
+    return cutoff
+
+
+def measure_backends() -> Dict[int, Backend]:
+    backends: Dict[int, Backend] = {}
+    for size_class in BACKEND_SIZE_CLASSES:
+        samples = _random_poly(2**size_class)
+        python_seconds = _seconds_per_call(lambda: fft(samples))
+        # Including the conversions, as fft(samples, "auto") converts the list
+        numpy_seconds = _seconds_per_call(
+            lambda: fft(np.array(samples, dtype=np.complex128), "numpy").tolist()
+        )
+        backends[size_class] = "numpy" if numpy_seconds < python_seconds else "python"
+    return backends
+
+
+def measure_profile(parallel_workers: Optional[int] = None) -> TuningProfile:
+    """Run the micro-benchmark. The parallel cutoff is measured only with
+    parallel_workers, as starting a process pool takes a while, and is kept
+    otherwise."""
+    # Looked up before measuring, so that the saved profile is not applied in
+    # the middle of the measurements
+    cost_model.ensure_profile()
+    approximate_constant, iterative_speedup = measure_python_constants()
+    (
+        numpy_approximate_constant,
+        numpy_transform_overhead,
+        numpy_iterative_speedup,
+    ) = measure_numpy_constants()
+    direct_row_constant, direct_multiply_add_constant = measure_direct_constants()
+    parallel_cutoff = parallel_module.PARALLEL_CUTOFF
+    if parallel_workers is not None and parallel_workers > 1:
+        parallel_cutoff = measure_parallel_cutoff(parallel_workers)
+    return TuningProfile(
+        machine=machine_id(),
+        constants={
+            "APPROXIMATE_CONSTANT": approximate_constant,
+            "ITERATIVE_SPEEDUP": iterative_speedup,
+            "NUMPY_APPROXIMATE_CONSTANT": numpy_approximate_constant,
+            "NUMPY_TRANSFORM_OVERHEAD": numpy_transform_overhead,
+            "NUMPY_ITERATIVE_SPEEDUP": numpy_iterative_speedup,
+            "DIRECT_ROW_CONSTANT": direct_row_constant,
+            "DIRECT_MULTIPLY_ADD_CONSTANT": direct_multiply_add_constant,
+        },
+        large_prime_threshold=measure_large_prime_threshold(),
+        parallel_cutoff=parallel_cutoff,
+        backends=measure_backends(),
+    )
+
+
+def tune(
+    path: Optional[Path] = None, parallel_workers: Optional[int] = None
+) -> TuningProfile:
+    """Measure this machine, store the profile and use it. Later processes only
+    load the profile from profile_path() - the default location, or
+    $NAIVE_FFT_PROFILE - so a profile stored to another path is used by them
+    only with NAIVE_FFT_PROFILE pointing at it."""
+    profile = measure_profile(parallel_workers)
+    with _PROFILE_LOCK:
+        save_profile(profile, path)
+        apply_profile(profile)
+    return profile
+
+
+def get_profile() -> TuningProfile:
+    """The profile in use - loaded from the profile file, or measured and
+    stored on first use"""
+    # Before taking the lock, which the lookup takes as well
+    cost_model.ensure_profile()
+    with _PROFILE_LOCK:
+        if _PROFILE is not None:
+            return _PROFILE
+        profile = load_profile()
+        if profile is not None:
+            apply_profile(profile)
+            return profile
+    # Measured without the lock, as it takes a while. The measurements do not
+    # change the settings in use, which other threads keep using meanwhile.
+    profile = measure_profile()
+    with _PROFILE_LOCK:
+        if _PROFILE is not None:
+            # Another thread measured first
+            return _PROFILE
+        save_profile(profile)
+        apply_profile(profile)
+        return profile
@@ -1,7 +1,35 @@
+import contextlib
 import math
-from typing import List
+import os
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Sequence
 
 
-def l2(p1: List[complex], p2: List[complex]) -> float:
+def l2(p1: Sequence[complex], p2: Sequence[complex]) -> float:
     """Returns the sum of squares of differences's absolute value"""
     return math.sqrt(sum(map(lambda tpl: abs(tpl[0] - tpl[1]) ** 2, zip(p1, p2))))
+
+
+def xdg_cache_path(name: str, override_variable: Optional[str] = None) -> Path:
+    """~/.cache/naive_fft/<name>, or under $XDG_CACHE_HOME when it is set. The
+    environment variable override_variable, when set, replaces the path."""
+    if override_variable is not None:
+        override = os.environ.get(override_variable)
+        if override:
+            return Path(override)
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "naive_fft" / name
+
+
+@contextlib.contextmanager
+def atomic_write(path: Path) -> Iterator[BinaryIO]:
+    """A file opened for writing, which replaces path once it is closed.
+    Concurrent readers of path see the old contents or the new ones, never
+    half of a file."""
+    temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temporary_path, "wb") as file:
+            yield file
+        os.replace(temporary_path, path)
+    finally:
+        temporary_path.unlink(missing_ok=True)
@@ -1,11 +1,22 @@
 import random
 import time
+from typing import List
 
 from tqdm import tqdm
 
-from naive_fft.v_three_sum.three_sum import fft_three_sum, n_squared_three_sum
+from naive_fft.v_three_sum.three_sum import (
+    Strategy,
+    choose_three_sum_strategy,
+    count_three_sums,
+    fft_three_sum,
+    find_three_sum,
+    n_squared_three_sum,
+    three_sum,
+    three_sum_batch,
+)
 
 NUM_RUNS = 10
+STRATEGIES: List[Strategy] = ["hash", "sorted", "fft", "ntt", "auto"]
 ARRAY_LENGTH = 40_000
 ARRAY_MAX = 80_000
 
@@ -26,6 +37,17 @@ def test_three_manual() -> None:
     assert n_squared_three_sum(array_3, 14, 38)
     assert not fft_three_sum(array_3, 14, 37)
     assert not n_squared_three_sum(array_3, 14, 37)
+    for array, upper_bound, target_sum in [
+        (array, 21, 47),
+        (array, 21, 46),
+        (array_2, 2, 3),
+        (array_2, 2, 2),
+        (array_3, 14, 38),
+        (array_3, 14, 37),
+    ]:
+        assert fft_three_sum(
+            array, upper_bound, target_sum, exact=True
+        ) == n_squared_three_sum(array, upper_bound, target_sum)
 
 
 def test_three_sum_automatic_and_timing() -> None:
@@ -49,6 +71,62 @@ def test_three_sum_automatic_and_timing() -> None:
     print("n_squared_time:", n_quared_time)
 
 
+def test_repeated_value_triples() -> None:
+    # 1 + 1 + 4 and 0 + 0 + 6 are not sums of 3 distinct elements
+    assert not fft_three_sum([0, 1, 4, 6], 7, 6)
+    assert not fft_three_sum([0, 1, 4, 6], 7, 6, exact=True)
+    for strategy in STRATEGIES:
+        assert not three_sum([0, 1, 4, 6], 7, 6, strategy)
+        assert three_sum([0, 1, 4, 6, 1], 7, 6, strategy)
+
+
+def test_three_sum_strategies() -> None:
+    for _ in range(NUM_RUNS):
+        upper_bound = random.randint(1, 50)
+        array = [
+            random.randint(0, upper_bound - 1) for _ in range(random.randint(0, 12))
+        ]
+        target_sums = list(range(3 * upper_bound - 2))
+        expected = [
+            n_squared_three_sum(array, upper_bound, target_sum)
+            for target_sum in target_sums
+        ]
+        for strategy in STRATEGIES:
+            assert (
+                three_sum_batch(array, upper_bound, target_sums, strategy) == expected
+            )
+
+
+def test_count_and_find_three_sums() -> None:
+    for _ in range(NUM_RUNS):
+        upper_bound = random.randint(1, 50)
+        array = [
+            random.randint(0, upper_bound - 1) for _ in range(random.randint(0, 30))
+        ]
+        expected = [0] * (3 * upper_bound - 2)
+        for i, x in enumerate(array):
+            for j in range(i + 1, len(array)):
+                for k in range(j + 1, len(array)):
+                    expected[x + array[j] + array[k]] += 1
+        assert count_three_sums(array, upper_bound) == expected
+        for target_sum, count in enumerate(expected):
+            for strategy in STRATEGIES:
+                witness = find_three_sum(array, upper_bound, target_sum, strategy)
+                if count == 0:
+                    assert witness is None
+                    continue
+                assert witness is not None
+                i, j, k = witness
+                assert 0 <= i < j < k < len(array)
+                assert array[i] + array[j] + array[k] == target_sum
+
+
+def test_three_sum_strategy_selection() -> None:
+    assert choose_three_sum_strategy(10, 10**9) == "hash"
+    assert choose_three_sum_strategy(2_000, 10**9) == "sorted"
+    assert choose_three_sum_strategy(ARRAY_LENGTH, ARRAY_MAX) == "fft"
+
+
 if __name__ == "__main__":
     test_three_manual()
     test_three_sum_automatic_and_timing()
@@ -1,13 +1,33 @@
-from math import ceil, log2
-from typing import List, Set, cast
+from typing import Any, Dict, List, Literal, Optional, Sequence, Set, Tuple, cast
 
-from naive_fft.iii_fft.fft import fft, ifft
+import numpy as np
+import numpy.typing as npt
 
+from naive_fft.iii_fft.fft import (
+    irfft_batch,
+    irfft_pruned,
+    next_fast_len,
+    rfft_batch,
+    rfft_pruned,
+)
+from naive_fft.iii_fft.ntt import ntt_polymul, ntt_power
+from naive_fft.iv_performance_analysis import cost_model
 
-def fft_three_sum(array: List[int], upper_bound: int, target_sum: int) -> bool:
-    """values in array < upper bound"""
-    trice_upper_bound_rounded = 2 ** (ceil(log2(upper_bound)) + 2)
-    indices: List[int] = [0] * trice_upper_bound_rounded
+Strategy = Literal["auto", "hash", "sorted", "fft", "ntt"]
+IntArray = npt.NDArray[np.int64]
+# Indices i < j < k of three elements of an array
+Triple = Tuple[int, int, int]
+
+
+def fft_three_sum(
+    array: List[int], upper_bound: int, target_sum: int, exact: bool = False
+) -> bool:
+    """values in array < upper bound. exact=True counts the sums with the number
+    theoretic transform, so large counts are not subject to rounding errors"""
+    # Sums of three values are at most 3 * (upper_bound - 1), so the cyclic
+    # convolution of this size does not wrap around
+    trice_upper_bound_rounded = next_fast_len(3 * upper_bound - 2, "real", "python")
+    indices: List[int] = [0] * upper_bound
     double_indices: Set[int] = set()
     if target_sum > 3 * (upper_bound - 1):
         raise ValueError("Target sun is too large")
@@ -24,17 +44,34 @@ def fft_three_sum(array: List[int], upper_bound: int, target_sum: int) -> bool:
         target_index = target_sum - 2 * double_index
         if target_index == double_index:
             continue
-        if target_index < 0 or target_index > upper_bound:
+        if target_index < 0 or target_index >= upper_bound:
             continue
         if indices[target_index] > 0:
             # Double and single
             return True
-    indices_as_complexes = cast(List[complex], indices)
-    indices_fft = fft(indices_as_complexes)
+    # Ordered triples of values x + x + y = target_sum with x != y are counted
+    # 3 times each by the convolution, and are not triples of distinct values
+    double_value_triples = 0
+    for x in range(min(upper_bound, target_sum // 2 + 1)):
+        y = target_sum - 2 * x
+        if x != y and y < upper_bound and indices[x] > 0 and indices[y] > 0:
+            double_value_triples += 3
+    if target_sum % 3 == 0 and indices[target_sum // 3] > 0:
+        double_value_triples += 1
+    if exact:
+        indices_3_conv_exact = ntt_power(indices[:upper_bound], 3)
+        return indices_3_conv_exact[target_sum] - double_value_triples >= 6
+    indices_as_floats = cast(List[float], indices)
+    # The indicator vector is real, so only half of its spectrum is needed.
+    # Two thirds of the transform input are zero padding, and only one value
+    # of the convolution is read, so both transforms are pruned.
+    indices_fft = rfft_pruned(indices_as_floats, trice_upper_bound_rounded)
     indices_fft_cubed = [x**3 for x in indices_fft]
-    indices_3_conv = ifft(indices_fft_cubed)  # indices * indices * indices
-    indices_3_conv_int = [round(x.real) for x in indices_3_conv]
-    if indices_3_conv_int[target_sum] >= 6:
+    # (indices * indices * indices)[target_sum]
+    (triples,) = irfft_pruned(
+        indices_fft_cubed, trice_upper_bound_rounded, [target_sum]
+    )
+    if round(triples) - double_value_triples >= 6:
         return True
     return False
 
@@ -62,3 +99,239 @@ def n_squared_three_sum(array: List[int], upper_bound: int, target_sum: int) ->
             else:
                 end_idx -= 1
     return False
+
+
+# The engine:
+# Sparse arrays (few elements, large upper bound) are checked pair by pair,
+# either with a hash set or with a two pointer walk over the sorted array,
+# vectorized over the first element of the triple. Dense arrays are checked
+# with a convolution of the histogram of the values, whose size is
+# proportional to the upper bound rather than to the array.
+
+
+def _validate(array: Sequence[int], upper_bound: int) -> IntArray:
+    values = np.asarray(array, dtype=np.int64)
+    if values.size > 0 and (values.min() < 0 or values.max() >= upper_bound):
+        raise ValueError("Array contains an element that is too large")
+    return values
+
+
+def _hash_three_sum(values: IntArray, target_sum: int) -> Optional[Triple]:
+    elements: List[int] = values.tolist()
+    for i, first in enumerate(elements):
+        pair = _find_pair(elements, i + 1, len(elements), target_sum - first)
+        if pair is not None:
+            return (i,) + pair
+    return None
+
+
+def _find_pair(
+    elements: List[int], start: int, end: int, pair_sum: int
+) -> Optional[Tuple[int, int]]:
+    """Indices start <= j < k < end with elements[j] + elements[k] = pair_sum"""
+    seen: Dict[int, int] = {}
+    for k in range(start, end):
+        j = seen.get(pair_sum - elements[k])
+        if j is not None:
+            return j, k
+        seen.setdefault(elements[k], k)
+    return None
+
+
+def _sorted_three_sum(values: IntArray, target_sum: int) -> Optional[Triple]:
+    n = len(values)
+    if n < 3:
+        return None
+    order = np.argsort(values, kind="stable")
+    sorted_values = values[order]
+    # The walks of every first element i, where the pair is searched for in
+    # sorted_values[i + 1:], advance together - one step per iteration
+    first = np.arange(n - 2)
+    remains = target_sum - sorted_values[first]
+    low = first + 1
+    high = np.full(n - 2, n - 1)
+    active = first
+    while active.size > 0:
+        sums = sorted_values[low[active]] + sorted_values[high[active]]
+        active_remains = remains[active]
+        found = np.flatnonzero(sums == active_remains)
+        if found.size > 0:
+            i = active[found[0]]
+            indices = sorted(order[[i, low[i], high[i]]].tolist())
+            return indices[0], indices[1], indices[2]
+        too_small = sums < active_remains
+        low[active[too_small]] += 1
+        high[active[~too_small]] -= 1
+        active = active[low[active] < high[active]]
+    return None
+
+
+def _needs_exact_counts(n: int, upper_bound: int) -> bool:
+    """Whether rounding the float convolution may give wrong counts. The values
+    of the spectrum are up to n^3, and the rounding error grows with the log of
+    the transform size."""
+    length = next_fast_len(3 * upper_bound - 2, "real")
+    return n**3 * length.bit_length() >= 2**50
+
+
+def _index_triple_counts(
+    values: IntArray, upper_bound: int, exact: bool
+) -> npt.NDArray[Any]:
+    """result[s] is the number of triples of distinct indices i < j < k with
+    values[i] + values[j] + values[k] = s, for every s <= 3 * (upper_bound - 1)"""
+    # With A(x) = sum(x^v), A_2(x) = sum(x^2v) and A_3(x) = sum(x^3v) over the
+    # values, the triples of distinct indices are (A^3 - 3 A A_2 + 2 A_3) / 6:
+    # A^3 counts ordered triples of indices, including repeated ones
+    counts = np.bincount(values, minlength=upper_bound)
+    length = 3 * upper_bound - 2
+    squares = np.zeros(2 * upper_bound - 1, dtype=np.int64)
+    squares[::2] = counts
+    cubes = np.zeros(length, dtype=np.int64)
+    cubes[::3] = counts
+    if exact:
+        counts_list: List[int] = counts.tolist()
+        all_triples = np.array(ntt_power(counts_list, 3))
+        repeated_pairs = np.array(ntt_polymul(counts_list, squares.tolist()))
+        combined: npt.NDArray[Any] = all_triples - 3 * repeated_pairs
+    else:
+        n = next_fast_len(length, "real")
+        counts_spectrum = rfft_batch(np.pad(counts, (0, n - upper_bound)))
+        squares_spectrum = rfft_batch(np.pad(squares, (0, n - len(squares))))
+        combined_spectrum = counts_spectrum**3 - 3 * counts_spectrum * squares_spectrum
+        combined = np.rint(irfft_batch(combined_spectrum, n)[:length]).astype(np.int64)
+    result: npt.NDArray[Any] = (combined + 2 * cubes) // 6
+    return result
+
+
+def _index_pair_counts(
+    values: IntArray, upper_bound: int, exact: bool
+) -> npt.NDArray[Any]:
+    """result[s] is the number of pairs of distinct indices i < j with
+    values[i] + values[j] = s, which is (A^2 - A_2) / 2"""
+    counts = np.bincount(values, minlength=upper_bound)
+    length = 2 * upper_bound - 1
+    squares = np.zeros(length, dtype=np.int64)
+    squares[::2] = counts
+    if exact:
+        all_pairs = np.array(ntt_power(counts.tolist(), 2))
+    else:
+        n = next_fast_len(length, "real")
+        spectrum = rfft_batch(np.pad(counts, (0, n - upper_bound)))
+        all_pairs = np.rint(irfft_batch(spectrum**2, n)[:length]).astype(np.int64)
+    result: npt.NDArray[Any] = (all_pairs - squares) // 2
+    return result
+
+
+def choose_three_sum_strategy(
+    n: int, upper_bound: int, queries: int = 1
+) -> Literal["hash", "sorted", "fft"]:
+    """The cheapest strategy according to the cost model. The pair strategies
+    run once per query, while a single convolution answers all of them."""
+    cost_model.ensure_profile()
+    pairs = n * (n - 1) / 2
+    hash_cost = queries * pairs * cost_model.HASH_PAIR_CONSTANT
+    sorted_cost = queries * (
+        n * cost_model.SORTED_STEP_CONSTANT + pairs * cost_model.SORTED_PAIR_CONSTANT
+    )
+    fft_cost = upper_bound * cost_model.HISTOGRAM_CONSTANT
+    fft_cost += cost_model.fft_convolution_cost(
+        next_fast_len(3 * upper_bound - 2, "real"), real=True
+    )
+    if fft_cost < min(hash_cost, sorted_cost):
+        return "fft"
+    return "hash" if hash_cost <= sorted_cost else "sorted"
+
+
+def three_sum_batch(
+    array: Sequence[int],
+    upper_bound: int,
+    target_sums: Sequence[int],
+    strategy: Strategy = "auto",
+) -> List[bool]:
+    """For every target sum, whether it is the sum of 3 elements of the array
+    at distinct positions. values in array < upper bound"""
+    values = _validate(array, upper_bound)
+    for target_sum in target_sums:
+        if target_sum > 3 * (upper_bound - 1):
+            raise ValueError("Target sum is too large")
+    if strategy == "auto":
+        strategy = choose_three_sum_strategy(len(values), upper_bound, len(target_sums))
+    if strategy == "hash":
+        return [
+            _hash_three_sum(values, target_sum) is not None
+            for target_sum in target_sums
+        ]
+    if strategy == "sorted":
+        return [
+            _sorted_three_sum(values, target_sum) is not None
+            for target_sum in target_sums
+        ]
+    exact = strategy == "ntt" or _needs_exact_counts(len(values), upper_bound)
+    counts = _index_triple_counts(values, upper_bound, exact)
+    return [0 <= target_sum and counts[target_sum] > 0 for target_sum in target_sums]
+
+
+def three_sum(
+    array: Sequence[int],
+    upper_bound: int,
+    target_sum: int,
+    strategy: Strategy = "auto",
+) -> bool:
+    """Whether target_sum is the sum of 3 elements of the array at distinct
+    positions, with the strategy chosen by the density of the array"""
+    return three_sum_batch(array, upper_bound, [target_sum], strategy)[0]
+
+
+def count_three_sums(array: Sequence[int], upper_bound: int) -> List[int]:
+    """result[s] is the number of triples of elements of the array, at distinct
+    positions, that sum to s - for every s <= 3 * (upper_bound - 1)"""
+    values = _validate(array, upper_bound)
+    exact = _needs_exact_counts(len(values), upper_bound)
+    counts: List[int] = _index_triple_counts(values, upper_bound, exact).tolist()
+    return counts
+
+
+def find_three_sum(
+    array: Sequence[int],
+    upper_bound: int,
+    target_sum: int,
+    strategy: Strategy = "auto",
+) -> Optional[Triple]:
+    """Indices i < j < k with array[i] + array[j] + array[k] = target_sum, or
+    None if there are none"""
+    values = _validate(array, upper_bound)
+    if target_sum > 3 * (upper_bound - 1):
+        raise ValueError("Target sum is too large")
+    if strategy == "auto":
+        strategy = choose_three_sum_strategy(len(values), upper_bound)
+    if strategy == "hash":
+        return _hash_three_sum(values, target_sum)
+    if strategy == "sorted":
+        return _sorted_three_sum(values, target_sum)
+    if target_sum < 0:
+        return None
+    exact = strategy == "ntt" or _needs_exact_counts(len(values), upper_bound)
+    pair_counts = _index_pair_counts(values, upper_bound, exact)
+    value_counts = np.bincount(values, minlength=upper_bound)
+    # Element i is in a triple if some pair of other elements sums to
+    # target_sum - values[i]. The pairs (i, j) with values[j] = target_sum -
+    # 2 * values[i] are the ones containing i.
+    remains = target_sum - values
+    doubled_remains = target_sum - 2 * values
+    for i in np.flatnonzero((0 <= remains) & (remains < len(pair_counts))).tolist():
+        pairs = int(pair_counts[remains[i]])
+        if 0 <= doubled_remains[i] < upper_bound:
+            pairs -= int(value_counts[doubled_remains[i]])
+            if doubled_remains[i] == values[i]:
+                pairs += 1
+        if pairs == 0:
+            continue
+        elements: List[int] = values.tolist()
+        others = elements[:i] + elements[i + 1 :]
+        pair = _find_pair(others, 0, len(others), int(remains[i]))
+        assert pair is not None, "The counts guarantee a pair"
+        # Back to indices of the array, which has i where others does not
+        j, k = (index + (index >= i) for index in pair)
+        indices = sorted((i, j, k))
+        return indices[0], indices[1], indices[2]
+    return None
@@ -1,33 +1,158 @@
-"""NOT WORKING AT THE MOMENT"""
-
-
 import random
-from typing import List
+from typing import List, NamedTuple, Optional
 
-import matplotlib.pyplot as plt  # type: ignore
+import numpy as np
+import numpy.typing as npt
 
-from naive_fft.iii_fft.fft import fft, ifft
+from naive_fft.i_number_theory.bounded_cache import BoundedCache
+from naive_fft.ii_poly_multiplication.evaluate_poly_numpy import ComplexArray
+from naive_fft.iii_fft.fft import FloatArray, irfft_batch, next_fast_len, rfft_batch
+from naive_fft.iii_fft.partial_dft import choose_bins_method, dft_bins
 
 RANDOM_SIGNAL_LENGTH = 1000
-OFFSET = 0
+OFFSET = 100
+NOISE = 0.5
+
+# Bins weaker than this, relative to the strongest one, carry no phase
+# information worth whitening
+PHAT_EPSILON = 1e-12
+
+# Reference spectra kept per estimator - one per signal length in use
+REFERENCE_SPECTRA_CACHE_SIZE = 4
+
+
+class OffsetEstimate(NamedTuple):
+    # signal[i] matches reference[i - lag]
+    lag: int
+    # The lag refined by fitting a parabola through the correlation peak
+    sub_sample_lag: float
+    # Height of the normalized correlation peak - 1 for a pure delay, and close
+    # to 0 for unrelated signals
+    confidence: float
+
+
+class OffsetEstimator:
+    """Estimates the offsets of any number of signals against one reference
+    with GCC-PHAT: the cross spectrum of the signals is whitened, so that only
+    its phase - the delay - is left, and transformed back to a sharp peak at
+    the lag. The reference spectrum is computed once per transform size, for
+    the last REFERENCE_SPECTRA_CACHE_SIZE sizes.
+
+    estimator = OffsetEstimator(reference, max_lag=100)
+    for signal in signals:
+        lag, sub_sample_lag, confidence = estimator.estimate(signal)
+    """
+
+    def __init__(self, reference: npt.ArrayLike, max_lag: Optional[int] = None):
+        self.reference = np.asarray(reference, dtype=np.float64)
+        if self.reference.ndim != 1 or self.reference.size == 0:
+            raise ValueError("Expected a non empty one dimensional reference")
+        if max_lag is not None and max_lag < 0:
+            raise ValueError("max_lag must not be negative")
+        self.max_lag = max_lag
+        self._reference_spectra: BoundedCache[int, ComplexArray] = BoundedCache(
+            REFERENCE_SPECTRA_CACHE_SIZE
+        )
+
+    def _reference_spectrum(self, n: int) -> ComplexArray:
+        spectrum = self._reference_spectra.get(n)
+        if spectrum is None:
+            padded = np.zeros(n)
+            padded[: len(self.reference)] = self.reference
+            spectrum = np.conjugate(rfft_batch(padded))
+            # Shared by every estimate, so that none may modify it
+            spectrum.setflags(write=False)
+            self._reference_spectra.put(n, spectrum)
+        return spectrum
+
+    def estimate(self, signal: npt.ArrayLike) -> OffsetEstimate:
+        signal_array = np.asarray(signal, dtype=np.float64)
+        if signal_array.ndim != 1:
+            raise ValueError("Expected a one dimensional signal")
+        return self.estimate_batch(signal_array[np.newaxis, :])[0]
+
+    def estimate_batch(self, signals: npt.ArrayLike) -> List[OffsetEstimate]:
+        """Estimate the offset of every row of a (batch, length) array"""
+        rows = np.asarray(signals, dtype=np.float64)
+        if rows.ndim != 2 or rows.shape[1] == 0:
+            raise ValueError("Expected a (batch, length) array of signals")
+        length = rows.shape[1]
+        # Zero padded, so that lags do not wrap around
+        n = next_fast_len(len(self.reference) + length - 1, "real")
+        cross_spectra = rfft_batch(np.pad(rows, ((0, 0), (0, n - length))))
+        cross_spectra *= self._reference_spectrum(n)
+        magnitudes = np.abs(cross_spectra)
+        floor = PHAT_EPSILON * magnitudes.max(axis=1, keepdims=True)
+        whitened = cross_spectra / np.maximum(magnitudes, floor)
+
+        # Lags from -(len(reference) - 1) to length - 1, negative lags wrapped
+        # to the end of the correlation
+        max_negative_lag = len(self.reference) - 1
+        max_positive_lag = length - 1
+        if self.max_lag is not None:
+            max_negative_lag = min(max_negative_lag, self.max_lag)
+            max_positive_lag = min(max_positive_lag, self.max_lag)
+        lags = np.arange(-max_negative_lag, max_positive_lag + 1)
+        if choose_bins_method(n, len(lags)) == "fft":
+            correlations = irfft_batch(whitened, n)
+            windows = correlations[:, lags % n]
+        else:
+            windows = np.array([_correlation_at(row, n, lags) for row in whitened])
+        return [_estimate_peak(window, max_negative_lag) for window in windows]
+
+
+def _correlation_at(
+    half_spectrum: ComplexArray, n: int, lags: npt.NDArray[np.int64]
+) -> FloatArray:
+    """irfft(half_spectrum, n)[lags], when only a few lags are searched"""
+    # The correlation is real, so it is its own conjugate:
+    # sum_k X[k] * e^(2*pi*i*k*t/n) / n = sum_k conj(X[k]) * e^(-2*pi*i*k*t/n) / n
+    # a few bins of the transform of the conjugate spectrum
+    mirrored = np.conjugate(half_spectrum[1 : (n + 1) // 2][::-1])
+    spectrum = np.concatenate([half_spectrum, mirrored])
+    correlation: FloatArray = dft_bins(np.conjugate(spectrum), lags).real / n
+    return correlation
+
+
+def _estimate_peak(window: FloatArray, zero_lag_index: int) -> OffsetEstimate:
+    peak = int(np.argmax(window))
+    offset = 0.0
+    if 0 < peak < len(window) - 1:
+        # Vertex of the parabola through the peak and its neighbours
+        before, at, after = window[peak - 1 : peak + 2]
+        curvature = before - 2 * at + after
+        if curvature < 0:
+            offset = float(0.5 * (before - after) / curvature)
+    return OffsetEstimate(
+        lag=peak - zero_lag_index,
+        sub_sample_lag=peak - zero_lag_index + offset,
+        confidence=float(np.clip(window[peak], 0, 1)),
+    )
+
+
+def estimate_offset(
+    reference: npt.ArrayLike, signal: npt.ArrayLike, max_lag: Optional[int] = None
+) -> OffsetEstimate:
+    """The lag by which signal trails reference, searched in
+    [-max_lag, max_lag] when max_lag is given"""
+    return OffsetEstimator(reference, max_lag).estimate(signal)
 
 
 def main() -> None:
-    random_signal: List[complex] = []
+    random_signal: List[float] = []
     for i in range(RANDOM_SIGNAL_LENGTH):
         random_signal.append(random.random() - 0.5)
-    offset_random_signal = random_signal[OFFSET:] + random_signal[:OFFSET]
-    for i in range(RANDOM_SIGNAL_LENGTH):
-        offset_random_signal[i] += random.random() - 0.5
-        pass
-    random_signal_fft = fft(random_signal)
-    offset_random_signal_fft = fft(offset_random_signal)
-    convolution_fft = [
-        x * y for (x, y) in zip(random_signal_fft, offset_random_signal_fft)
+    # The same signal, starting OFFSET samples later, with noise
+    offset_random_signal = [0.0] * OFFSET + random_signal[
+        : RANDOM_SIGNAL_LENGTH - OFFSET
     ]
-    convolution = ifft(convolution_fft)
-    plt.plot([abs(x) for x in convolution])
-    plt.show()
+    for i in range(RANDOM_SIGNAL_LENGTH):
+        offset_random_signal[i] += (random.random() - 0.5) * NOISE
+    estimate = estimate_offset(random_signal, offset_random_signal)
+    print(
+        f"Detected offset: {estimate.lag} ({estimate.sub_sample_lag:.2f}), "
+        f"confidence {estimate.confidence:.2f}"
+    )
 
 
 if __name__ == "__main__":
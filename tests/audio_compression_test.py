@@ -0,0 +1,95 @@
+import math
+import os
+import pathlib
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+from scipy.io import wavfile  # type: ignore
+
+import naive_fft.e1_start_example.e1_iii_audio_compression as compression_module
+from naive_fft.e1_start_example.e1_iii_audio_compression import (
+    SAMPLE_MAX,
+    analyze_audio_file,
+    band_limited,
+)
+from naive_fft.e1_start_example.e1_iv_streaming_audio_compression import (
+    compress_audio_file_streaming,
+)
+
+SAMPLE_RATE = 8000
+TONE_FREQUENCY = 1000
+NUM_SAMPLES = 20_000
+# The first and last frames are only partially covered by the window overlap
+EDGE_SAMPLES = 2048
+
+
+def write_tone(path: str) -> npt.NDArray[np.int16]:
+    t = np.arange(NUM_SAMPLES) / SAMPLE_RATE
+    tone = 0.5 * np.sin(2 * math.pi * TONE_FREQUENCY * t)
+    data: npt.NDArray[np.int16] = (np.array([tone, -tone]).T * SAMPLE_MAX).astype(
+        np.int16
+    )
+    wavfile.write(path, SAMPLE_RATE, data)
+    return data
+
+
+def test_streaming_bandpass(tmp_path: pathlib.Path) -> None:
+    source = os.path.join(tmp_path, "tone.wav")
+    data = write_tone(source)
+    kept = os.path.join(tmp_path, "kept.wav")
+    removed = os.path.join(tmp_path, "removed.wav")
+    compress_audio_file_streaming(source, kept, 500, 2000, frame_size=1024)
+    compress_audio_file_streaming(source, removed, 2000, 4000, frame_size=1024)
+    _, kept_data = wavfile.read(kept)
+    _, removed_data = wavfile.read(removed)
+    assert kept_data.shape == data.shape
+    assert removed_data.shape == data.shape
+    middle = slice(EDGE_SAMPLES, NUM_SAMPLES - EDGE_SAMPLES)
+    kept_error = np.abs(kept_data[middle].astype(int) - data[middle]).max()
+    assert kept_error < SAMPLE_MAX * 0.01
+    assert np.abs(removed_data[middle].astype(int)).max() < SAMPLE_MAX * 0.01
+
+
+def test_cached_analysis(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    source = os.path.join(tmp_path, "tone.wav")
+    data = write_tone(source)
+    cache_dir = tmp_path / "cache"
+    analysis = analyze_audio_file(source, cache_dir)
+    assert len(list(cache_dir.glob("*.npy"))) == 2
+    kept_data, _ = band_limited(analysis, 500, 2000)
+    removed_data, _ = band_limited(analysis, 2000, 4000)
+    assert kept_data.shape == data.shape
+    # The whole signal is transformed at its exact length, so the tone is kept
+    # up to the rounding of the samples
+    assert np.abs(kept_data.astype(int) - data).max() <= 1
+    assert np.abs(removed_data.astype(int)).max() <= 1
+
+    # A second analysis of the same contents is read from the cache
+    def no_transform(*args: object, **kwargs: object) -> None:
+        raise AssertionError("The spectra should be cached")
+
+    monkeypatch.setattr(compression_module, "rfft_batch", no_transform)
+    cached_analysis = analyze_audio_file(source, cache_dir)
+    cached_data, _ = band_limited(cached_analysis, 500, 2000)
+    assert np.array_equal(cached_data, kept_data)
+
+    # Spectra of another format version are not read
+    monkeypatch.setattr(compression_module, "SPECTRUM_FORMAT_VERSION", 2)
+    with pytest.raises(AssertionError, match="should be cached"):
+        analyze_audio_file(source, cache_dir)
+
+
+def test_band_limited_clips_overshoot(tmp_path: pathlib.Path) -> None:
+    # A full scale square wave rings above full scale once its harmonics are
+    # removed
+    source = os.path.join(tmp_path, "square.wav")
+    t = np.arange(NUM_SAMPLES) / SAMPLE_RATE
+    square = np.sign(np.sin(2 * math.pi * 100 * t + 0.1))
+    wavfile.write(source, SAMPLE_RATE, (square * (SAMPLE_MAX - 1)).astype(np.int16))
+    analysis = analyze_audio_file(source, tmp_path / "cache")
+    data, _ = band_limited(analysis, 0, 1000)
+    assert data.max() == SAMPLE_MAX - 1
+    assert data.min() == -SAMPLE_MAX
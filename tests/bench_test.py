@@ -0,0 +1,54 @@
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+from naive_fft import bench
+from naive_fft.i_number_theory.number_theory import is_prime
+
+BENCH_ARGUMENTS = ["--max-size", "64", "--sizes-per-family", "3", "--repeats", "3"]
+
+
+def test_family_sizes() -> None:
+    rng = random.Random(0)
+    assert bench.family_sizes("pow2", 256, 3, rng) == [64, 128, 256]
+    primes = bench.family_sizes("primes", 1000, 4, rng)
+    assert all(is_prime(size) and size <= 1000 for size in primes)
+    smooth = bench.family_sizes("smooth", 1000, 4, rng)
+    assert all(size <= 1000 for size in smooth)
+    assert len(bench.family_sizes("random", 1000, 4, rng)) == 4
+    with pytest.raises(ValueError):
+        bench.family_sizes("odd", 1000, 4, rng)
+
+
+def test_results_round_trip(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(bench, "MIN_REPEAT_NS", 10**5)
+    for output_format in ["json", "csv"]:
+        path = tmp_path / f"results.{output_format}"
+        arguments = BENCH_ARGUMENTS + ["--format", output_format]
+        assert bench.main(arguments + ["--output", str(path)]) == 0
+        results = bench.load_results(str(path))
+        assert {result.family for result in results} == set(bench.FAMILIES)
+        assert all(result.median_ns > 0 for result in results)
+
+
+def test_regressions_fail(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(bench, "MIN_REPEAT_NS", 10**5)
+    arguments = BENCH_ARGUMENTS + ["--families", "pow2"]
+    baseline = tmp_path / "baseline.json"
+    assert bench.main(arguments + ["--output", str(baseline)]) == 0
+    results = json.loads(baseline.read_text())["results"]
+
+    slow_baseline = tmp_path / "slow.json"
+    for result in results:
+        result["median_ns"] *= 1000
+    slow_baseline.write_text(json.dumps({"results": results}))
+    assert bench.main(arguments + ["--baseline", str(slow_baseline)]) == 0
+
+    fast_baseline = tmp_path / "fast.json"
+    for result in results:
+        result["median_ns"] /= 10**6
+        result["iqr_ns"] = 0
+    fast_baseline.write_text(json.dumps({"results": results}))
+    assert bench.main(arguments + ["--baseline", str(fast_baseline)]) == 1
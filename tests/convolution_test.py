@@ -0,0 +1,77 @@
+import random
+from typing import List, Literal
+
+import numpy as np
+import pytest
+
+from naive_fft.convolution import (
+    choose_method,
+    convolve,
+    correlate,
+    polymul,
+)
+
+CONVOLUTION_TEST_SIZES = [
+    (1, 1),
+    (1, 7),
+    (2, 7),
+    (5, 3),
+    (16, 16),
+    (30, 200),
+    (31, 200),
+    (300, 257),
+]
+MODES: List[Literal["full", "same", "valid"]] = ["full", "same", "valid"]
+METHODS: List[Literal["auto", "direct", "fft"]] = ["direct", "fft", "auto"]
+
+MAX_TOLERANCE = 1e-8
+
+
+def test_convolve_matches_numpy() -> None:
+    for n, m in CONVOLUTION_TEST_SIZES:
+        signal_1 = np.random.random(n)
+        signal_2 = np.random.random(m) + 1j * np.random.random(m)
+        for mode in MODES:
+            expected_real = np.convolve(signal_1, signal_1[::-1], mode)
+            expected_complex = np.convolve(signal_1, signal_2, mode)
+            for method in METHODS:
+                real = convolve(signal_1, signal_1[::-1], mode, method)
+                assert np.isrealobj(real)
+                assert np.allclose(real, expected_real, atol=MAX_TOLERANCE)
+                result = convolve(signal_1, signal_2, mode, method)
+                assert np.allclose(result, expected_complex, atol=MAX_TOLERANCE)
+
+
+def test_correlate_matches_numpy() -> None:
+    for n, m in CONVOLUTION_TEST_SIZES:
+        signal_1 = np.random.random(n) + 1j * np.random.random(n)
+        signal_2 = np.random.random(m) + 1j * np.random.random(m)
+        for mode in MODES:
+            expected = np.correlate(signal_1, signal_2, mode)
+            assert np.allclose(
+                correlate(signal_1, signal_2, mode), expected, atol=MAX_TOLERANCE
+            )
+
+
+def test_polymul_exact_integers() -> None:
+    poly_1 = [random.randint(-(10**12), 10**12) for _ in range(300)]
+    poly_2 = [random.randint(-(10**12), 10**12) for _ in range(200)]
+    expected = [0] * (len(poly_1) + len(poly_2) - 1)
+    for i, x in enumerate(poly_1):
+        for j, y in enumerate(poly_2):
+            expected[i + j] += x * y
+    assert polymul(poly_1, poly_2, "direct").tolist() == expected
+    assert polymul(poly_1, poly_2, "fft").tolist() == expected
+
+
+def test_method_selection() -> None:
+    assert choose_method(10, 10) == "direct"
+    assert choose_method(100_000, 3) == "direct"
+    assert choose_method(100_000, 100_000) == "fft"
+
+
+def test_invalid_arguments() -> None:
+    with pytest.raises(ValueError):
+        convolve([], [1.0])
+    with pytest.raises(ValueError):
+        convolve([1.0], [1.0], "circular")  # type: ignore
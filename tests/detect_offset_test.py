@@ -0,0 +1,77 @@
+import numpy as np
+
+from naive_fft.iii_fft.fft import FloatArray, irfft_batch, rfft_batch
+from naive_fft.vi_convolution_for_offset_restoration.detect_offset import (
+    REFERENCE_SPECTRA_CACHE_SIZE,
+    OffsetEstimator,
+    estimate_offset,
+)
+
+SIGNAL_LENGTH = 4096
+NOISE = 0.1
+MIN_CONFIDENCE = 0.3
+SUB_SAMPLE_TOLERANCE = 0.25
+# The noise and signals are seeded, so that the thresholds hold on every run
+SEED = 0
+
+
+def delayed(signal: FloatArray, delay: float) -> FloatArray:
+    """signal delayed by a possibly fractional number of samples, cyclically"""
+    n = len(signal)
+    phases = np.exp(-2j * np.pi * np.arange(n // 2 + 1) * delay / n)
+    return irfft_batch(rfft_batch(signal) * phases, n)
+
+
+def test_integer_offsets() -> None:
+    rng = np.random.default_rng(SEED)
+    reference = rng.standard_normal(SIGNAL_LENGTH)
+    for lag in [0, 1, 37, -250]:
+        signal = np.roll(reference, lag) + NOISE * rng.standard_normal(SIGNAL_LENGTH)
+        estimate = estimate_offset(reference, signal)
+        assert estimate.lag == lag
+        assert estimate.confidence > MIN_CONFIDENCE
+
+
+def test_sub_sample_offsets() -> None:
+    rng = np.random.default_rng(SEED)
+    reference = rng.standard_normal(SIGNAL_LENGTH)
+    estimator = OffsetEstimator(reference, max_lag=100)
+    delays = [0.25, 10.5, -7.75]
+    signals = np.array([delayed(reference, delay) for delay in delays])
+    for delay, estimate in zip(delays, estimator.estimate_batch(signals)):
+        assert abs(estimate.sub_sample_lag - delay) < SUB_SAMPLE_TOLERANCE
+        assert estimate == estimator.estimate(delayed(reference, delay))
+
+
+def test_max_lag_and_unrelated_signals() -> None:
+    rng = np.random.default_rng(SEED)
+    reference = rng.standard_normal(SIGNAL_LENGTH)
+    signal = np.roll(reference, 300)
+    assert abs(estimate_offset(reference, signal, max_lag=100).lag) <= 100
+    unrelated = estimate_offset(reference, rng.standard_normal(SIGNAL_LENGTH))
+    assert unrelated.confidence < MIN_CONFIDENCE
+
+
+def test_pruned_correlation_matches_full() -> None:
+    rng = np.random.default_rng(SEED)
+    reference = rng.standard_normal(SIGNAL_LENGTH)
+    signal = delayed(reference, 3.25) + NOISE * rng.standard_normal(SIGNAL_LENGTH)
+    # Few enough lags that only they are computed
+    pruned = estimate_offset(reference, signal, max_lag=5)
+    full = estimate_offset(reference, signal)
+    assert pruned.lag == full.lag == 3
+    assert abs(pruned.sub_sample_lag - full.sub_sample_lag) < 1e-9
+    assert abs(pruned.confidence - full.confidence) < 1e-9
+
+
+def test_reference_spectra_are_bounded() -> None:
+    rng = np.random.default_rng(SEED)
+    reference = rng.standard_normal(SIGNAL_LENGTH)
+    estimator = OffsetEstimator(reference, max_lag=10)
+    # Signals of many lengths, each padded to a different transform size
+    for power in range(2 * REFERENCE_SPECTRA_CACHE_SIZE):
+        signal = np.pad(reference, (0, SIGNAL_LENGTH * (2**power - 1)))
+        assert estimator.estimate(signal).lag == 0
+    info = estimator._reference_spectra.info()
+    assert info.size == REFERENCE_SPECTRA_CACHE_SIZE
+    assert info.evictions == REFERENCE_SPECTRA_CACHE_SIZE
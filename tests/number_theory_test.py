@@ -1,12 +1,22 @@
+import threading
 import time
 import typing
 from typing import List
 
+import pytest
+
+import naive_fft.i_number_theory.number_theory as number_theory
 from naive_fft.i_number_theory.number_theory import (
+    FACTORIZATION_CACHE,
+    FACTORIZATION_CACHE_SIZE,
+    cache_info,
     factorize,
+    first_prime_after,
     is_prime,
     populate_primes_up_to,
+    primitive_root,
     reset_primes,
+    set_cache_size,
     sigma_0,
     sigma_1,
 )
@@ -77,3 +87,101 @@ def test_perfect_numbers() -> None:
     assert 12 not in PERFECT_NUMBERS
     for perfect_number in PERFECT_NUMBERS:
         assert sigma_1(perfect_number) == perfect_number * 2
+
+
+PRIMES_BELOW_10_TO_THE_6 = 78_498
+# Carmichael numbers and strong pseudoprimes to small bases
+HARD_COMPOSITES = [561, 1105, 2047, 3215031751, 3825123056546413051]
+LARGE_PRIMES = [1_000_000_007, 2**31 - 1, 2**61 - 1, 2**89 - 1]
+
+
+def test_sieve() -> None:
+    reset_primes()
+    populate_primes_up_to(10**6)
+    assert sum(1 for i in range(10**6) if is_prime(i)) == PRIMES_BELOW_10_TO_THE_6
+    # The smallest prime factors take a byte per sieved number
+    table = number_theory.GLOBAL_SMALLEST_PRIME_FACTOR
+    assert table.itemsize * len(table) <= 10**6
+    assert first_prime_after(10**6) == 1_000_003
+
+
+def test_primes_beyond_sieve() -> None:
+    reset_primes()
+    for composite in HARD_COMPOSITES:
+        assert not is_prime(composite)
+    for prime in LARGE_PRIMES:
+        assert is_prime(prime)
+    assert first_prime_after(10**9) == 1_000_000_007
+
+
+def test_first_prime_after_keeps_the_sieve_bound() -> None:
+    reset_primes()
+    populate_primes_up_to(3_000_000)
+    # Found in the sieve, and past its end, without sieving up to 2n
+    assert first_prime_after(2_999_990) == 2_999_999
+    assert first_prime_after(3_000_000) == 3_000_017
+    assert number_theory.GLOBAL_PRIMES_CHECKED_UP_TO == 3_000_000
+
+
+def test_factorize_beyond_sieve() -> None:
+    reset_primes()
+    for n in [2**64 + 1, 600_851_475_143, 2**40 * 3**7, 1_000_003 * 1_000_033]:
+        factorization = factorize(n)
+        product = 1
+        for prime, power in factorization.items():
+            assert is_prime(prime)
+            product *= prime**power
+        assert product == n
+
+
+def test_factorization_cache() -> None:
+    FACTORIZATION_CACHE.clear()
+    set_cache_size(4)
+    try:
+        first = factorize(360)
+        assert dict(first) == {2: 3, 3: 2, 5: 1}
+        # A fresh dict, which does not change the cached factorization
+        first[7] += 1
+        assert dict(factorize(360)) == {2: 3, 3: 2, 5: 1}
+        assert factorize(360)[7] == 0
+        for invalid in [0, -12]:
+            with pytest.raises(ValueError):
+                factorize(invalid)
+        for n in range(2, 7):
+            factorize(n)
+        info = cache_info()["factorize"]
+        assert info.hits == 2
+        assert info.misses == 6
+        assert info.evictions == 2
+        assert info.size == 4
+    finally:
+        set_cache_size(FACTORIZATION_CACHE_SIZE)
+
+
+def test_concurrent_factorize() -> None:
+    reset_primes()
+    FACTORIZATION_CACHE.clear()
+    errors: List[int] = []
+
+    def work(offset: int) -> None:
+        for n in range(offset + 1, 200_000, 997):
+            product = 1
+            for prime, power in factorize(n).items():
+                product *= prime**power
+            if product != n or sigma_0(n) < 1:
+                errors.append(n)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_primitive_root() -> None:
+    for prime in [3, 5, 7, 998_244_353, 2_013_265_921]:
+        root = primitive_root(prime)
+        for q in factorize(prime - 1):
+            assert pow(root, (prime - 1) // q, prime) != 1
+    assert primitive_root(998_244_353) == 3
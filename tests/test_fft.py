@@ -1,11 +1,26 @@
 import random
-from typing import List
+from typing import List, Literal, Optional, Tuple
 
+import numpy as np
+import pytest
 from numpy.fft import fft as np_fft
+from numpy.fft import fftn as np_fftn
 from numpy.fft import ifft as np_ifft
+from numpy.fft import rfft as np_rfft
 
+import naive_fft.iii_fft.fft as fft_module
+from naive_fft.i_number_theory.number_theory import factorize
+from naive_fft.iii_fft.czt import czt, zoom_fft
 from naive_fft.iii_fft.fft import fft as our_fft
+from naive_fft.iii_fft.fft import fft2, fft_batch, fft_pruned, fftn
 from naive_fft.iii_fft.fft import ifft as our_ifft
+from naive_fft.iii_fft.fft import ifft2, ifft_batch, ifft_pruned, ifftn
+from naive_fft.iii_fft.fft import irfft as our_irfft
+from naive_fft.iii_fft.fft import irfft_batch, irfft_pruned, next_fast_len
+from naive_fft.iii_fft.fft import rfft as our_rfft
+from naive_fft.iii_fft.fft import rfft_batch, rfft_pruned
+from naive_fft.iii_fft.ntt import ntt_polymul, ntt_power
+from naive_fft.iii_fft.partial_dft import choose_bins_method, dft_bins
 from naive_fft.utils import l2
 
 NUM_TESTS = 20
@@ -13,6 +28,10 @@ MAX_SIZE = 4
 
 MAX_TOLERANCE = 1e-5
 
+KINDS: List[Literal["complex", "real"]] = ["complex", "real"]
+BACKENDS: List[Literal["python", "numpy"]] = ["python", "numpy"]
+NORMS: List[Literal["backward", "ortho", "forward"]] = ["backward", "ortho", "forward"]
+
 
 def test_outs_and_numpy_fft() -> None:
     for _ in range(NUM_TESTS):
@@ -25,3 +44,220 @@ def test_outs_and_numpy_fft() -> None:
         np_samples_ifft = list(np_ifft(samples))
         assert l2(our_samples_fft, np_samples_fft) < MAX_TOLERANCE
         assert l2(our_samples_ifft, np_samples_ifft) < MAX_TOLERANCE
+
+
+BACKEND_TEST_SIZES = [1, 2, 3, 6, 8, 12, 17, 30, 64, 97, 210, 1024]
+
+
+def test_numpy_backend_matches_python_backend() -> None:
+    for size in BACKEND_TEST_SIZES:
+        samples: List[complex] = []
+        for _ in range(size):
+            samples.append(random.random() * 2 - 1 + 1j * (random.random() * 2 - 1))
+        samples_array = np.array(samples, dtype=np.complex128)
+        python_fft = our_fft(samples)
+        numpy_fft = our_fft(samples_array, backend="numpy")
+        assert l2(python_fft, list(numpy_fft)) < MAX_TOLERANCE
+        assert l2(list(numpy_fft), list(np_fft(samples_array))) < MAX_TOLERANCE
+        python_ifft = our_ifft(samples)
+        numpy_ifft = our_ifft(samples_array, backend="numpy")
+        assert l2(python_ifft, list(numpy_ifft)) < MAX_TOLERANCE
+
+
+def test_norm_matches_numpy() -> None:
+    for size in BACKEND_TEST_SIZES:
+        samples: List[complex] = []
+        for _ in range(size):
+            samples.append(random.random() * 2 - 1 + 1j * (random.random() * 2 - 1))
+        samples_array = np.array(samples, dtype=np.complex128)
+        for norm in NORMS:
+            expected_fft = list(np_fft(samples_array, norm=norm))
+            expected_ifft = list(np_ifft(samples_array, norm=norm))
+            assert l2(our_fft(samples, norm=norm), expected_fft) < MAX_TOLERANCE
+            assert l2(our_ifft(samples, norm=norm), expected_ifft) < MAX_TOLERANCE
+            numpy_fft = our_fft(samples_array, "numpy", norm)
+            assert l2(list(numpy_fft), expected_fft) < MAX_TOLERANCE
+            numpy_ifft = our_ifft(samples_array, "numpy", norm)
+            assert l2(list(numpy_ifft), expected_ifft) < MAX_TOLERANCE
+            batch = np.stack([samples_array, samples_array[::-1]])
+            np.testing.assert_allclose(
+                fft_batch(batch, norm=norm), np_fft(batch, norm=norm), atol=1e-9
+            )
+            np.testing.assert_allclose(
+                ifft_batch(batch, norm=norm), np_ifft(batch, norm=norm), atol=1e-9
+            )
+    with pytest.raises(ValueError):
+        our_fft([1j, 2j], norm="unitary")  # type: ignore[call-overload]
+
+
+def test_rfft_matches_numpy() -> None:
+    for size in BACKEND_TEST_SIZES:
+        samples: List[float] = []
+        for _ in range(size):
+            samples.append(random.random() * 2 - 1)
+        samples_array = np.array(samples, dtype=np.float64)
+        np_samples_rfft = list(np_rfft(samples_array))
+        our_samples_rfft = our_rfft(samples)
+        assert len(our_samples_rfft) == size // 2 + 1
+        assert l2(our_samples_rfft, np_samples_rfft) < MAX_TOLERANCE
+        numpy_samples_rfft = our_rfft(samples_array, backend="numpy")
+        assert l2(list(numpy_samples_rfft), np_samples_rfft) < MAX_TOLERANCE
+        reconstructed = our_irfft(our_samples_rfft, size)
+        assert l2(reconstructed, samples) < MAX_TOLERANCE
+        numpy_reconstructed = our_irfft(numpy_samples_rfft, size, backend="numpy")
+        assert l2(list(numpy_reconstructed), samples) < MAX_TOLERANCE
+
+
+def test_irfft_ignores_imaginary_self_conjugate_bins() -> None:
+    # The imaginary parts of bin 0, and of bin n / 2 for even n, are not part
+    # of the spectrum of any real signal, and are dropped as numpy does
+    for n in [1, 2, 7, 8, 12, 15]:
+        spectrum = np.random.random(n // 2 + 1) + 1j * np.random.random(n // 2 + 1)
+        expected = np.fft.irfft(spectrum, n)
+        assert l2(our_irfft(spectrum.tolist(), n), list(expected)) < MAX_TOLERANCE
+        assert np.allclose(our_irfft(spectrum, n, backend="numpy"), expected)
+        assert np.allclose(irfft_batch(spectrum[np.newaxis], n), expected)
+        assert np.allclose(irfft_pruned(spectrum.tolist(), n), expected)
+
+
+def test_batch_transforms_match_numpy() -> None:
+    for shape, axis in [((4, 12), -1), ((12, 3), 0), ((2, 17, 3), 1), ((3, 8), 1)]:
+        samples = np.random.random(shape) * 2 - 1
+        complex_samples = samples + 1j * (np.random.random(shape) * 2 - 1)
+        assert np.allclose(
+            fft_batch(complex_samples, axis=axis), np_fft(complex_samples, axis=axis)
+        )
+        assert np.allclose(
+            ifft_batch(complex_samples, axis=axis),
+            np_ifft(complex_samples, axis=axis),
+        )
+        samples_rfft = rfft_batch(samples, axis=axis)
+        assert np.allclose(samples_rfft, np_rfft(samples, axis=axis))
+        n = shape[axis]
+        assert np.allclose(irfft_batch(samples_rfft, n, axis=axis), samples)
+
+
+def test_ntt_polymul() -> None:
+    for length_1, length_2, max_value in [(1, 1, 5), (3, 7, 10), (100, 57, 10**6)]:
+        for bound in [max_value, 10**30]:
+            poly_1 = [random.randint(-bound, bound) for _ in range(length_1)]
+            poly_2 = [random.randint(-bound, bound) for _ in range(length_2)]
+            expected = [0] * (length_1 + length_2 - 1)
+            for i, x in enumerate(poly_1):
+                for j, y in enumerate(poly_2):
+                    expected[i + j] += x * y
+            assert ntt_polymul(poly_1, poly_2) == expected
+            assert ntt_power(poly_1, 3) == ntt_polymul(
+                ntt_polymul(poly_1, poly_1), poly_1
+            )
+
+
+def test_next_fast_len() -> None:
+    for n in [1, 2, 3, 11, 97, 1000, 1025, 4097, 239_998]:
+        for kind in KINDS:
+            length = next_fast_len(n, kind)
+            assert length >= n
+            assert max(factorize(length).keys(), default=1) <= 7
+    assert next_fast_len(1000) == 1024
+    assert next_fast_len(1025) == 1080
+    # Powers of 2 are never padded to a larger smooth size, and are preferred
+    # by both backends
+    for kind in KINDS:
+        assert next_fast_len(2**17, kind) == 2**17
+        for backend in BACKENDS:
+            assert next_fast_len(2**16 - 1, kind, backend) == 2**16
+
+
+MULTIDIMENSIONAL_TEST_CASES: List[Tuple[Tuple[int, ...], Optional[Tuple[int, ...]]]] = [
+    ((8, 12), None),
+    ((6, 5, 4), None),
+    ((6, 5, 4), (0, 2)),
+    ((3, 97, 10), (1,)),
+    ((16, 1, 9), (-1, 0)),
+]
+
+
+def test_fftn(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Small blocks, so the strided axes are split into several blocks
+    monkeypatch.setattr(fft_module, "BLOCK_BYTES", 64)
+    for shape, axes in MULTIDIMENSIONAL_TEST_CASES:
+        samples = np.random.random(shape) + 1j * np.random.random(shape)
+        for array in (samples, samples.T):
+            array_axes = axes if array is samples else None
+            frequencies = fftn(array, array_axes)
+            assert np.allclose(frequencies, np_fftn(array, axes=array_axes))
+            assert np.allclose(ifftn(frequencies, array_axes), array)
+    image = np.random.random((12, 20))
+    assert np.allclose(fft2(image), np.fft.fft2(image))
+    assert np.allclose(ifft2(fft2(image)), image)
+
+
+def test_dft_bins() -> None:
+    methods: List[Literal["auto", "goertzel", "direct", "fft"]] = [
+        "auto",
+        "goertzel",
+        "direct",
+        "fft",
+    ]
+    for n in [1, 2, 7, 100, 1000, 2**12 + 1]:
+        samples = np.random.random(n) + 1j * np.random.random(n)
+        bins = [0, n // 3, n - 1, -1, n + 2]
+        expected = np_fft(samples)[[k % n for k in bins]]
+        for method in methods:
+            result = dft_bins(samples, bins, method)
+            assert l2(result.tolist(), expected.tolist()) < MAX_TOLERANCE * n
+    assert len(dft_bins([1.0, 2.0], [])) == 0
+    assert choose_bins_method(10, 1) == "goertzel"
+    assert choose_bins_method(10**6, 3) == "direct"
+    assert choose_bins_method(2**16, 2**10) == "fft"
+    with pytest.raises(ValueError):
+        dft_bins([], [0])
+
+
+def test_czt() -> None:
+    for n, m in [(1, 1), (7, 3), (100, 37), (64, 200)]:
+        samples = np.random.random(n) + 1j * np.random.random(n)
+        w = 0.999 * np.exp(-0.3j)
+        a = 1.1 * np.exp(0.2j)
+        powers = np.outer(np.arange(m), np.arange(n))
+        expected = (samples * a ** -np.arange(n) * w**powers).sum(axis=1)
+        assert l2(czt(samples, m, w, a).tolist(), expected.tolist()) < MAX_TOLERANCE
+        assert l2(czt(samples).tolist(), np_fft(samples).tolist()) < MAX_TOLERANCE
+
+
+def test_zoom_fft() -> None:
+    n = 500
+    fs = 1000.0
+    samples = np.cos(2 * np.pi * 101.3 * np.arange(n) / fs)
+    spectrum = zoom_fft(samples, 0, fs, n, fs)
+    assert l2(spectrum.tolist(), np_fft(samples).tolist()) < MAX_TOLERANCE
+    # 1/100 of the resolution of the fft, around the tone
+    band = zoom_fft(samples, 100, 102, 201, fs, endpoint=True)
+    frequencies = np.linspace(100, 102, 201)
+    assert abs(frequencies[np.argmax(np.abs(band))] - 101.3) < 0.02
+    with pytest.raises(ValueError):
+        czt(samples, 0)
+
+
+def test_pruned_transforms() -> None:
+    for n, length, outputs in [
+        (1, 1, [0]),
+        (96, 20, None),
+        (97, 10, [1, 2, -1]),
+        (1024, 100, [3, 5, 1000]),
+        (1024, 256, list(range(0, 1024, 3))),
+    ]:
+        samples = np.random.random(length)
+        indices = list(range(n)) if outputs is None else outputs
+        spectrum = np_fft(samples, n)
+        result = fft_pruned((samples + 0j).tolist(), n, outputs)
+        assert l2(result, spectrum[indices].tolist()) < MAX_TOLERANCE
+        inverse = np_ifft(samples, n)[indices]
+        result = ifft_pruned((samples + 0j).tolist(), n, outputs)
+        assert l2(result, inverse.tolist()) < MAX_TOLERANCE
+        real_spectrum = np_rfft(samples, n)
+        result_spectrum = rfft_pruned(samples.tolist(), n)
+        assert l2(result_spectrum, real_spectrum.tolist()) < MAX_TOLERANCE
+        real_inverse = np.fft.irfft(real_spectrum, n)[indices]
+        result_real = irfft_pruned(real_spectrum.tolist(), n, outputs)
+        assert l2(result_real, real_inverse.tolist()) < MAX_TOLERANCE
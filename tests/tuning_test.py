@@ -0,0 +1,140 @@
+import json
+import random
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Iterator
+
+import pytest
+
+import naive_fft
+import naive_fft.ii_poly_multiplication.parallel as parallel_module
+import naive_fft.ii_poly_multiplication.plan as plan_module
+from naive_fft.iii_fft.fft import fft
+from naive_fft.iv_performance_analysis import cost_model, tuning
+from naive_fft.utils import l2
+
+MAX_TOLERANCE = 1e-8
+
+
+@pytest.fixture
+def profile_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    path = tmp_path / "profile.json"
+    monkeypatch.setenv(tuning.PROFILE_PATH_ENVIRONMENT_VARIABLE, str(path))
+    # A shorter micro-benchmark
+    monkeypatch.setattr(tuning, "TUNING_REPEAT_NS", 10**5)
+    monkeypatch.setattr(tuning, "TUNING_REPEATS", 1)
+    monkeypatch.setattr(tuning, "LARGE_PRIME_CANDIDATES", (31, 61))
+    monkeypatch.setattr(tuning, "BACKEND_SIZE_CLASSES", range(4, 8))
+    yield path
+    tuning.reset_profile()
+
+
+def test_tune_persists_profile(profile_file: Path) -> None:
+    profile = naive_fft.tune()
+    assert profile_file.exists()
+    assert tuning.load_profile() == profile
+    assert set(profile.constants) == set(tuning.TUNED_CONSTANTS)
+    assert all(value >= 0 for value in profile.constants.values())
+    assert profile.large_prime_threshold in (30, 60, 61)
+    assert plan_module.LARGE_PRIME_THRESHOLD == profile.large_prime_threshold
+    assert cost_model.NUMPY_APPROXIMATE_CONSTANT == (
+        profile.constants["NUMPY_APPROXIMATE_CONSTANT"]
+    )
+    assert sorted(profile.backends) == [4, 5, 6, 7]
+
+
+def test_measurements_keep_the_plans(profile_file: Path) -> None:
+    plan = plan_module.get_plan(61)
+    threshold = plan_module.LARGE_PRIME_THRESHOLD
+    assert tuning.measure_large_prime_threshold() in (30, 60, 61)
+    assert plan_module.LARGE_PRIME_THRESHOLD == threshold
+    assert plan_module.get_plan(61) is plan
+
+
+def test_profile_loaded_instead_of_measured(
+    profile_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    stored = tuning.TuningProfile(
+        machine=tuning.machine_id(),
+        constants={"APPROXIMATE_CONSTANT": 1e-06},
+        large_prime_threshold=100,
+        parallel_cutoff=2**20,
+        backends={4: "python", 8: "numpy"},
+    )
+    tuning.save_profile(stored)
+
+    def measure_profile() -> tuning.TuningProfile:
+        raise AssertionError("The stored profile should be used")
+
+    monkeypatch.setattr(tuning, "measure_profile", measure_profile)
+    assert tuning.get_profile() == stored
+    assert cost_model.APPROXIMATE_CONSTANT == 1e-06
+    assert stored.backend_for(2) == "python"
+    assert stored.backend_for(2**6) == "python"
+    assert stored.backend_for(2**8 + 1) == "numpy"
+    assert stored.backend_for(2**20) == "numpy"
+    for n in [1, 16, 255, 256, 300]:
+        samples = [complex(random.random(), random.random()) for _ in range(n)]
+        assert l2(fft(samples, "auto"), fft(samples)) < MAX_TOLERANCE
+
+
+# Run in a fresh interpreter, which only reads the profile from the file
+FRESH_PROCESS_SCRIPT = """
+import json
+import naive_fft.ii_poly_multiplication.parallel as parallel_module
+import naive_fft.ii_poly_multiplication.parallel as parallel_module
+import naive_fft.ii_poly_multiplication.plan as plan_module
+from naive_fft.iii_fft.fft import fft
+from naive_fft.iv_performance_analysis import cost_model
+
+fft([1j, 2, 3])
+print(json.dumps({
+    "APPROXIMATE_CONSTANT": cost_model.APPROXIMATE_CONSTANT,
+    "large_prime_threshold": plan_module.LARGE_PRIME_THRESHOLD,
+    "parallel_cutoff": parallel_module.PARALLEL_CUTOFF,
+}))
+"""
+
+
+def fresh_process_settings() -> Dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, "-c", FRESH_PROCESS_SCRIPT],
+        check=True,
+        capture_output=True,
+        cwd=Path(__file__).parent.parent,
+        text=True,
+    ).stdout
+    settings: Dict[str, float] = json.loads(output)
+    return settings
+
+
+def test_saved_profile_applied_on_first_transform(
+    profile_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    defaults = {
+        "APPROXIMATE_CONSTANT": cost_model.APPROXIMATE_CONSTANT,
+        "large_prime_threshold": plan_module.LARGE_PRIME_THRESHOLD,
+        "parallel_cutoff": parallel_module.PARALLEL_CUTOFF,
+    }
+    tuning.save_profile(
+        tuning.current_profile()._replace(
+            constants={"APPROXIMATE_CONSTANT": 1e-06},
+            large_prime_threshold=100,
+            parallel_cutoff=2**20,
+        )
+    )
+    assert fresh_process_settings() == {
+        "APPROXIMATE_CONSTANT": 1e-06,
+        "large_prime_threshold": 100,
+        "parallel_cutoff": 2**20,
+    }
+    monkeypatch.setenv(tuning.NO_PROFILE_ENVIRONMENT_VARIABLE, "1")
+    assert fresh_process_settings() == defaults
+
+
+def test_profile_of_other_machine_ignored(profile_file: Path) -> None:
+    tuning.save_profile(tuning.current_profile()._replace(machine="other"))
+    assert tuning.load_profile() is None
+    profile_file.write_text("not json")
+    assert tuning.load_profile() is None